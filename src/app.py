@@ -1,25 +1,60 @@
 """HIIT workout app."""
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional, Union
+import argparse
 import itertools
+import multiprocessing
+import os
+import queue
+import time
 
 import customtkinter
 import tkinter
+import tkinter.filedialog
+import tkinter.messagebox
 import PIL
 import playsound
 
+from audio_export import export_workout_audio
+from checkpoint import Checkpoint, SessionCheckpointer
 from exercise import Exercise, ExerciseManager, Rest
 from exercise_editor import ExerciseEditor
-from gui_components import NextExercises, Slider
+from gui_components import (
+    count_widgets,
+    DemoPlayer,
+    NextExercises,
+    SearchPicker,
+    Slider,
+    StationBoard,
+    Timeline,
+)
+from fingerprints import WorkoutFingerprints
+from heart_rate import AdaptiveRest, HeartRateMonitor, SimulatedHeartRate
+from history import ExerciseHistory
+from kiosk import KioskSchedule, LeakDetector, parse_times
+from media import MediaLibrary
+from profiles import DEFAULT_PROFILE, ProfileManager, ProfileShard
+from ordering import optimise_order
+from persistence import BackgroundWriter
+from sampling import AliasSampler, exercise_weights
+from session import WorkoutSession
+from staging import StagedChanges
+from stations import RotationPlan
 from utils import get_path_to_file
+from versions import WorkoutVersions
 from workout import (
+    generate_endless_phases,
     generate_workout,
     Phase,
+    TagConstraints,
     Workout,
     WorkoutManager,
-    workout_from_config,
+    WorkoutPhases,
 )
 from workout_editor import WorkoutEditor
+from workout_index import WorkoutIndex, WorkoutQuery
 
 
 COLOURS = {
@@ -31,6 +66,15 @@ COLOURS = {
 
 ASSETS_FOLDER = Path("src") / "assets"
 
+# exercises drawn ahead of time in endless mode, shown as next exercises
+NUM_LOOK_AHEAD_EXERCISES = 5
+
+# time spent searching for a better exercise order before a workout starts
+ORDERING_TIME_BUDGET_SECONDS = 0.5
+
+# heart rate source used to adapt rests, e.g. "simulator" or "tcp://localhost:5005"
+HEART_RATE_SOURCE_VARIABLE = "HIIT_HEART_RATE_SOURCE"
+
 ICONS = {
     "play": get_path_to_file(ASSETS_FOLDER / "play_light.png"),
     "pause": get_path_to_file(ASSETS_FOLDER / "pause_light.png"),
@@ -41,7 +85,14 @@ ICONS = {
 class App(customtkinter.CTk):
     """HIIT workout app main class."""
 
-    def __init__(self, width=1000, height=550):
+    def __init__(
+        self,
+        width=1000,
+        height=650,
+        kiosk_schedule: Optional[KioskSchedule] = None,
+        num_stations: int = 0,
+        num_station_windows: int = 1,
+    ):
         super().__init__()
         self.width = width
         self.height = height
@@ -50,12 +101,43 @@ class App(customtkinter.CTk):
         self.minsize(500, 300)
         self.title("HIIT Workout")
 
-        self.exercise_manager = ExerciseManager()
-        self.workout_manager = WorkoutManager()
+        # file writes happen on a background thread, which reports back via a
+        # queue that is polled on the Tk thread
+        self.write_results: queue.Queue = queue.Queue()
+        self.writer = BackgroundWriter(
+            on_result=lambda path, error: self.write_results.put((path, error))
+        )
+        self.exercise_manager = ExerciseManager(writer=self.writer)
+        # saved workouts and history belong to the active profile
+        self.profile_manager = ProfileManager(writer=self.writer)
+        self.profile_name = DEFAULT_PROFILE
+        self.workout_manager = WorkoutManager(
+            writer=self.writer, versions=WorkoutVersions(writer=self.writer)
+        )
+        self.workout_manager.use_index(WorkoutIndex(self.exercise_manager))
+        self.staged_changes = StagedChanges(self.exercise_manager, self.workout_manager)
+        self.exercise_history = ExerciseHistory(writer=self.writer)
+        self.workout_fingerprints = WorkoutFingerprints(writer=self.writer)
+        self.exercise_sampler = AliasSampler(
+            exercise_weights(self.exercise_manager, self.exercise_history)
+        )
 
-        self.workout: Optional[Workout] = None
-        self.phase_remaining_seconds: Optional[int] = None
-        self.phase_index: Optional[int] = None
+        self.session: Optional[WorkoutSession] = None
+        self.tick_deadline = 0.0
+        self.checkpointer = SessionCheckpointer()
+        # worker processes for reordering workouts, started on first use, and
+        # a thread waiting on them so that the Tk thread does not
+        self.ordering_executor: Optional[ProcessPoolExecutor] = None
+        self.ordering_thread: Optional[ThreadPoolExecutor] = None
+        self.ordering_future: Optional[Future] = None
+        # the last workout started, and a thread for exporting it as audio
+        self.last_workout: Optional[Union[Workout, WorkoutPhases]] = None
+        self.export_executor: Optional[ThreadPoolExecutor] = None
+        # in class mode groups rotate between stations, shown in their own windows
+        self.num_stations = num_stations
+        self.num_station_windows = num_station_windows
+        self.rotation_plan: Optional[RotationPlan] = None
+        self.station_board: Optional[StationBoard] = None
 
         self.grid_rowconfigure((0, 1, 2), weight=1)
         self.grid_columnconfigure((0, 1, 2), weight=1)
@@ -66,9 +148,17 @@ class App(customtkinter.CTk):
         self.countdown.grid(
             row=0, rowspan=1, column=1, columnspan=2, padx=10, pady=10, sticky="nsew"
         )
-        self.logo = None
+        self.logo_images: dict[int, customtkinter.CTkImage] = {}
         self.logo_indices = itertools.cycle(range(1, 6))
         self.current_logo_index = next(self.logo_indices)
+        self.logo = customtkinter.CTkButton(
+            master=self.countdown,
+            text="",
+            fg_color="transparent",
+            hover_color=COLOURS["background"],
+            image=self.get_logo_image(self.current_logo_index),
+            command=self.switch_logo,
+        )
         self.add_logo()
         self.clock = customtkinter.CTkLabel(
             master=self.countdown, text="", font=("roboto", 96)
@@ -78,7 +168,25 @@ class App(customtkinter.CTk):
             master=self.countdown, text="", font=("roboto", 36)
         )
         self.exercise_info.place(relx=0.5, rely=0.2, anchor=tkinter.CENTER)
-        self.callbacks = []
+        self.heart_rate = customtkinter.CTkLabel(
+            master=self.countdown, text="", font=("roboto", 20)
+        )
+        self.heart_rate.place(relx=0.5, rely=0.9, anchor=tkinter.CENTER)
+        # demos are decoded in the background, polled for if not ready in time
+        self.media_library = MediaLibrary(self.exercise_manager)
+        self.demo = DemoPlayer(
+            self.countdown, relx=0.85, rely=0.6, anchor=tkinter.CENTER
+        )
+        self.demo_callback: Optional[str] = None
+        self.heart_rate_monitor = self.start_heart_rate_monitor()
+        self.callbacks: list[str] = []
+        self.timeline = Timeline(
+            self,
+            grid_kwargs=dict(
+                row=1, column=1, columnspan=2, padx=10, pady=(0, 10), sticky="new"
+            ),
+            on_click=self.jump_to_phase,
+        )
 
         self.workout_frame = customtkinter.CTkFrame(self, corner_radius=0)
         self.workout_frame.grid(
@@ -91,6 +199,18 @@ class App(customtkinter.CTk):
             sticky="nsew",
         )
 
+        self.profile_dropdown = customtkinter.CTkComboBox(
+            master=self.workout_frame,
+            values=self.profile_manager.profile_names(),
+            command=self.switch_profile,
+            width=200,
+        )
+        self.profile_dropdown.set(self.profile_name)
+        self.profile_dropdown.bind(
+            "<Return>", lambda event: self.switch_profile(self.profile_dropdown.get())
+        )
+        self.profile_dropdown.pack(padx=10, pady=(10, 0))
+
         self.options_title = customtkinter.CTkLabel(
             master=self.workout_frame,
             text="Workout options",
@@ -98,17 +218,38 @@ class App(customtkinter.CTk):
             pady=10,
         ).pack()
 
-        self.saved_workout_dropdown = customtkinter.CTkOptionMenu(
+        self.workout_filter = customtkinter.CTkEntry(
             master=self.workout_frame,
+            placeholder_text="Filter, e.g. <25, Kettlebell swing, -Burpees",
+            width=200,
+        )
+        self.workout_filter.bind("<KeyRelease>", lambda event: self.filter_workouts())
+        self.workout_filter.pack(padx=10, pady=(10, 0))
+        self.workout_filter_status = customtkinter.CTkLabel(
+            master=self.workout_frame, text="", wraplength=200
+        )
+        self.workout_filter_status.pack(padx=10)
+
+        self.saved_workout_dropdown = SearchPicker(
+            parent=self.workout_frame,
+            values=["Custom"] + list(self.workout_manager.workouts.keys()),
             command=self.change_workout_type,
+            visible_rows=4,
+            placeholder_text="Search workouts...",
         )
         self.saved_workout_dropdown.pack(padx=10, pady=10)
         self.update_saved_workouts()
 
+        self.workout_editor: Optional[WorkoutEditor] = None
+        self.exercise_editor: Optional[ExerciseEditor] = None
         self.edit_workouts_button = customtkinter.CTkButton(
             master=self.workout_frame, command=self.edit_workouts, text="Edit workouts"
         )
         self.edit_workouts_button.pack(padx=10, pady=10)
+        self.export_audio_button = customtkinter.CTkButton(
+            master=self.workout_frame, command=self.export_audio, text="Export audio"
+        )
+        self.export_audio_button.pack(padx=10, pady=10)
 
         self.options_title = customtkinter.CTkLabel(
             master=self.workout_frame,
@@ -152,6 +293,29 @@ class App(customtkinter.CTk):
         )
         self.workout_option_sliders.append(self.rest_duration_seconds_slider)
 
+        self.tag_constraints_entry = customtkinter.CTkEntry(
+            master=self.workout_frame,
+            placeholder_text="Tags, e.g. legs, -jumping, core>=2",
+            width=220,
+        )
+        self.tag_constraints_entry.pack(padx=10, pady=10)
+
+        self.endless = tkinter.BooleanVar()
+        self.endless_checkbox = customtkinter.CTkCheckBox(
+            master=self.workout_frame,
+            text="Endless mode",
+            variable=self.endless,
+        )
+        self.endless_checkbox.pack(pady=(0, 10))
+
+        self.spread_out = tkinter.BooleanVar()
+        self.spread_out_checkbox = customtkinter.CTkCheckBox(
+            master=self.workout_frame,
+            text="Spread out similar exercises",
+            variable=self.spread_out,
+        )
+        self.spread_out_checkbox.pack(pady=(0, 10))
+
         self.play_sound = tkinter.BooleanVar()
         self.play_sound_checkbox = customtkinter.CTkCheckBox(
             master=self.workout_frame,
@@ -212,34 +376,180 @@ class App(customtkinter.CTk):
         )
         self.pause_workout_button.pack(padx=10, pady=10, side="left")
 
+        self.save_status = customtkinter.CTkLabel(
+            master=self.workout_frame, text="", font=("roboto", 14)
+        )
+        self.save_status.pack()
+
         grid_kwargs = dict(
             row=2, rowspan=1, column=1, columnspan=2, padx=10, pady=10, sticky="nsew"
         )
         self.next_exercises = NextExercises(self, grid_kwargs)
 
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.poll_write_results()
+
+        # in kiosk mode workouts repeat unattended, watching for memory growth
+        self.kiosk_schedule = kiosk_schedule
+        self.kiosk_callback: Optional[str] = None
+        self.leak_detector: Optional[LeakDetector] = None
+        if kiosk_schedule is not None:
+            self.leak_detector = LeakDetector()
+            # an endless workout would never reach the next kiosk slot
+            self.endless.set(False)
+            self.endless_checkbox.configure(state=tkinter.DISABLED)
+            if kiosk_schedule.times:
+                self.schedule_kiosk_workout()
+            else:
+                self.kiosk_callback = self.after(0, self.start_kiosk_workout)
+
+        # a session cut short by a crash or by closing the app can be resumed
+        checkpoint = self.load_checkpoint()
+        if checkpoint is not None:
+            if kiosk_schedule is None and checkpoint.num_stations == num_stations:
+                self.after(0, self.offer_resume, checkpoint)
+            else:
+                self.forget_checkpoint()
+
+    def poll_write_results(self):
+        """Show the outcome of background writes, checking periodically."""
+        while not self.write_results.empty():
+            path, error = self.write_results.get_nowait()
+            if error is None:
+                self.save_status.configure(text=f"Saved {Path(path).name}")
+            else:
+                self.save_status.configure(
+                    text=f"Failed to save {Path(path).name}: {error}"
+                )
+        self.reload_shared_libraries()
+        self.after(200, self.poll_write_results)
+
+    def reload_shared_libraries(self):
+        """Pick up exercises and workouts saved by other instances of the app.
+
+        Checking only looks at file metadata, and libraries are left alone
+        during a workout or while edits are staged.
+        """
+        if self.session is not None or len(self.staged_changes):
+            return
+        exercises_reloaded = self.exercise_manager.reload_if_changed()
+        workouts_reloaded = self.workout_manager.reload_if_changed()
+        if exercises_reloaded and self.exercise_editor is not None:
+            self.exercise_editor.refresh()
+        if workouts_reloaded:
+            selected = self.saved_workout_dropdown.get()
+            self.update_saved_workouts()
+            if selected in self.workout_manager.workouts:
+                self.saved_workout_dropdown.set(selected)
+            if self.workout_editor is not None:
+                self.workout_editor.refresh()
+
+    def on_closing(self):
+        """Wait for pending writes before closing the app."""
+        self.writer.close()
+        if self.session is not None:
+            # resumed at the second it was left at, as if paused
+            self.checkpoint_session(paused=True)
+        self.checkpointer.close()
+        if self.heart_rate_monitor is not None:
+            self.heart_rate_monitor.stop(timeout=1)
+        if self.ordering_executor is not None:
+            self.ordering_executor.shutdown(cancel_futures=True)
+        if self.ordering_thread is not None:
+            self.ordering_thread.shutdown()
+        if self.export_executor is not None:
+            self.export_executor.shutdown()
+        self.media_library.close()
+        if self.leak_detector is not None:
+            self.leak_detector.close()
+        self.profile_manager.close()
+        self.destroy()
+
+    def start_heart_rate_monitor(self) -> Optional[HeartRateMonitor]:
+        """Start reading heart rate samples in the background, if configured.
+
+        The source is opened on the monitor's thread, since opening a named
+        pipe or connecting to a sensor can block.
+        """
+        source_spec = os.environ.get(HEART_RATE_SOURCE_VARIABLE)
+        if not source_spec:
+            return None
+        try:
+            monitor = HeartRateMonitor.from_spec(source_spec)
+        except ValueError as error:
+            self.heart_rate.configure(text=f"Heart rate unavailable: {error}")
+            return None
+        monitor.start()
+        return monitor
+
+    def switch_profile(self, profile_name: str):
+        """Switch to a profile, creating it if new, loading it in the background.
+
+        The current profile stays in use until the new one has loaded.
+        """
+        profile_name = profile_name.strip()
+        if profile_name == self.profile_name:
+            return
+        if self.session is not None or len(self.staged_changes):
+            self.save_status.configure(
+                text="Finish the workout and save edits before switching profile"
+            )
+            self.profile_dropdown.set(self.profile_name)
+            return
+
+        self.save_status.configure(text=f"Loading profile {profile_name}...")
+        future = self.profile_manager.load_in_background(profile_name)
+        self.after(50, self.poll_profile_switch, future)
+
+    def poll_profile_switch(self, future):
+        """Swap in a profile once it has loaded, checking periodically."""
+        if not future.done():
+            self.after(50, self.poll_profile_switch, future)
+            return
+        try:
+            shard: ProfileShard = future.result()
+        except (OSError, ValueError) as error:
+            self.save_status.configure(text=f"Failed to load profile: {error}")
+            self.profile_dropdown.set(self.profile_name)
+            return
+        if self.session is not None or len(self.staged_changes):
+            # a workout or edits were started while loading
+            self.profile_dropdown.set(self.profile_name)
+            return
+
+        self.profile_name = shard.name
+        self.workout_manager = shard.workout_manager
+        self.workout_manager.use_index(WorkoutIndex(self.exercise_manager))
+        self.staged_changes.workout_manager = shard.workout_manager
+        self.exercise_history = shard.exercise_history
+        self.workout_fingerprints = shard.workout_fingerprints
+        self.profile_dropdown.configure(values=self.profile_manager.profile_names())
+        self.profile_dropdown.set(shard.name)
+        self.update_saved_workouts()
+        self.change_workout_type("Custom")
+        if self.workout_editor is not None:
+            self.workout_editor.refresh()
+        self.save_status.configure(text=f"Using profile {shard.name}")
+
+    def get_logo_image(self, logo_index: int) -> customtkinter.CTkImage:
+        """Get a logo image, only loading it from disk the first time."""
+        if logo_index not in self.logo_images:
+            logo_file_name = f"logo_{logo_index}.jpeg"
+            self.logo_images[logo_index] = customtkinter.CTkImage(
+                PIL.Image.open(get_path_to_file(ASSETS_FOLDER / logo_file_name)),
+                size=(300, 300),
+            )
+        return self.logo_images[logo_index]
+
     def switch_logo(self):
-        """Switch to another logo."""
+        """Switch to another logo, swapping the image in place."""
         self.current_logo_index = next(self.logo_indices)
-        self.logo.pack_forget()
-        self.logo = None
-        self.add_logo()
+        self.logo.configure(image=self.get_logo_image(self.current_logo_index))
 
     def add_logo(self):
-        """Add logo to blank countdown frame."""
-        if self.logo is not None:
+        """Show logo on blank countdown frame, if not shown already."""
+        if self.logo.winfo_manager():
             return
-        logo_file_name = f"logo_{self.current_logo_index}.jpeg"
-        self.logo = customtkinter.CTkButton(
-            master=self.countdown,
-            text="",
-            fg_color="transparent",
-            hover_color=COLOURS["background"],
-            image=customtkinter.CTkImage(
-                PIL.Image.open(get_path_to_file(ASSETS_FOLDER / logo_file_name)),
-                size=(300, 300),
-            ),
-            command=self.switch_logo,
-        )
         self.logo.pack()
 
     def pause(self):
@@ -258,21 +568,259 @@ class App(customtkinter.CTk):
         for callback in self.callbacks:
             self.after_cancel(callback)
         self.callbacks = []
+        self.checkpoint_session(paused=True)
+
+    def load_checkpoint(self) -> Optional[Checkpoint]:
+        """Load the checkpoint of a session in progress, if there is one."""
+        try:
+            return self.checkpointer.load()
+        except OSError as error:
+            self.save_status.configure(text=f"Failed to read checkpoint: {error}")
+            return None
+
+    def checkpoint_session(self, paused: bool = False):
+        """Checkpoint the current session, unless nothing has changed."""
+        session = self.session
+        if (
+            session is None
+            or session.phase_remaining_seconds is None
+            or session.phase_duration_seconds is None
+        ):
+            return
+        try:
+            self.checkpointer.save(
+                session.phase_index,
+                session.phase_remaining_seconds,
+                session.phase_duration_seconds,
+                paused,
+            )
+        except OSError as error:
+            self.save_status.configure(text=f"Failed to checkpoint: {error}")
+
+    def forget_checkpoint(self):
+        """Record that no session is in progress."""
+        try:
+            self.checkpointer.clear()
+        except OSError as error:
+            self.save_status.configure(text=f"Failed to checkpoint: {error}")
+
+    def offer_resume(self, checkpoint: Checkpoint):
+        """Offer to resume a session which was cut short, else forget it."""
+        minutes, seconds = divmod(checkpoint.remaining_seconds, 60)
+        resume = tkinter.messagebox.askyesno(
+            title="Resume workout?",
+            message=(
+                f"Resume {checkpoint.workout_name} where it was left, with "
+                f"{minutes}:{seconds:02d} to go in phase {checkpoint.phase_index + 1}?"
+            ),
+            parent=self,
+        )
+        if resume and self.session is None:
+            self.resume_session(checkpoint)
+        elif self.session is None:
+            self.forget_checkpoint()
+
+    def resume_session(self, checkpoint: Checkpoint):
+        """Resume a checkpointed session at the second it was checkpointed.
+
+        The phases come from the checkpoint, so the workout is not generated
+        or loaded again. Phases before the one resumed count as done.
+        """
+        workout = checkpoint.workout
+        self.last_workout = workout
+        if checkpoint.num_stations:
+            workout = self.start_class(workout)
+        session = self.begin_session(workout)
+        try:
+            session.jump_to(checkpoint.phase_index)
+        except IndexError:
+            self.stop_timer()
+            return
+        for phase in workout[: checkpoint.phase_index]:
+            session.summary.add(phase, phase.duration_seconds)
+        session.phase_remaining_seconds = checkpoint.remaining_seconds
+        session.phase_duration_seconds = checkpoint.phase_duration_seconds
+        if not checkpoint.paused:
+            self.start_workout()
+            return
+        self.logo.pack_forget()
+        self.show_phase()
+        self.update_clock(checkpoint.remaining_seconds)
+        self.pause()
 
     def create_phases_for_custom_workout(self):
-        """Create phases for a custom workout using selected settings."""
-        self.workout = generate_workout(
+        """Create phases for a custom workout using selected settings.
+
+        Exercises not done recently are favoured; only weights which changed
+        since the last generation are updated in the sampler. Workouts
+        generated in the last few weeks are not generated again.
+        """
+        self.exercise_sampler.update_weights(
+            exercise_weights(self.exercise_manager, self.exercise_history)
+        )
+        tag_text = self.tag_constraints_entry.get()
+        constraints = TagConstraints.parse(tag_text) if tag_text.strip() else None
+        workout = generate_workout(
             self.exercise_manager,
             num_exercises=self.num_exercises_slider.value,
             exercise_duration_seconds=self.exercise_duration_seconds_slider.value,
             rest_duration_seconds=self.rest_duration_seconds_slider.value,
+            sampler=self.exercise_sampler,
+            constraints=constraints,
+            fingerprints=self.workout_fingerprints,
+        )
+        self.start_session_for_workout(workout, "Custom workout")
+
+    def create_phases_for_endless_workout(self):
+        """Create an open-ended session, drawing exercises as they are needed."""
+        self.exercise_sampler.update_weights(
+            exercise_weights(self.exercise_manager, self.exercise_history)
+        )
+        phases = generate_endless_phases(
+            self.exercise_manager,
+            exercise_duration_seconds=self.exercise_duration_seconds_slider.value,
+            rest_duration_seconds=self.rest_duration_seconds_slider.value,
+            sampler=self.exercise_sampler,
+        )
+        self.session = WorkoutSession(
+            phases,
+            look_ahead=NUM_LOOK_AHEAD_EXERCISES,
+            adaptive_rest=self.adaptive_rest(),
         )
+        self.session.advance()
 
     def load_phases_for_saved_workout(self, workout_name: str):
-        """Load phases that comprise a saved workout."""
-        self.workout = workout_from_config(
+        """Load phases that comprise a saved workout.
+
+        The phases are expanded lazily as the session goes, unless they are
+        to be reordered or split into stations, which needs them all at once.
+        """
+        phases = WorkoutPhases(
             self.exercise_manager, self.workout_manager[workout_name]
         )
+        if self.spread_out.get() or self.num_stations:
+            self.start_session_for_workout(list(phases), workout_name)
+        else:
+            self.last_workout = phases
+            self.begin_session_for_workout(phases, workout_name)
+
+    def start_session_for_workout(self, workout: Workout, workout_name: str):
+        """Step through a finite workout, showing all of its exercises ahead.
+
+        If chosen, exercises are first reordered so that similar ones are not
+        back to back, in the background, and the session is only created and
+        started once they are. The phases are kept for checkpoints of the
+        session.
+        """
+        self.last_workout = workout
+        if not self.spread_out.get():
+            self.begin_session_for_workout(workout, workout_name)
+            return
+        if self.ordering_executor is None:
+            self.ordering_executor = ProcessPoolExecutor()
+        if self.ordering_thread is None:
+            self.ordering_thread = ThreadPoolExecutor(max_workers=1)
+        self.ordering_future = self.ordering_thread.submit(
+            optimise_order,
+            self.exercise_manager,
+            workout,
+            time_budget_seconds=ORDERING_TIME_BUDGET_SECONDS,
+            executor=self.ordering_executor,
+        )
+        self.exercise_info.configure(text="Spreading out exercises...")
+        self.after(50, self.poll_ordering, self.ordering_future, workout, workout_name)
+
+    def poll_ordering(self, future: Future, workout: Workout, workout_name: str):
+        """Start a reordered workout once reordering finishes, checking periodically.
+
+        If reordering fails, the workout is started in its original order.
+        """
+        if not future.done():
+            self.after(50, self.poll_ordering, future, workout, workout_name)
+            return
+        self.ordering_future = None
+        try:
+            workout = future.result()
+        except Exception as error:
+            self.save_status.configure(text=f"Failed to reorder exercises: {error}")
+        self.begin_session_for_workout(workout, workout_name)
+        self.start_workout()
+
+    def begin_session_for_workout(
+        self, workout: Union[Workout, WorkoutPhases], workout_name: str
+    ):
+        """Checkpoint and start a session of a finite workout, at its first phase."""
+        self.checkpointer.start(workout_name, workout, self.num_stations)
+        if self.num_stations:
+            workout = self.start_class(list(workout))
+        self.begin_session(workout).advance()
+
+    def begin_session(self, workout: Union[Workout, WorkoutPhases]) -> WorkoutSession:
+        """Create a session of a finite workout and draw its timeline.
+
+        All exercises ahead are shown, unless the phases are expanded lazily.
+        """
+        num_exercises = sum(1 for phase in workout if isinstance(phase.type, Exercise))
+        session = WorkoutSession(
+            workout,
+            num_exercises=num_exercises,
+            look_ahead=(
+                num_exercises if isinstance(workout, list) else NUM_LOOK_AHEAD_EXERCISES
+            ),
+            adaptive_rest=self.adaptive_rest(),
+        )
+        self.session = session
+        self.build_timeline(workout)
+        return session
+
+    def start_class(self, workout: Workout) -> Workout:
+        """Plan a circuit class from a workout, getting its shared timeline.
+
+        The station windows are created for the first class and reopened
+        for later ones.
+        """
+        self.rotation_plan = RotationPlan.from_workout(workout, self.num_stations)
+        if self.station_board is None:
+            self.station_board = StationBoard(
+                self, self.num_stations, self.num_station_windows
+            )
+        else:
+            self.station_board.open()
+        return self.rotation_plan.timeline
+
+    def build_timeline(self, workout: Union[Workout, WorkoutPhases]):
+        """Draw the timeline of a workout, coloured as the countdown will be."""
+        colours = []
+        exercise_seen = False
+        for phase in workout:
+            colours.append(
+                self.get_phase_countdown_colour(
+                    phase, before_first_exercise=not exercise_seen
+                )
+            )
+            exercise_seen = exercise_seen or isinstance(phase.type, Exercise)
+        self.timeline.build([phase.duration_seconds for phase in workout], colours)
+
+    def jump_to_phase(self, phase_index: int):
+        """Jump to a phase clicked on the timeline, staying paused if paused."""
+        session = self.session
+        if session is None or session.workout is None:
+            return
+        running = bool(self.callbacks)
+        for callback in self.callbacks:
+            self.after_cancel(callback)
+        self.callbacks = []
+        phase = session.jump_to(phase_index)
+        if running:
+            self.schedule_phase_callbacks()
+        else:
+            self.show_phase()
+            self.update_clock(phase.duration_seconds)
+        self.checkpoint_session(paused=not running)
+
+    def adaptive_rest(self) -> Optional[AdaptiveRest]:
+        """Rests only adapt to recovery if there is a heart rate source."""
+        return AdaptiveRest() if self.heart_rate_monitor is not None else None
 
     def get_phase_countdown_colour(
         self, phase: Phase, before_first_exercise: bool
@@ -298,19 +846,44 @@ class App(customtkinter.CTk):
         only durations and total number of exercises are fixed.
 
         Then appropriate callbacks are set to update the countdown display with
-        the current progress throught the workout.
+        the current progress throught the workout, one phase at a time.
 
         """
-        if self.workout is None:
+        if self.kiosk_callback is not None:
+            self.after_cancel(self.kiosk_callback)
+            self.kiosk_callback = None
+        if self.ordering_future is not None:
+            # started once its exercises are reordered
+            return
+        if self.session is None:
             self.stop_timer()
-            saved_workout_dropdown_value = self.saved_workout_dropdown._current_value
-            if saved_workout_dropdown_value == "Custom":
-                self.create_phases_for_custom_workout()
+            saved_workout_dropdown_value = self.saved_workout_dropdown.get() or "Custom"
+            endless = self.endless.get() and self.kiosk_schedule is None
+            if endless and self.num_stations:
+                self.exercise_info.configure(
+                    text="Classes need a workout with an end", wraplength=500
+                )
+                return
+            elif endless:
+                self.create_phases_for_endless_workout()
+            elif saved_workout_dropdown_value == "Custom":
+                try:
+                    self.create_phases_for_custom_workout()
+                except ValueError as error:
+                    # e.g. tag constraints that cannot be satisfied
+                    self.exercise_info.configure(text=str(error), wraplength=500)
+                    self.retry_kiosk_workout()
+                    return
             else:
                 self.load_phases_for_saved_workout(saved_workout_dropdown_value)
+            if self.ordering_future is not None:
+                return
+            if self.session is None or self.session.phase is None:
+                self.stop_timer()
+                self.retry_kiosk_workout()
+                return
 
         self.logo.pack_forget()
-        self.logo = None
 
         self.start_workout_button.configure(
             state=tkinter.DISABLED,
@@ -325,114 +898,197 @@ class App(customtkinter.CTk):
             fg_color=self.button_fg_colours["pause"],
         )
 
-        self.generate_countdown_callbacks()
+        self.schedule_phase_callbacks()
+        self.checkpoint_session()
 
-    def generate_countdown_callbacks(self):
-        """Generate callbacks to update countdown timer during workout."""
-        num_exercises = sum(
-            1 for phase in self.workout if isinstance(phase.type, Exercise)
-        )
+    def schedule_phase_callbacks(self):
+        """Schedule callbacks to update the countdown during the current phase.
 
-        exercises = [p.type for p in self.workout if isinstance(p.type, Exercise)]
-        exercise_names = [exercise.name for exercise in exercises]
+        Only the current phase is scheduled, from where it was paused if so,
+        and each tick schedules the next one against a monotonic clock, so at
+        most two callbacks are pending however long the session runs.
+        """
+        self.tick_deadline = time.monotonic()
+        self.callbacks = [
+            self.after(0, self.show_phase),
+            self.after(0, self.tick, self.session.phase_remaining_seconds),
+        ]
+
+    def tick(self, remaining_seconds: int):
+        """Show a second of the countdown and schedule the next second."""
+        self.update_clock(remaining_seconds)
+        if self.adapt_rest():
+            return
 
-        total_milliseconds = 0
-        exercise_index = 0
+        if self.play_sound.get() and remaining_seconds <= 3:
+            playsound.playsound(get_path_to_file(ASSETS_FOLDER / "beep.mp3"), False)
 
-        # initialise the next exercises frame
-        callback = self.after(
-            0,
-            self.next_exercises.update,
-            exercise_names,
+        self.tick_deadline += 1
+        delay_milliseconds = max(
+            0, round((self.tick_deadline - time.monotonic()) * 1000)
         )
-        self.callbacks.append(callback)
-
-        for phase_index, phase in enumerate(self.workout):
-            fg_color = self.get_phase_countdown_colour(
-                phase, before_first_exercise=exercise_index == 0
+        if remaining_seconds > 1:
+            callback = self.after(delay_milliseconds, self.tick, remaining_seconds - 1)
+        else:
+            callback = self.after(delay_milliseconds, self.next_phase)
+        self.callbacks = [callback]
+
+    def show_phase(self):
+        """Show the colour, info and next exercises for the current phase."""
+        session = self.session
+        phase = session.phase
+        if self.heart_rate_monitor is not None and isinstance(
+            self.heart_rate_monitor.source, SimulatedHeartRate
+        ):
+            self.heart_rate_monitor.source.exercising = isinstance(phase.type, Exercise)
+
+        self.set_countdown_color(
+            self.get_phase_countdown_colour(
+                phase, before_first_exercise=session.exercise_index == 0
+            )
+        )
+        if isinstance(phase.type, Exercise):
+            self.update_exercise_info(
+                phase.type.name, session.exercise_index, session.num_exercises
             )
+        else:
+            self.update_exercise_info_with_rest(
+                session.exercise_index, session.num_exercises
+            )
+        if self.rotation_plan is not None:
+            self.show_stations()
+            return
+        upcoming_exercise_names = session.upcoming_exercise_names()
+        self.next_exercises.update(upcoming_exercise_names)
+        self.show_demo()
+        # decoded during the rest before, to be ready once the exercise starts
+        if upcoming_exercise_names:
+            self.media_library.prefetch(upcoming_exercise_names[0])
+
+    def show_demo(self):
+        """Play the demo of the current exercise, waiting for it to be decoded."""
+        if self.demo_callback is not None:
+            self.after_cancel(self.demo_callback)
+            self.demo_callback = None
+        phase = self.session.phase if self.session is not None else None
+        if phase is None or not isinstance(phase.type, Exercise):
+            self.demo.stop()
+            return
+        frames = self.media_library.get(phase.type.name)
+        if frames is not None:
+            self.demo.play(frames)
+            return
+        self.demo.stop()
+        self.media_library.prefetch(phase.type.name)
+        if self.media_library.pending(phase.type.name):
+            self.demo_callback = self.after(50, self.show_demo)
+
+    def show_stations(self):
+        """Show every station of a class for the current phase."""
+        session = self.session
+        phase_index = session.phase_index
+        self.station_board.show(
+            self.rotation_plan.stations_at(phase_index),
+            self.get_phase_countdown_colour(
+                session.phase, before_first_exercise=session.exercise_index == 0
+            ),
+            is_rest=isinstance(session.phase.type, Rest),
+        )
+        self.next_exercises.update(self.rotation_plan.describe(phase_index))
 
-            if isinstance(phase.type, Exercise):
-                exercise_index += 1
+    def next_phase(self):
+        """Move on to the next phase, stopping if the workout is finished."""
+        self.callbacks = []
+        if self.session.advance() is None:
+            self.finish_workout()
+        else:
+            self.schedule_phase_callbacks()
+            self.checkpoint_session()
 
-            if self.phase_index is not None and phase_index < self.phase_index:
-                # workout has been paused before and this phase has been completed
-                continue
+    def finish_workout(self):
+        """Stop a workout which ran to the end, scheduling the next in kiosk mode.
 
-            callback = self.after(
-                total_milliseconds, self.set_countdown_color, fg_color
-            )
-            self.callbacks.append(callback)
-
-            if isinstance(phase.type, Exercise):
-                callback = self.after(
-                    total_milliseconds,
-                    self.update_exercise_info,
-                    phase.type.name,
-                    exercise_index,
-                    num_exercises,
-                )
-                self.callbacks.append(callback)
-
-                # exercise index is 1-based, hence the slice here does not
-                # include the exercise itself
-                callback = self.after(
-                    total_milliseconds,
-                    self.next_exercises.update,
-                    exercise_names[exercise_index:],
-                )
-                self.callbacks.append(callback)
-            else:
-                callback = self.after(
-                    total_milliseconds,
-                    self.update_exercise_info_with_rest,
-                    exercise_index,
-                    num_exercises,
-                )
-                self.callbacks.append(callback)
+        Memory is sampled between kiosk workouts and a diagnostic dump is
+        written if it has grown too far.
+        """
+        self.stop_timer()
+        if self.kiosk_schedule is None:
+            return
+        dump_path = self.leak_detector.record_session(count_widgets(self))
+        if dump_path is not None:
+            self.save_status.configure(text=f"Memory grew, see {dump_path}")
+        self.schedule_kiosk_workout()
+
+    def schedule_kiosk_workout(self):
+        """Schedule the next kiosk workout."""
+        now = datetime.now()
+        delay = self.kiosk_schedule.next_start(now) - now
+        self.kiosk_callback = self.after(
+            max(0, round(delay.total_seconds() * 1000)), self.start_kiosk_workout
+        )
 
-            if self.phase_index is not None and phase_index == self.phase_index:
-                seconds_left_in_phase = self.phase_remaining_seconds
-            else:
-                seconds_left_in_phase = phase.duration_seconds
-
-            for elapsed_seconds in range(seconds_left_in_phase):
-                remaining_seconds = seconds_left_in_phase - elapsed_seconds
-                callback = self.after(
-                    total_milliseconds,
-                    self.update_clock,
-                    remaining_seconds,
-                    phase_index,
-                )
-                self.callbacks.append(callback)
-
-                if self.play_sound.get() and remaining_seconds <= 3:
-                    sound_callback = self.after(
-                        total_milliseconds,
-                        playsound.playsound,
-                        get_path_to_file(ASSETS_FOLDER / "beep.mp3"),
-                        False,
-                    )
-                    self.callbacks.append(sound_callback)
-                total_milliseconds += 1000
-
-        callback = self.after(total_milliseconds, self.stop_timer)
-        self.callbacks.append(callback)
-
-    def update_clock(self, seconds: int, phase_index: int):
+    def retry_kiosk_workout(self):
+        """Try again at the next kiosk slot after a workout failed to start."""
+        if self.kiosk_schedule is not None and self.kiosk_callback is None:
+            self.schedule_kiosk_workout()
+
+    def start_kiosk_workout(self):
+        """Start a kiosk workout with the current workout options."""
+        self.kiosk_callback = None
+        self.start_workout()
+
+    def update_clock(self, seconds: int):
         """Update the seconds remaining during the current phase."""
         self.clock.configure(text=str(seconds))
-        self.phase_remaining_seconds = seconds
-        self.phase_index = phase_index
+        if self.rotation_plan is not None and self.station_board is not None:
+            self.station_board.set_clock(seconds)
+        session = self.session
+        if session is None or session.phase_duration_seconds is None:
+            return
+        session.phase_remaining_seconds = seconds
+        self.timeline.set_progress(
+            session.phase_index, session.phase_duration_seconds - seconds
+        )
+
+    def adapt_rest(self) -> bool:
+        """Show the heart rate and adapt the current rest to it, if monitored.
+
+        If the rest is extended or shortened, the rest of the phase is
+        rescheduled and True is returned.
+        """
+        session = self.session
+        if self.heart_rate_monitor is None or session is None:
+            return False
+
+        stats = self.heart_rate_monitor.stats()
+        if stats is not None:
+            text = f"{stats.latest_bpm:.0f} bpm"
+        elif self.heart_rate_monitor.error is not None:
+            text = f"Heart rate unavailable: {self.heart_rate_monitor.error}"
+        else:
+            text = "-- bpm"
+        self.heart_rate.configure(text=text)
+        if not session.adapt_rest(stats):
+            return False
+        for callback in self.callbacks:
+            self.after_cancel(callback)
+        self.schedule_phase_callbacks()
+        return True
 
     def update_exercise_info(self, exercise_name, exercise_index, num_exercises):
         """Update information about the current exercise phase."""
-        text = f"{exercise_name}\nExercise {exercise_index}/{num_exercises}"
+        if num_exercises is None:
+            text = f"{exercise_name}\nExercise {exercise_index}"
+        else:
+            text = f"{exercise_name}\nExercise {exercise_index}/{num_exercises}"
         self.exercise_info.configure(text=text)
 
     def update_exercise_info_with_rest(self, exercise_index, num_exercises):
         """Update information about the current rest phase."""
-        text = f"Rest\n{exercise_index}/{num_exercises} exercises completed"
+        if num_exercises is None:
+            text = f"Rest\n{exercise_index} exercises completed"
+        else:
+            text = f"Rest\n{exercise_index}/{num_exercises} exercises completed"
         self.exercise_info.configure(text=text)
 
     def set_countdown_color(self, fg_color):
@@ -446,6 +1102,14 @@ class App(customtkinter.CTk):
         """
         for callback in self.callbacks:
             self.after_cancel(callback)
+        summary = self.session.stop() if self.session is not None else None
+        self.forget_checkpoint()
+        # a class leader does not do every station, so classes are not recorded
+        if summary is not None and self.rotation_plan is None:
+            self.record_exercises_done(summary.exercise_counts)
+        if self.rotation_plan is not None:
+            self.station_board.clear()
+            self.rotation_plan = None
         self.start_workout_button.configure(
             state=tkinter.NORMAL,
             fg_color=self.button_fg_colours["start"],
@@ -456,21 +1120,46 @@ class App(customtkinter.CTk):
         self.stop_workout_button.configure(
             state=tkinter.DISABLED, fg_color=COLOURS["background"]
         )
-        self.workout = None
-        self.phase_remaining_seconds = None
-        self.phase_index = None
+        self.session = None
         self.callbacks = []
+        self.show_demo()
         self.exercise_info.configure(text="")
         self.clock.configure(text="")
+        self.heart_rate.configure(text="")
         self.countdown.configure(fg_color="gray17")
         self.next_exercises.clear()
+        self.timeline.clear()
+        if summary is not None and summary.exercise_counts:
+            self.next_exercises.update(["Session summary"] + summary.describe())
         self.add_logo()
 
+    def record_exercises_done(self, exercise_names: Iterable[str]):
+        """Record the exercises reached in the session in the history."""
+        exercise_names = set(exercise_names)
+        if exercise_names:
+            self.exercise_history.record(exercise_names)
+
     def update_saved_workouts(self):
         """Update the saved workouts dropdown."""
-        values = ["Custom"] + list(self.workout_manager.workouts.keys())
-        self.saved_workout_dropdown.set(values[0])
-        self.saved_workout_dropdown.configure(values=values)
+        self.filter_workouts()
+        self.saved_workout_dropdown.set("Custom")
+
+    def filter_workouts(self):
+        """Only offer saved workouts matching the filter, if there is one."""
+        text = self.workout_filter.get()
+        if not text.strip():
+            workout_names = list(self.workout_manager.workouts)
+            self.workout_filter_status.configure(text="")
+        else:
+            try:
+                workout_names = self.workout_manager.query(WorkoutQuery.parse(text))
+            except ValueError as error:
+                self.workout_filter_status.configure(text=str(error))
+                return
+            self.workout_filter_status.configure(
+                text=f"{len(workout_names)} of {len(self.workout_manager)} workouts"
+            )
+        self.saved_workout_dropdown.sync(["Custom"] + workout_names)
 
     def change_workout_type(self, workout_name):
         """Change workout type via dropdown."""
@@ -493,27 +1182,122 @@ class App(customtkinter.CTk):
             )
             self.rest_duration_seconds_slider.update(workout.rest_duration_seconds)
 
-    def edit_workouts(self):
-        """Pane for adding or removing workouts."""
-        exercises = list(self.exercise_manager.exercises.keys())
-        WorkoutEditor(
+    def export_audio(self):
+        """Export the selected saved workout, or else the last one, as audio.
+
+        The track is rendered in a background thread, so a session can keep
+        running meanwhile.
+        """
+        workout_name = self.saved_workout_dropdown.get() or "Custom"
+        workout: Union[Workout, WorkoutPhases]
+        if workout_name != "Custom":
+            workout = WorkoutPhases(
+                self.exercise_manager, self.workout_manager[workout_name]
+            )
+        elif self.last_workout is not None:
+            workout_name, workout = "last workout", self.last_workout
+        else:
+            self.save_status.configure(text="Choose a saved workout to export")
+            return
+        path = tkinter.filedialog.asksaveasfilename(
             parent=self,
-            workout_manager=self.workout_manager,
-            exercises=exercises,
-            on_close_callback=self.update_saved_workouts,
+            defaultextension=".wav",
+            filetypes=[("WAV audio", "*.wav")],
+            initialfile=f"{workout_name}.wav",
         )
+        if not path:
+            return
+        if self.export_executor is None:
+            self.export_executor = ThreadPoolExecutor(max_workers=1)
+        future = self.export_executor.submit(export_workout_audio, workout, path)
+        self.save_status.configure(text=f"Exporting {workout_name}...")
+        self.after(100, self.poll_audio_export, future, Path(path))
+
+    def poll_audio_export(self, future, path: Path):
+        """Report on an audio export once it has finished, checking periodically."""
+        if not future.done():
+            self.after(100, self.poll_audio_export, future, path)
+            return
+        try:
+            future.result()
+        except Exception as error:
+            # e.g. an unwritable path or a phase which cannot be rendered
+            self.save_status.configure(text=f"Failed to export audio: {error}")
+            return
+        self.save_status.configure(text=f"Exported {path.name}")
+
+    def edit_workouts(self):
+        """Pane for adding or removing workouts, reused between openings."""
+        if self.workout_editor is None:
+            self.workout_editor = WorkoutEditor(
+                parent=self,
+                staged_changes=self.staged_changes,
+                on_close_callback=self.update_saved_workouts,
+            )
+        else:
+            self.workout_editor.show()
 
     def edit_exercises(self):
-        """Pane for adding or removing exercises."""
-        ExerciseEditor(
-            parent=self,
-            exercise_manager=self.exercise_manager,
-            exercises_in_workouts=self.workout_manager.exercises_in_workouts,
-        )
+        """Pane for adding or removing exercises, reused between openings."""
+        if self.exercise_editor is None:
+            self.exercise_editor = ExerciseEditor(
+                parent=self,
+                staged_changes=self.staged_changes,
+                on_commit_callback=self.update_saved_workouts,
+            )
+        else:
+            self.exercise_editor.show()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--kiosk",
+        action="store_true",
+        help="repeat workouts unattended, e.g. on a wall-mounted screen",
+    )
+    parser.add_argument(
+        "--kiosk-gap-seconds",
+        type=int,
+        default=60,
+        help="seconds between kiosk workouts",
+    )
+    parser.add_argument(
+        "--stations",
+        type=int,
+        default=0,
+        help="run circuit classes, with groups rotating between this many stations",
+    )
+    parser.add_argument(
+        "--station-windows",
+        type=int,
+        default=1,
+        help="number of windows to split the stations between, e.g. one per display",
+    )
+    parser.add_argument(
+        "--kiosk-times",
+        default="",
+        help="times of day to start kiosk workouts instead, e.g. '07:00, 12:30'",
+    )
+    # built apps may be launched with extra arguments, which are ignored
+    args, _ = parser.parse_known_args()
+    return args
 
 
 if __name__ == "__main__":
+    # needed for the ordering worker processes in frozen builds
+    multiprocessing.freeze_support()
+    args = parse_args()
     customtkinter.set_appearance_mode("dark")
     customtkinter.set_default_color_theme("blue")
-    app = App()
+    kiosk_schedule = None
+    if args.kiosk or args.kiosk_times:
+        kiosk_schedule = KioskSchedule(
+            args.kiosk_gap_seconds, parse_times(args.kiosk_times)
+        )
+    app = App(
+        kiosk_schedule=kiosk_schedule,
+        num_stations=args.stations,
+        num_station_windows=args.station_windows,
+    )
     app.mainloop()
@@ -0,0 +1,153 @@
+"""Rendering of workouts to WAV audio tracks, to follow without the app.
+
+The track has a tone when each exercise or rest starts, beeps over the last
+three seconds of each phase as in the app, a short tune identifying each
+exercise and a tone at the end. Cues are synthesised once, and each second
+of the track is then one of a few precomputed blocks of samples written
+straight to the file, so memory use does not grow with the workout.
+"""
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+import hashlib
+import math
+import sys
+import wave
+
+from exercise import Exercise
+from workout import base_exercise_name, Workout, WorkoutPhases
+
+SAMPLE_RATE = 22050
+SAMPLE_WIDTH = 2  # bytes, i.e. 16-bit samples
+MAX_AMPLITUDE = 32767
+NUM_BEEP_SECONDS = 3
+FADE_SECONDS = 0.005
+
+# frequencies in Hz and durations in seconds of each note of a cue
+Notes = list[tuple[float, float]]
+EXERCISE_START: Notes = [(660.0, 0.12), (990.0, 0.18)]
+REST_START: Notes = [(660.0, 0.12), (440.0, 0.18)]
+BEEP: Notes = [(880.0, 0.15)]
+FINISH: Notes = [(523.0, 0.15), (659.0, 0.15), (784.0, 0.15), (1047.0, 0.3)]
+# pentatonic scale the tunes identifying exercises are picked from
+TUNE_SCALE = [523.0, 587.0, 659.0, 784.0, 880.0, 1047.0]
+TUNE_NOTE_SECONDS = 0.1
+TUNE_LENGTH = 3
+TUNE_GAP_SECONDS = 0.1
+
+
+def synthesise(notes: Notes, sample_rate: int, volume: float = 0.4) -> array:
+    """Synthesise notes as sine waves, faded in and out to avoid clicks."""
+    samples = array("h")
+    fade = max(1, int(FADE_SECONDS * sample_rate))
+    for frequency, seconds in notes:
+        num_samples = int(seconds * sample_rate)
+        step = 2 * math.pi * frequency / sample_rate
+        for i in range(num_samples):
+            envelope = min(1.0, i / fade, (num_samples - i) / fade)
+            samples.append(int(volume * envelope * MAX_AMPLITUDE * math.sin(step * i)))
+    return samples
+
+
+def exercise_tune(exercise_name: str) -> Notes:
+    """A short tune which is always the same for an exercise.
+
+    Both sides of a 1-handed exercise get the same tune.
+    """
+    base_name = base_exercise_name(exercise_name)
+    digest = hashlib.sha256(base_name.encode()).digest()
+    return [
+        (TUNE_SCALE[byte % len(TUNE_SCALE)], TUNE_NOTE_SECONDS)
+        for byte in digest[:TUNE_LENGTH]
+    ]
+
+
+class AudioRenderer:
+    """Renders workouts second by second from precomputed blocks.
+
+    A block is a second of samples with some cues mixed in from its start,
+    and blocks are cached by their cues, so a workout only needs a handful
+    of distinct blocks, plus one per exercise if exercise tunes are on.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, exercise_tunes: bool = True):
+        self.sample_rate = sample_rate
+        self.exercise_tunes = exercise_tunes
+        self.cues = {
+            "exercise": synthesise(EXERCISE_START, sample_rate),
+            "rest": synthesise(REST_START, sample_rate),
+            "beep": synthesise(BEEP, sample_rate),
+            "finish": synthesise(FINISH, sample_rate),
+        }
+        self.blocks: dict[tuple[str, ...], bytes] = {}
+
+    def cue(self, name: str) -> array:
+        """Get a cue, synthesising that of an exercise, "exercise:<name>", once."""
+        if name not in self.cues:
+            exercise_name = name.split(":", 1)[1]
+            gap = int(TUNE_GAP_SECONDS * self.sample_rate)
+            self.cues[name] = (
+                self.cues["exercise"]
+                + array("h", bytes(SAMPLE_WIDTH * gap))
+                + synthesise(exercise_tune(exercise_name), self.sample_rate)
+            )
+        return self.cues[name]
+
+    def block(self, cue_names: tuple[str, ...]) -> bytes:
+        """Get a second of samples with the cues mixed in from its start."""
+        if cue_names not in self.blocks:
+            samples = array("h", bytes(SAMPLE_WIDTH * self.sample_rate))
+            for name in cue_names:
+                for i, sample in enumerate(self.cue(name)[: self.sample_rate]):
+                    mixed = samples[i] + sample
+                    samples[i] = max(-MAX_AMPLITUDE, min(MAX_AMPLITUDE, mixed))
+            if sys.byteorder == "big":  # WAV samples are little-endian
+                samples.byteswap()
+            self.blocks[cue_names] = samples.tobytes()
+        return self.blocks[cue_names]
+
+    def phase_cue(self, phase) -> str:
+        if not isinstance(phase.type, Exercise):
+            return "rest"
+        return f"exercise:{phase.type.name}" if self.exercise_tunes else "exercise"
+
+    def render(
+        self,
+        workout: Union[Workout, WorkoutPhases],
+        output: Union[Path, str, BinaryIO],
+    ):
+        """Write a workout as a WAV track, one second at a time.
+
+        The number of frames is written up front, so the output does not
+        need to be seekable and can be e.g. a pipe.
+        """
+        total_seconds = sum(phase.duration_seconds for phase in workout) + 1
+        if isinstance(output, Path):
+            output = str(output)
+        with wave.open(output, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(SAMPLE_WIDTH)
+            f.setframerate(self.sample_rate)
+            f.setnframes(total_seconds * self.sample_rate)
+            for phase in workout:
+                start_cue = self.phase_cue(phase)
+                for second in range(phase.duration_seconds):
+                    remaining_seconds = phase.duration_seconds - second
+                    cue_names: tuple[str, ...] = ()
+                    if second == 0:
+                        cue_names += (start_cue,)
+                    if remaining_seconds <= NUM_BEEP_SECONDS:
+                        cue_names += ("beep",)
+                    f.writeframesraw(self.block(cue_names))
+            f.writeframesraw(self.block(("finish",)))
+
+
+def export_workout_audio(
+    workout: Union[Workout, WorkoutPhases],
+    output: Union[Path, str, BinaryIO],
+    renderer: Optional[AudioRenderer] = None,
+):
+    """Render a workout as a WAV track, see `AudioRenderer.render`."""
+    (renderer or AudioRenderer()).render(workout, output)
@@ -0,0 +1,239 @@
+"""Checkpoints of the session in progress, to resume it after a crash.
+
+The checkpoint file has a fixed size and two slots, which are written in
+turn. Each slot holds a sequence number and a checksum, so a write torn by
+a crash only ever spoils the older slot, and the newest intact slot is the
+checkpoint. A slot holds the position within the session and the session's
+phases, encoded compactly once per session, so resuming needs neither the
+exercise library nor generating the workout again.
+
+Checkpoints are only written at phase boundaries and pauses, and writes
+which would not change the checkpoint are skipped along with their fsync.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterable, Optional
+import json
+import os
+import struct
+import time
+import zlib
+
+from exercise import Exercise, Rest
+from utils import get_path_to_file
+from workout import Phase, Workout
+
+MAGIC = b"HIIT"
+FORMAT_VERSION = 1
+SLOT_SIZE = 8192
+NUM_SLOTS = 2
+# magic, format version, sequence number, payload length and payload checksum
+HEADER = struct.Struct("<4sBQII")
+# phase index, seconds remaining, phase duration, stations, paused, saved at
+POSITION = struct.Struct("<IIIH?d")
+# index into the exercise names of a rest phase
+REST_INDEX = -1
+
+
+def encode_workout(workout_name: str, workout: Iterable[Phase]) -> bytes:
+    """Encode phases as exercise names and (name index, duration) pairs."""
+    exercises: dict[tuple[str, bool], int] = {}
+    phases = []
+    for phase in workout:
+        if isinstance(phase.type, Exercise):
+            key = (phase.type.name, phase.type.single_handed_variations)
+            index = exercises.setdefault(key, len(exercises))
+        else:
+            index = REST_INDEX
+        phases += [index, phase.duration_seconds]
+    data = {"name": workout_name, "exercises": list(exercises), "phases": phases}
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+
+
+def decode_workout(blob: bytes) -> tuple[str, Workout]:
+    """Decode phases encoded by `encode_workout`."""
+    data = json.loads(zlib.decompress(blob))
+    exercises = [
+        Exercise(name, single_handed) for name, single_handed in data["exercises"]
+    ]
+    rest = Rest()
+    phases = data["phases"]
+    workout = [
+        Phase(duration_seconds, rest if index == REST_INDEX else exercises[index])
+        for index, duration_seconds in zip(phases[::2], phases[1::2])
+    ]
+    return data["name"], workout
+
+
+@dataclass
+class Checkpoint:
+    """A session as it was checkpointed."""
+
+    workout_name: str
+    workout: Workout
+    phase_index: int
+    remaining_seconds: int
+    phase_duration_seconds: int
+    paused: bool
+    num_stations: int
+    saved_at: float
+
+
+class SessionCheckpointer:
+    """Double-buffered checkpoints of one session at a time, see module docstring."""
+
+    def __init__(
+        self,
+        path: Path = Path("src") / "data" / "session.checkpoint",
+        slot_size: int = SLOT_SIZE,
+    ):
+        self.path = get_path_to_file(path)
+        self.slot_size = slot_size
+        self.file: Optional[IO[bytes]] = None
+        # sequence number and slot of the newest checkpoint written
+        self.sequence = 0
+        self.slot = NUM_SLOTS - 1
+        self.workout_blob: Optional[bytes] = None
+        self.num_stations = 0
+        # what the newest checkpoint holds, besides when it was saved
+        self.last_state: Optional[tuple] = None
+
+    def _open(self) -> IO[bytes]:
+        """Open the file, creating it at its fixed size if need be."""
+        if self.file is not None:
+            return self.file
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        mode = "r+b" if Path(self.path).exists() else "w+b"
+        f: IO[bytes] = open(self.path, mode, buffering=0)
+        if os.fstat(f.fileno()).st_size != NUM_SLOTS * self.slot_size:
+            f.truncate(NUM_SLOTS * self.slot_size)
+        self.file = f
+        return f
+
+    def _read_slot(self, slot: int) -> Optional[tuple[int, bytes]]:
+        """Get the sequence number and payload of a slot, None if not intact."""
+        f = self._open()
+        f.seek(slot * self.slot_size)
+        data = f.read(self.slot_size)
+        if len(data) < HEADER.size:
+            return None
+        magic, version, sequence, length, checksum = HEADER.unpack_from(data)
+        payload = data[HEADER.size : HEADER.size + length]
+        if (
+            magic != MAGIC
+            or version != FORMAT_VERSION
+            or len(payload) != length
+            or zlib.crc32(payload) != checksum
+        ):
+            return None
+        return sequence, payload
+
+    def load(self) -> Optional[Checkpoint]:
+        """Get the newest intact checkpoint, None if no session was in progress.
+
+        Later checkpoints follow on from it, keeping its encoded phases.
+        """
+        newest: Optional[tuple[int, bytes]] = None
+        for slot in range(NUM_SLOTS):
+            contents = self._read_slot(slot)
+            if contents is not None and (newest is None or contents[0] > newest[0]):
+                newest, self.slot = contents, slot
+        if newest is None:
+            return None
+        self.sequence, payload = newest
+        if not payload:
+            self.last_state = ()
+            return None
+
+        (
+            phase_index,
+            remaining_seconds,
+            phase_duration_seconds,
+            num_stations,
+            paused,
+            saved_at,
+        ) = POSITION.unpack_from(payload)
+        blob = payload[POSITION.size :]
+        try:
+            workout_name, workout = decode_workout(blob)
+        except (zlib.error, ValueError, KeyError, TypeError):
+            return None
+        self.workout_blob, self.num_stations = blob, num_stations
+        self.last_state = (
+            phase_index,
+            remaining_seconds,
+            phase_duration_seconds,
+            paused,
+        )
+        return Checkpoint(
+            workout_name=workout_name,
+            workout=workout,
+            phase_index=phase_index,
+            remaining_seconds=remaining_seconds,
+            phase_duration_seconds=phase_duration_seconds,
+            paused=paused,
+            num_stations=num_stations,
+            saved_at=saved_at,
+        )
+
+    def start(
+        self, workout_name: str, workout: Iterable[Phase], num_stations: int = 0
+    ) -> bool:
+        """Encode the phases of a new session, for its checkpoints to include.
+
+        Returns False, and the session is not checkpointed, if the phases do
+        not fit in a slot.
+        """
+        blob = encode_workout(workout_name, workout)
+        if HEADER.size + POSITION.size + len(blob) > self.slot_size:
+            self.workout_blob = None
+            return False
+        self.workout_blob, self.num_stations = blob, num_stations
+        self.last_state = None
+        return True
+
+    def save(
+        self,
+        phase_index: int,
+        remaining_seconds: int,
+        phase_duration_seconds: int,
+        paused: bool,
+    ) -> bool:
+        """Checkpoint the position within the session, returning if written."""
+        if self.workout_blob is None:
+            return False
+        state = (phase_index, remaining_seconds, phase_duration_seconds, paused)
+        if state == self.last_state:
+            return False
+        position = POSITION.pack(*state[:3], self.num_stations, paused, time.time())
+        self._write(position + self.workout_blob)
+        self.last_state = state
+        return True
+
+    def clear(self):
+        """Record that no session is in progress."""
+        self.workout_blob = None
+        if self.last_state == ():
+            return
+        self._write(b"")
+        self.last_state = ()
+
+    def _write(self, payload: bytes):
+        """Write a payload to the older slot and wait until it is on disk."""
+        f = self._open()
+        sequence, slot = self.sequence + 1, (self.slot + 1) % NUM_SLOTS
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, sequence, len(payload), zlib.crc32(payload)
+        )
+        f.seek(slot * self.slot_size)
+        f.write(header + payload)
+        # the file never changes size, so only its data needs syncing
+        getattr(os, "fdatasync", os.fsync)(f.fileno())
+        self.sequence, self.slot = sequence, slot
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -1,9 +1,9 @@
 """Functions and structs for creating workouts."""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-import json
-
+from typing import Iterable, Iterator, Optional
 
+from persistence import BackgroundWriter, Version, get_store, persist
 from utils import get_path_to_file
 
 
@@ -13,6 +13,12 @@ class Exercise:
 
     name: str
     single_handed_variations: bool
+    # relative chance of being picked when generating a workout
+    weight: float = 1.0
+    # e.g. muscle groups, equipment and intensity such as "legs", "kettlebell"
+    tags: list[str] = field(default_factory=list)
+    # demo image or animation, relative to src/assets/exercises unless absolute
+    media: Optional[str] = None
 
 
 @dataclass
@@ -23,14 +29,23 @@ class Rest:
 
 
 class ExerciseManager:
-    """Manages available exercises."""
+    """Manages available exercises.
+
+    If a background writer is given, changes are reflected in memory
+    straight away while the file is written by the writer thread. Changes
+    published by other processes are picked up by `reload_if_changed`.
+    """
 
     def __init__(
         self,
         path: Path = Path("src") / "data" / "exercises.json",
+        writer: Optional[BackgroundWriter] = None,
     ):
         self.path = get_path_to_file(path)
+        self.writer = writer
+        self.version: Optional[Version] = None
         self.exercises = self.load_exercises()
+        self.build_tag_index()
 
     def __len__(self) -> int:
         return len(self.exercises)
@@ -44,33 +59,147 @@ class ExerciseManager:
     def load_exercises(self) -> dict[str, Exercise]:
         """Load all possible exercises."""
         exercises = {}
-        with open(self.path, "r") as f:
-            for exercise_name, metadata in json.load(f).items():
-                exercises[exercise_name] = Exercise(
-                    exercise_name, metadata["single_handed_variations"]
-                )
+        self.version, library = get_store(self.path).read()
+        for exercise_name, metadata in library.items():
+            exercises[exercise_name] = Exercise(
+                exercise_name,
+                metadata["single_handed_variations"],
+                metadata.get("weight", 1.0),
+                list(metadata.get("tags", [])),
+                metadata.get("media"),
+            )
         return exercises
 
-    def add_exercise(self, exercise: Exercise):
-        """Add an exercise to the library of all exercises."""
-        self.exercises[exercise.name] = exercise
+    def reload_if_changed(self) -> bool:
+        """Reload exercises if another version of the file has been published.
 
-        with open(self.path, "r") as f:
-            exercises = json.load(f)
+        Nothing is reloaded while our own edits are waiting to be written,
+        as they would be missing from the file. Returns whether reloaded.
+        """
+        if self.writer is not None and self.writer.has_pending(Path(self.path)):
+            return False
+        if get_store(self.path).version() == self.version:
+            return False
+        self.exercises = self.load_exercises()
+        self.build_tag_index()
+        return True
+
+    def build_tag_index(self):
+        """Index exercises by tag as bitsets over exercise slots.
+
+        Each exercise owns a slot, i.e. a bit position, and each tag maps to
+        the bitset of slots of exercises with that tag. Filtering by tags is
+        then a handful of bitwise operations rather than a scan of exercises.
+        Slots of removed exercises are reused by later additions.
+        """
+        self.slots: list[Optional[str]] = []
+        self.slot_indices: dict[str, int] = {}
+        self.free_slots: list[int] = []
+        self.all_bitset = 0
+        self.single_handed_bitset = 0
+        self.tag_bitsets: dict[str, int] = {}
+        for exercise in self.exercises.values():
+            self._index_exercise(exercise)
+
+    def _index_exercise(self, exercise: Exercise):
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.slots[slot] = exercise.name
+        else:
+            slot = len(self.slots)
+            self.slots.append(exercise.name)
+        self.slot_indices[exercise.name] = slot
+
+        bit = 1 << slot
+        self.all_bitset |= bit
+        if exercise.single_handed_variations:
+            self.single_handed_bitset |= bit
+        for tag in exercise.tags:
+            self.tag_bitsets[tag] = self.tag_bitsets.get(tag, 0) | bit
+
+    def _unindex_exercise(self, exercise: Exercise):
+        slot = self.slot_indices.pop(exercise.name)
+        self.slots[slot] = None
+        self.free_slots.append(slot)
+
+        bit = 1 << slot
+        self.all_bitset &= ~bit
+        self.single_handed_bitset &= ~bit
+        for tag in exercise.tags:
+            self.tag_bitsets[tag] &= ~bit
+            if not self.tag_bitsets[tag]:
+                del self.tag_bitsets[tag]
+
+    @property
+    def tags(self) -> set[str]:
+        """All tags used by at least one exercise."""
+        return set(self.tag_bitsets)
+
+    def tag_bitset(self, tag: str) -> int:
+        """Get the bitset of exercises with a tag."""
+        return self.tag_bitsets.get(tag, 0)
+
+    def filter_bitset(
+        self, with_tags: Iterable[str] = (), without_tags: Iterable[str] = ()
+    ) -> int:
+        """Get the bitset of exercises with all of some tags and none of others."""
+        bitset = self.all_bitset
+        for tag in with_tags:
+            bitset &= self.tag_bitset(tag)
+        for tag in without_tags:
+            bitset &= ~self.tag_bitset(tag)
+        return bitset
+
+    def names_in_bitset(self, bitset: int) -> Iterator[str]:
+        """Get names of exercises in a bitset, visiting only the set bits."""
+        while bitset:
+            lowest_bit = bitset & -bitset
+            name = self.slots[lowest_bit.bit_length() - 1]
+            assert name is not None
+            yield name
+            bitset ^= lowest_bit
+
+    def filter_exercises(
+        self, with_tags: Iterable[str] = (), without_tags: Iterable[str] = ()
+    ) -> list[str]:
+        """Get names of exercises with all of some tags and none of others."""
+        return list(self.names_in_bitset(self.filter_bitset(with_tags, without_tags)))
 
-        exercises[exercise.name] = {
-            "single_handed_variations": exercise.single_handed_variations
-        }
-        with open(self.path, "w") as f:
-            json.dump(exercises, f)
+    def add_exercise(self, exercise: Exercise):
+        """Add an exercise to the library of all exercises."""
+        self.apply_changes(upserts=[exercise])
 
     def remove_exercise(self, exercise_name: str):
         """Remove an exercise from the library of all exercises."""
-        del self.exercises[exercise_name]
+        self.apply_changes(removals=[exercise_name])
 
-        with open(self.path, "r") as f:
-            exercises = json.load(f)
-
-        del exercises[exercise_name]
-        with open(self.path, "w") as f:
-            json.dump(exercises, f)
+    def apply_changes(
+        self, upserts: Iterable[Exercise] = (), removals: Iterable[str] = ()
+    ):
+        """Add (or update) and remove exercises with a single write."""
+        upserts, removals = list(upserts), list(removals)
+        for exercise_name in removals:
+            self._unindex_exercise(self.exercises.pop(exercise_name))
+        for exercise in upserts:
+            if exercise.name in self.exercises:
+                self._unindex_exercise(self.exercises[exercise.name])
+            self.exercises[exercise.name] = exercise
+            self._index_exercise(exercise)
+
+        serialised = {}
+        for exercise in upserts:
+            serialised[exercise.name] = {
+                "single_handed_variations": exercise.single_handed_variations,
+                "weight": exercise.weight,
+                "tags": exercise.tags,
+            }
+            if exercise.media:
+                serialised[exercise.name]["media"] = exercise.media
+
+        def mutate(exercises: dict):
+            # another process may have removed it already
+            for exercise_name in removals:
+                exercises.pop(exercise_name, None)
+            exercises.update(serialised)
+
+        persist(self.path, mutate, self.writer)
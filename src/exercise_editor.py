@@ -1,21 +1,30 @@
 """Module for GUI window to edit exercises."""
+from typing import Callable
+import dataclasses
+
 import customtkinter
 import tkinter
 
-from exercise import Exercise, ExerciseManager
+from exercise import Exercise
+from gui_components import SearchPicker, StagedChangesPanel
+from staging import StagedChanges
 
 
 class ExerciseEditor:
-    """Window that allows editing exercises."""
+    """Window that allows editing exercises.
+
+    Edits are staged and only written once saved. The window is created once
+    and hidden when closed, then refreshed from the staged edits when shown.
+    """
 
     def __init__(
-        self, parent, exercise_manager: ExerciseManager, exercises_in_workouts: set[str]
+        self, parent, staged_changes: StagedChanges, on_commit_callback: Callable
     ):
         self.window = customtkinter.CTkToplevel(parent)
         self.window.title("Edit exercises")
-        self.exercise_manager = exercise_manager
-        self.exercises_in_workouts = exercises_in_workouts
-        self.window.geometry("400x400")
+        self.staged_changes = staged_changes
+        self.window.geometry("400x800")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
 
         self.add_exercise_label = customtkinter.CTkLabel(
             self.window, text="Add exercise", font=("roboto", 24)
@@ -34,6 +43,20 @@ class ExerciseEditor:
         )
         self.single_handed_checkbox.pack(padx=20, pady=10)
 
+        self.new_exercise_tags = customtkinter.CTkEntry(
+            self.window,
+            placeholder_text="Tags, comma-separated",
+            width=200,
+        )
+        self.new_exercise_tags.pack(side="top", padx=10, pady=10)
+
+        self.new_exercise_media = customtkinter.CTkEntry(
+            self.window,
+            placeholder_text="Demo image or GIF (optional)",
+            width=200,
+        )
+        self.new_exercise_media.pack(side="top", padx=10, pady=10)
+
         self.add_exercise_button = customtkinter.CTkButton(
             master=self.window, command=self.add_exercise, text="Add"
         )
@@ -44,8 +67,10 @@ class ExerciseEditor:
         )
         self.remove_exercise_label.pack(side="top", fill="both", padx=10, pady=10)
 
-        self.exercises_dropdown = customtkinter.CTkOptionMenu(
-            master=self.window, values=list(self.exercise_manager.exercises.keys())
+        self.exercises_dropdown = SearchPicker(
+            parent=self.window,
+            values=self.staged_changes.staged_exercise_names(),
+            placeholder_text="Search exercises...",
         )
         self.exercises_dropdown.pack(padx=10, pady=10)
 
@@ -54,26 +79,73 @@ class ExerciseEditor:
         )
         self.remove_exercise_button.pack(padx=10, pady=10)
 
-    def update_exercises_dropdown(self):
-        """Update the exercises in the dropdown for removal."""
-        values = list(self.exercise_manager.exercises.keys())
-        self.exercises_dropdown.set(values[0])
-        self.exercises_dropdown.configure(values=values)
+        self.staged_changes_panel = StagedChangesPanel(
+            parent=self.window,
+            staged_changes=self.staged_changes,
+            on_change=self.refresh,
+            on_commit=on_commit_callback,
+        )
+        self.staged_changes_panel.pack(fill="x", padx=10, pady=10)
+
+    def show(self):
+        """Show the window with up-to-date exercises."""
+        self.refresh()
+        self.window.deiconify()
+        self.window.lift()
+        self.window.focus()
+
+    def hide(self):
+        """Hide the window, keeping it for next time."""
+        self.window.withdraw()
+
+    def refresh(self):
+        """Update the dropdown and staged edits, only touching what changed."""
+        self.exercises_dropdown.sync(self.staged_changes.staged_exercise_names())
+        self.staged_changes_panel.refresh()
 
     def add_exercise(self):
-        """Add an exercise."""
+        """Stage adding an exercise, or updating one with the same name.
+
+        An updated exercise keeps its weight, and its tags and media unless
+        new ones are entered.
+        """
         exercise_name = self.new_exercise_name.get("0.0", "end").rstrip()
         has_single_handed_variations = (
             self.new_exercise_has_single_handed_variations.get()
         )
-        exercise = Exercise(exercise_name, has_single_handed_variations)
-        self.exercise_manager.add_exercise(exercise)
+        tags = [
+            tag.strip()
+            for tag in self.new_exercise_tags.get().split(",")
+            if tag.strip()
+        ]
+        media = self.new_exercise_media.get().strip() or None
+        existing = self.staged_changes.staged_exercise(exercise_name)
+        if existing is None:
+            exercise = Exercise(
+                exercise_name, has_single_handed_variations, tags=tags, media=media
+            )
+        else:
+            exercise = dataclasses.replace(
+                existing,
+                single_handed_variations=has_single_handed_variations,
+                tags=tags or existing.tags,
+                media=media or existing.media,
+            )
+        self.staged_changes.add_exercise(exercise)
         self.new_exercise_name.delete("0.0", "end")
-        self.update_exercises_dropdown()
+        self.new_exercise_tags.delete(0, "end")
+        self.new_exercise_media.delete(0, "end")
+        self.exercises_dropdown.add(exercise_name)
+        self.staged_changes_panel.refresh()
 
     def remove_exercise(self):
-        """Remove an exercise."""
+        """Stage removing an exercise.
+
+        Whether the exercise is still used by a workout is checked on saving,
+        as staged workout edits might stop using it.
+        """
         to_remove = self.exercises_dropdown.get()
-        if to_remove not in self.exercises_in_workouts:
-            self.exercise_manager.remove_exercise(to_remove)
-            self.update_exercises_dropdown()
+        if to_remove is not None:
+            self.staged_changes.remove_exercise(to_remove)
+            self.exercises_dropdown.remove(to_remove)
+            self.staged_changes_panel.refresh()
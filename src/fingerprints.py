@@ -0,0 +1,175 @@
+"""Fingerprints of generated workouts, to avoid generating the same one twice."""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+import base64
+import hashlib
+import json
+import math
+import time
+
+from exercise import Exercise
+from persistence import BackgroundWriter, persist, read_json_file
+from utils import get_path_to_file
+from workout import Workout
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def workout_fingerprint(workout: Workout) -> bytes:
+    """Hash of the exercises and durations of a workout, in any order.
+
+    Reordering a workout, e.g. to spread out similar exercises, does not
+    make it a different workout, so the phases are sorted first. This also
+    means a workout can be fingerprinted before or after being reordered.
+    """
+    exercises = sorted(
+        [phase.type.name, phase.duration_seconds]
+        for phase in workout
+        if isinstance(phase.type, Exercise)
+    )
+    rests = sorted(
+        phase.duration_seconds
+        for phase in workout
+        if not isinstance(phase.type, Exercise)
+    )
+    canonical = {"exercises": exercises, "rests": rests}
+    return hashlib.sha256(json.dumps(canonical).encode()).digest()
+
+
+class BloomFilter:
+    """Fixed-size set of fingerprints which may give false positives.
+
+    Fingerprints are already uniform hashes, so the bit positions are derived
+    from them directly by double hashing rather than hashing again.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[bytes] = None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = (
+            bytearray(bits) if bits is not None else bytearray((num_bits + 7) // 8)
+        )
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float) -> BloomFilter:
+        """Size a filter to hold `capacity` fingerprints at the given error rate."""
+        num_bits = math.ceil(
+            -capacity * math.log(false_positive_rate) / math.log(2) ** 2
+        )
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def positions(self, fingerprint: bytes) -> list[int]:
+        h1 = int.from_bytes(fingerprint[:8], "big")
+        h2 = int.from_bytes(fingerprint[8:16], "big") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, fingerprint: bytes):
+        for position in self.positions(fingerprint):
+            self.bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return all(
+            self.bits[position // 8] & (1 << (position % 8))
+            for position in self.positions(fingerprint)
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> BloomFilter:
+        return cls(data["num_bits"], data["num_hashes"], base64.b64decode(data["bits"]))
+
+
+class WorkoutFingerprints:
+    """Fingerprints of workouts generated for a profile within a rolling window.
+
+    The window is split into `num_slices` consecutive slices, each with its
+    own Bloom filter. New fingerprints go into the latest slice, and slices
+    are dropped once they fall out of the window, so checks look at a fixed
+    number of filters and the size stays fixed however long the history.
+    """
+
+    def __init__(
+        self,
+        path: Path = Path("src") / "data" / "fingerprints.json",
+        profile: str = "default",
+        window_days: float = 28.0,
+        num_slices: int = 4,
+        capacity_per_slice: int = 500,
+        false_positive_rate: float = 0.01,
+        writer: Optional[BackgroundWriter] = None,
+    ):
+        self.path = get_path_to_file(path)
+        self.profile = profile
+        self.window_seconds = window_days * SECONDS_PER_DAY
+        self.num_slices = num_slices
+        self.capacity_per_slice = capacity_per_slice
+        self.false_positive_rate = false_positive_rate
+        self.writer = writer
+        self.slices = self.load_slices()
+
+    def __len__(self) -> int:
+        return len(self.slices)
+
+    @property
+    def slice_seconds(self) -> float:
+        return self.window_seconds / self.num_slices
+
+    def new_filter(self) -> BloomFilter:
+        return BloomFilter.for_capacity(
+            self.capacity_per_slice, self.false_positive_rate
+        )
+
+    def load_slices(self) -> list[tuple[float, BloomFilter]]:
+        """Load the slices of this profile, if there are any."""
+        profiles = read_json_file(self.path)
+        slices = [
+            (data["start"], BloomFilter.from_dict(data))
+            for data in profiles.get(self.profile, [])
+        ]
+        # filters sized differently cannot be compared, so start afresh
+        num_bits = self.new_filter().num_bits
+        if any(bloom_filter.num_bits != num_bits for _, bloom_filter in slices):
+            return []
+        return slices
+
+    def expire(self, now: float):
+        """Drop slices which have fallen out of the window."""
+        self.slices = [
+            (start, bloom_filter)
+            for start, bloom_filter in self.slices
+            if start + self.slice_seconds > now - self.window_seconds
+        ][-self.num_slices :]
+
+    def contains(self, workout: Workout, now: Optional[float] = None) -> bool:
+        """Whether a workout was probably generated within the window."""
+        if now is None:
+            now = time.time()
+        self.expire(now)
+        fingerprint = workout_fingerprint(workout)
+        return any(fingerprint in bloom_filter for _, bloom_filter in self.slices)
+
+    def add(self, workout: Workout, when: Optional[float] = None):
+        """Record a generated workout, starting a new slice if it is due."""
+        if when is None:
+            when = time.time()
+        self.expire(when)
+        if not self.slices or when >= self.slices[-1][0] + self.slice_seconds:
+            self.slices.append((when, self.new_filter()))
+            self.slices = self.slices[-self.num_slices :]
+        self.slices[-1][1].add(workout_fingerprint(workout))
+
+        serialised = [
+            {"start": start, **bloom_filter.to_dict()}
+            for start, bloom_filter in self.slices
+        ]
+        recorded = {self.profile: serialised}
+        persist(self.path, lambda profiles: profiles.update(recorded), self.writer)
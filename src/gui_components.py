@@ -1,9 +1,23 @@
 """Resuable GUI components."""
-from typing import Optional
+from typing import Callable, Iterable, Optional
+import bisect
+import itertools
+import math
+import time
 
 import customtkinter
 import tkinter
 
+from media import Frames
+from search import SearchIndex
+from staging import StagedChanges
+from stations import StationView
+
+
+def count_widgets(widget) -> int:
+    """Count a widget and all of its descendants."""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
 
 class Slider:
     """Resuable slider component."""
@@ -101,3 +115,463 @@ class NextExercises:
         self.text_box.configure(state=tkinter.NORMAL)
         self.text_box.insert("0.0", "\n".join(exercise_names), "centered")
         self.text_box.configure(state=tkinter.DISABLED)
+
+
+class Timeline:
+    """Strip showing every phase of a workout as a coloured segment.
+
+    Segments are drawn once per workout as items on a single canvas, and
+    progress is shown by moving one marker, so each tick costs the same
+    however many phases there are. Clicking a segment passes the index of
+    its phase to `on_click`.
+    """
+
+    def __init__(
+        self,
+        parent,
+        grid_kwargs: dict,
+        on_click: Callable[[int], None],
+        height: int = 24,
+        marker_colour: str = "white",
+    ):
+        self.on_click = on_click
+        self.height = height
+        self.canvas = tkinter.Canvas(
+            parent, height=height, highlightthickness=0, bg="gray17"
+        )
+        self.canvas.grid(**grid_kwargs)
+        self.canvas.bind("<Button-1>", self.on_canvas_click)
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.width = 1
+        self.phase_starts: list[int] = []
+        self.durations: list[int] = []
+        self.total_seconds = 0
+        self.marker = self.canvas.create_line(
+            0, 0, 0, height, fill=marker_colour, width=3
+        )
+        self.canvas.itemconfigure(self.marker, state=tkinter.HIDDEN)
+
+    def build(self, durations: list[int], colours: list[str]):
+        """Draw a segment for each phase, replacing any previous workout."""
+        self.clear()
+        self.durations = durations
+        self.phase_starts = [0] + list(itertools.accumulate(durations))[:-1]
+        self.total_seconds = sum(durations)
+        if self.total_seconds == 0:
+            return
+        scale = self.width / self.total_seconds
+        for start, duration, colour in zip(self.phase_starts, durations, colours):
+            self.canvas.create_rectangle(
+                start * scale,
+                0,
+                (start + duration) * scale,
+                self.height,
+                fill=colour,
+                outline="gray17",
+                tags="segment",
+            )
+        self.canvas.tag_raise(self.marker)
+        self.canvas.itemconfigure(self.marker, state=tkinter.NORMAL)
+
+    def clear(self):
+        """Remove all segments and hide the marker."""
+        self.canvas.delete("segment")
+        self.canvas.itemconfigure(self.marker, state=tkinter.HIDDEN)
+        self.phase_starts = []
+        self.durations = []
+        self.total_seconds = 0
+
+    def set_progress(self, phase_index: int, elapsed_seconds: int):
+        """Move the marker to a point within a phase."""
+        if not 0 <= phase_index < len(self.phase_starts):
+            return
+        elapsed_seconds = min(max(0, elapsed_seconds), self.durations[phase_index])
+        x = (self.phase_starts[phase_index] + elapsed_seconds) * (
+            self.width / self.total_seconds
+        )
+        self.canvas.coords(self.marker, x, 0, x, self.height)
+
+    def on_canvas_click(self, event):
+        if not self.phase_starts:
+            return
+        seconds = event.x * self.total_seconds / self.width
+        phase_index = bisect.bisect_right(self.phase_starts, seconds) - 1
+        self.on_click(min(max(0, phase_index), len(self.phase_starts) - 1))
+
+    def on_resize(self, event):
+        """Stretch the existing items to the new width rather than redrawing."""
+        if event.width > 1 and event.width != self.width:
+            self.canvas.scale("all", 0, 0, event.width / self.width, 1)
+            self.width = event.width
+
+
+class StationBoard:
+    """Windows showing every station of a circuit class, e.g. one per display.
+
+    Stations are split evenly between the windows, which are laid out once,
+    so each tick of the class countdown costs one label update per station.
+    Closing a window hides it until the next class starts.
+    """
+
+    def __init__(self, parent, num_stations: int, num_windows: int = 1):
+        num_windows = max(1, min(num_windows, num_stations))
+        stations_per_window = math.ceil(num_stations / num_windows)
+        self.windows: list[customtkinter.CTkToplevel] = []
+        self.panels: list[dict[str, customtkinter.CTkLabel]] = []
+        self.frames: list[customtkinter.CTkFrame] = []
+        for first in range(0, num_stations, stations_per_window):
+            stations = range(first, min(first + stations_per_window, num_stations))
+            window = customtkinter.CTkToplevel(parent)
+            window.title(f"Stations {stations[0] + 1}-{stations[-1] + 1}")
+            window.protocol("WM_DELETE_WINDOW", window.withdraw)
+            num_columns = math.ceil(math.sqrt(len(stations)))
+            for position, station in enumerate(stations):
+                row, column = divmod(position, num_columns)
+                window.grid_rowconfigure(row, weight=1)
+                window.grid_columnconfigure(column, weight=1)
+                frame = customtkinter.CTkFrame(window, corner_radius=0)
+                frame.grid(row=row, column=column, padx=5, pady=5, sticky="nsew")
+                panel = {}
+                for name, font_size in [
+                    ("title", 24),
+                    ("exercise", 36),
+                    ("group", 24),
+                    ("clock", 72),
+                ]:
+                    panel[name] = customtkinter.CTkLabel(
+                        master=frame, text="", font=("roboto", font_size)
+                    )
+                    panel[name].pack(expand=True)
+                panel["title"].configure(text=f"Station {station + 1}")
+                self.frames.append(frame)
+                self.panels.append(panel)
+            self.windows.append(window)
+
+    def open(self):
+        """Show any windows which were closed."""
+        for window in self.windows:
+            window.deiconify()
+
+    def show(self, stations: list[StationView], colour: str, is_rest: bool):
+        """Show which group is at each station doing what, after a phase change.
+
+        During a rest, stations show the group moving to them and what it will
+        do next.
+        """
+        for frame, panel, view in zip(self.frames, self.panels, stations):
+            if view.exercise_name is None:
+                exercise, group = "Free", f"Group {view.group} rests"
+            elif is_rest:
+                exercise = f"Next: {view.exercise_name}"
+                group = f"Group {view.group} moves here"
+            else:
+                exercise, group = view.exercise_name, f"Group {view.group}"
+            frame.configure(fg_color=colour)
+            panel["exercise"].configure(text=exercise)
+            panel["group"].configure(text=group)
+
+    def set_clock(self, seconds: int):
+        """Show the seconds remaining in the current phase at every station."""
+        for panel in self.panels:
+            panel["clock"].configure(text=str(seconds))
+
+    def clear(self):
+        """Clear every station, e.g. when the class ends."""
+        for frame, panel in zip(self.frames, self.panels):
+            frame.configure(fg_color="gray17")
+            for name in ("exercise", "group", "clock"):
+                panel[name].configure(text="")
+
+
+class DemoPlayer:
+    """Label playing the demo image or animation of an exercise.
+
+    The frame shown is picked from the time since playback started, so a
+    late callback skips ahead rather than letting playback drift, and each
+    callback only swaps one image. Frames are converted for Tk once, the
+    first time each is shown.
+    """
+
+    def __init__(self, parent, **place_kwargs):
+        self.label = customtkinter.CTkLabel(master=parent, text="")
+        self.place_kwargs = place_kwargs
+        self.frames: Optional[Frames] = None
+        self.images: list[Optional[customtkinter.CTkImage]] = []
+        self.index = -1
+        self.started = 0.0
+        self.callback: Optional[str] = None
+
+    def play(self, frames: Frames):
+        """Play frames from the start, looping if animated."""
+        self._cancel()
+        if frames is not self.frames:
+            self.frames = frames
+            self.images = [None] * len(frames.images)
+        self.index = -1
+        self.started = time.monotonic()
+        self.label.place(**self.place_kwargs)
+        self.show_frame()
+
+    def show_frame(self):
+        """Show the frame due now and schedule the next one, if animated."""
+        frames = self.frames
+        if frames is None:
+            return
+        elapsed_milliseconds = (time.monotonic() - self.started) * 1000
+        index, wait_milliseconds = frames.frame_at(elapsed_milliseconds)
+        if index != self.index:
+            self.label.configure(image=self.image(frames, index))
+            self.index = index
+        self.callback = None
+        if frames.animated:
+            self.callback = self.label.after(
+                max(1, math.ceil(wait_milliseconds)), self.show_frame
+            )
+
+    def image(self, frames: Frames, index: int) -> customtkinter.CTkImage:
+        image = self.images[index]
+        if image is None:
+            frame = frames.images[index]
+            image = customtkinter.CTkImage(frame, size=frame.size)
+            self.images[index] = image
+        return image
+
+    def _cancel(self):
+        if self.callback is not None:
+            self.label.after_cancel(self.callback)
+            self.callback = None
+
+    def stop(self):
+        """Stop playing and hide the label."""
+        self._cancel()
+        self.label.place_forget()
+        self.index = -1
+
+
+class SearchPicker:
+    """Searchable list to pick a value from, e.g. an exercise or workout.
+
+    Typing in the entry filters the values via a search index, which is
+    updated incrementally as values are added or removed. Only a fixed number
+    of rows is rendered and scrolling reuses them, so the cost of showing the
+    picker does not grow with the number of values.
+    """
+
+    def __init__(
+        self,
+        parent,
+        values: Iterable[str],
+        command: Optional[Callable[[str], None]] = None,
+        visible_rows: int = 6,
+        placeholder_text: str = "Search...",
+        width: int = 200,
+    ):
+        self.command = command
+        self.index = SearchIndex(values)
+        self.results: list[str] = []
+        self.offset = 0
+        self.selected: Optional[str] = None
+
+        self.frame = customtkinter.CTkFrame(parent, corner_radius=0)
+        self.entry = customtkinter.CTkEntry(
+            master=self.frame, placeholder_text=placeholder_text, width=width
+        )
+        self.entry.grid(row=0, column=0, columnspan=2, padx=5, pady=5)
+        self.entry.bind("<KeyRelease>", self.on_query_change)
+        self.entry.bind("<Return>", self.on_return)
+
+        self.rows = []
+        for row_index in range(visible_rows):
+            row = customtkinter.CTkButton(
+                master=self.frame,
+                text="",
+                width=width - 20,
+                height=24,
+                anchor="w",
+                fg_color="transparent",
+                command=lambda row_index=row_index: self.on_row_click(row_index),
+            )
+            row.grid(row=row_index + 1, column=0, padx=5, pady=1)
+            row.bind("<MouseWheel>", self.on_mouse_wheel)
+            self.rows.append(row)
+
+        self.scrollbar = customtkinter.CTkScrollbar(
+            master=self.frame, command=self.on_scroll
+        )
+        self.scrollbar.grid(row=1, column=1, rowspan=visible_rows, sticky="ns")
+        self.refresh_results()
+
+    def pack(self, **kwargs):
+        """Pack the picker into its parent."""
+        self.frame.pack(**kwargs)
+
+    def get(self) -> Optional[str]:
+        """Get the selected value."""
+        return self.selected
+
+    def set(self, value: Optional[str]):
+        """Select a value without calling the command."""
+        self.selected = value
+        self.render_rows()
+
+    def add(self, value: str):
+        """Add a value to pick from."""
+        self.index.add(value)
+        self.refresh_results()
+
+    def remove(self, value: str):
+        """Remove a value to pick from, deselecting it if needed."""
+        self.index.remove(value)
+        if self.selected == value:
+            self.selected = None
+        self.refresh_results()
+
+    def sync(self, values: Iterable[str]):
+        """Update the values to pick from, only touching those that changed."""
+        self.index.sync(values)
+        if self.selected is not None and self.selected not in self.index:
+            self.selected = None
+        self.refresh_results()
+
+    def refresh_results(self):
+        """Re-run the search for the current query and show the first rows."""
+        self.results = self.index.search(self.entry.get())
+        self.offset = 0
+        self.render_rows()
+
+    def render_rows(self):
+        """Show the results visible at the current scroll offset."""
+        visible = self.results[self.offset : self.offset + len(self.rows)]
+        for row_index, row in enumerate(self.rows):
+            if row_index < len(visible):
+                value = visible[row_index]
+                row.configure(
+                    text=value,
+                    state=tkinter.NORMAL,
+                    fg_color=(
+                        ("#3B8ED0", "#1F6AA5")
+                        if value == self.selected
+                        else "transparent"
+                    ),
+                )
+            else:
+                row.configure(text="", state=tkinter.DISABLED, fg_color="transparent")
+
+        if self.results:
+            first = self.offset / len(self.results)
+            last = min(1.0, (self.offset + len(self.rows)) / len(self.results))
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def scroll_to(self, offset: int):
+        """Scroll so that the result at an offset is the first visible row."""
+        max_offset = max(0, len(self.results) - len(self.rows))
+        self.offset = min(max(0, offset), max_offset)
+        self.render_rows()
+
+    def on_scroll(self, action: str, amount: str, unit: Optional[str] = None):
+        """Handle a scrollbar drag ("moveto") or step ("scroll")."""
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.results)))
+        else:
+            step = len(self.rows) if unit == "pages" else 1
+            self.scroll_to(self.offset + int(amount) * step)
+
+    def on_mouse_wheel(self, event):
+        """Scroll one row per wheel notch."""
+        self.scroll_to(self.offset + (-1 if event.delta > 0 else 1))
+
+    def on_query_change(self, event=None):
+        """Filter the values after the query was edited."""
+        self.refresh_results()
+
+    def on_return(self, event=None):
+        """Pick the best match for the query."""
+        if self.results:
+            self.pick(self.results[0])
+
+    def on_row_click(self, row_index: int):
+        """Pick the value shown in a row."""
+        result_index = self.offset + row_index
+        if result_index < len(self.results):
+            self.pick(self.results[result_index])
+
+    def pick(self, value: str):
+        """Select a value and call the command with it."""
+        self.set(value)
+        if self.command is not None:
+            self.command(value)
+
+
+class StagedChangesPanel:
+    """Diff view of staged edits with buttons to undo, discard or save them."""
+
+    def __init__(
+        self,
+        parent,
+        staged_changes: StagedChanges,
+        on_change: Callable[[], None],
+        on_commit: Callable[[], None],
+    ):
+        self.staged_changes = staged_changes
+        self.on_change = on_change
+        self.on_commit = on_commit
+
+        self.frame = customtkinter.CTkFrame(parent, corner_radius=0)
+        self.diff_text_box = customtkinter.CTkTextbox(
+            master=self.frame, state=tkinter.DISABLED, height=100
+        )
+        self.diff_text_box.pack(fill="x", padx=10, pady=10)
+
+        self.buttons = customtkinter.CTkFrame(self.frame, corner_radius=0)
+        self.buttons.pack()
+        for text, command in (
+            ("Undo", self.undo),
+            ("Discard", self.discard),
+            ("Save", self.save),
+        ):
+            customtkinter.CTkButton(
+                master=self.buttons, command=command, text=text, width=80
+            ).pack(padx=5, pady=10, side="left")
+        self.refresh()
+
+    def pack(self, **kwargs):
+        """Pack the panel into its parent."""
+        self.frame.pack(**kwargs)
+
+    def grid(self, **kwargs):
+        """Grid the panel into its parent."""
+        self.frame.grid(**kwargs)
+
+    def refresh(self, errors: Optional[list[str]] = None):
+        """Show the staged edits and any problems with them."""
+        lines = self.staged_changes.diff() or ["No unsaved changes"]
+        if errors:
+            lines += [""] + errors
+        self.diff_text_box.configure(state=tkinter.NORMAL)
+        self.diff_text_box.delete("0.0", "end")
+        self.diff_text_box.insert("0.0", "\n".join(lines))
+        self.diff_text_box.configure(state=tkinter.DISABLED)
+
+    def undo(self):
+        """Undo the latest staged edit."""
+        self.staged_changes.undo()
+        self.refresh()
+        self.on_change()
+
+    def discard(self):
+        """Discard all staged edits."""
+        self.staged_changes.discard()
+        self.refresh()
+        self.on_change()
+
+    def save(self):
+        """Save all staged edits if they are valid, otherwise show why not."""
+        try:
+            self.staged_changes.commit()
+        except ValueError as error:
+            self.refresh(errors=str(error).split("\n"))
+            return
+        self.refresh()
+        self.on_commit()
@@ -0,0 +1,325 @@
+"""Heart rate input, read on a background thread, for adapting rests.
+
+A source is anything iterable over heart rate samples in beats per minute
+with a `close` method to stop it, e.g. a stream of lines from a file or a
+socket, or a simulator. Sources are given as strings such as
+
+    simulator
+    file:/path/to/samples.txt
+    tcp://localhost:5005
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional, TextIO
+import math
+import random
+import socket
+import threading
+import time
+
+# long enough for a sensor bridge on the local network to accept
+CONNECT_TIMEOUT_SECONDS = 5.0
+
+
+class RingBuffer:
+    """Fixed-size buffer of the latest values with O(1) rolling statistics.
+
+    Running sums are updated as values are added and overwritten, so the
+    mean and standard deviation never need a pass over the buffer.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be positive")
+        self.capacity = capacity
+        self.values: list[float] = [0.0] * capacity
+        self.next_index = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_of_squares = 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, value: float):
+        """Add a value, overwriting the oldest if the buffer is full."""
+        if self.count == self.capacity:
+            oldest = self.values[self.next_index]
+            self.total -= oldest
+            self.total_of_squares -= oldest * oldest
+        else:
+            self.count += 1
+        self.values[self.next_index] = value
+        self.total += value
+        self.total_of_squares += value * value
+        self.next_index = (self.next_index + 1) % self.capacity
+
+    @property
+    def latest(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        return self.values[self.next_index - 1]
+
+    @property
+    def mean(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    @property
+    def std(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        mean = self.total / self.count
+        # clamp rounding error which can make the variance slightly negative
+        return math.sqrt(max(0.0, self.total_of_squares / self.count - mean * mean))
+
+
+@dataclass
+class HeartRateStats:
+    """Snapshot of recent heart rate samples."""
+
+    latest_bpm: float
+    mean_bpm: float
+    std_bpm: float
+    num_samples: int
+
+
+class StreamHeartRateSource:
+    """Samples read from a text stream with one sample per line.
+
+    Lines are either "<bpm>" or "<timestamp>,<bpm>", and lines which cannot
+    be parsed are skipped, e.g. a partial line written by a sensor that was
+    unplugged.
+    """
+
+    def __init__(self, stream: TextIO, connection: Optional[socket.socket] = None):
+        self.stream = stream
+        self.connection = connection
+
+    @classmethod
+    def from_file(cls, path: str) -> StreamHeartRateSource:
+        """Read samples from a file or named pipe."""
+        return cls(open(path, "r"))
+
+    @classmethod
+    def from_socket(
+        cls, host: str, port: int, timeout: float = CONNECT_TIMEOUT_SECONDS
+    ) -> StreamHeartRateSource:
+        """Read samples from a local TCP socket, giving up connecting on a timeout."""
+        connection = socket.create_connection((host, port), timeout=timeout)
+        # samples may be far apart, so once connected reads wait indefinitely
+        connection.settimeout(None)
+        return cls(connection.makefile("r"), connection)
+
+    def __iter__(self) -> Iterator[float]:
+        for line in self.stream:
+            try:
+                yield float(line.strip().split(",")[-1])
+            except ValueError:
+                continue
+
+    def close(self):
+        # shutting down the socket wakes up a reader blocked on it
+        if self.connection is not None:
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.connection.close()
+        self.stream.close()
+
+
+class SimulatedHeartRate:
+    """Heart rate which rises during exercise and recovers during rest.
+
+    The rate moves a fixed fraction of the way to its peak or resting value
+    each sample, with some noise, which is close enough to real recovery
+    curves to exercise adaptive rests without a sensor.
+    """
+
+    def __init__(
+        self,
+        resting_bpm: float = 65.0,
+        peak_bpm: float = 170.0,
+        response: float = 0.1,
+        noise_bpm: float = 2.0,
+        interval_seconds: float = 1.0,
+        rng: Optional[random.Random] = None,
+    ):
+        self.resting_bpm = resting_bpm
+        self.peak_bpm = peak_bpm
+        self.response = response
+        self.noise_bpm = noise_bpm
+        self.interval_seconds = interval_seconds
+        self.rng = rng or random.Random()
+        self.bpm = resting_bpm
+        self.exercising = False
+        self.closed = threading.Event()
+
+    def __iter__(self) -> Iterator[float]:
+        while not self.closed.is_set():
+            target_bpm = self.peak_bpm if self.exercising else self.resting_bpm
+            self.bpm += self.response * (target_bpm - self.bpm)
+            yield self.bpm + self.rng.gauss(0, self.noise_bpm)
+            if self.interval_seconds > 0:
+                self.closed.wait(self.interval_seconds)
+
+    def close(self):
+        self.closed.set()
+
+
+def source_opener(spec: str) -> Callable[[], Any]:
+    """Parse a heart rate source string, see module docstring.
+
+    Parsing is cheap, and raises ValueError for an unknown source, but the
+    returned function which opens the source may block, e.g. opening a
+    named pipe waits for a writer.
+    """
+    if spec == "simulator":
+        return SimulatedHeartRate
+    elif spec.startswith("file:"):
+        path = spec[len("file:") :]
+        return lambda: StreamHeartRateSource.from_file(path)
+    elif spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://") :].rpartition(":")
+        return lambda: StreamHeartRateSource.from_socket(host or "localhost", int(port))
+    raise ValueError(f"Unknown heart rate source {spec!r}")
+
+
+def open_source(spec: str):
+    """Open a heart rate source described by a string, see module docstring."""
+    return source_opener(spec)()
+
+
+class HeartRateMonitor:
+    """Reads samples from a source on a daemon thread into a ring buffer.
+
+    Reading the latest statistics only takes a lock briefly, so it is cheap
+    enough to do on every countdown tick on the Tk thread. Samples older
+    than `max_age_seconds` are treated as stale, e.g. if a sensor drops out.
+
+    A monitor made `from_spec` opens its source on its own thread too, since
+    opening may block, and `source` is None until then. If opening fails,
+    the reason is kept in `error`.
+    """
+
+    def __init__(
+        self,
+        source=None,
+        capacity: int = 10,
+        max_age_seconds: float = 5.0,
+        opener: Optional[Callable[[], Any]] = None,
+    ):
+        if (source is None) == (opener is None):
+            raise ValueError("Give either a heart rate source or its opener")
+        self.source = source
+        self.opener = opener
+        self.error: Optional[str] = None
+        self.buffer = RingBuffer(capacity)
+        self.max_age_seconds = max_age_seconds
+        self.last_sample_time: Optional[float] = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @classmethod
+    def from_spec(cls, spec: str, **kwargs) -> HeartRateMonitor:
+        """Monitor a source described by a string, opened once started."""
+        return cls(opener=source_opener(spec), **kwargs)
+
+    def start(self):
+        self.thread.start()
+
+    def _open(self):
+        """Open the source, None if it failed or the monitor was stopped."""
+        if self.opener is None:
+            return self.source
+        try:
+            source = self.opener()
+        except (OSError, ValueError) as error:
+            self.error = str(error) or type(error).__name__
+            return None
+        with self.lock:
+            if not self.stopped.is_set():
+                self.source = source
+                return source
+        # stopped while opening, so nothing else will close it
+        source.close()
+        return None
+
+    def _run(self):
+        source = self._open()
+        if source is None:
+            return
+        try:
+            for bpm in source:
+                with self.lock:
+                    self.buffer.append(bpm)
+                    self.last_sample_time = time.monotonic()
+        except (OSError, ValueError):
+            # the source was closed or failed, leaving the samples to go stale
+            pass
+
+    def stats(self) -> Optional[HeartRateStats]:
+        """Get statistics of recent samples, or None if there are none."""
+        with self.lock:
+            if (
+                self.last_sample_time is None
+                or time.monotonic() - self.last_sample_time > self.max_age_seconds
+            ):
+                return None
+            latest, mean, std = self.buffer.latest, self.buffer.mean, self.buffer.std
+            # a sample was read, so the buffer is not empty
+            assert latest is not None and mean is not None and std is not None
+            return HeartRateStats(latest, mean, std, len(self.buffer))
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop reading and wait for the thread to finish."""
+        with self.lock:
+            self.stopped.set()
+            source = self.source
+        if source is not None:
+            source.close()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+
+@dataclass
+class AdaptiveRest:
+    """How far rests may change to follow recovery, relative to the plan.
+
+    A rest ends early, after a short lead-in, once the heart rate is at or
+    below the target, and is extended a step at a time while it is above
+    it, between `min_factor` and `max_factor` times the planned duration.
+    """
+
+    target_bpm: float = 120.0
+    min_factor: float = 0.5
+    max_factor: float = 2.0
+    step_seconds: int = 5
+    lead_in_seconds: int = 3
+
+    def adjust(
+        self,
+        planned_seconds: int,
+        elapsed_seconds: int,
+        remaining_seconds: int,
+        stats: Optional[HeartRateStats],
+    ) -> int:
+        """Get the new number of seconds remaining in a rest."""
+        if stats is None:
+            return remaining_seconds
+
+        min_seconds = math.ceil(self.min_factor * planned_seconds)
+        max_seconds = math.floor(self.max_factor * planned_seconds)
+        if stats.mean_bpm <= self.target_bpm:
+            shortened = max(self.lead_in_seconds, min_seconds - elapsed_seconds)
+            return min(remaining_seconds, shortened)
+        elif remaining_seconds <= 1:
+            extension = min(
+                self.step_seconds, max_seconds - elapsed_seconds - remaining_seconds
+            )
+            return remaining_seconds + max(0, extension)
+        return remaining_seconds
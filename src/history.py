@@ -0,0 +1,39 @@
+"""Tracking of when exercises were last done."""
+from pathlib import Path
+from typing import Iterable, Optional
+import time
+
+from persistence import BackgroundWriter, persist, read_json_file
+from utils import get_path_to_file
+
+
+class ExerciseHistory:
+    """Manages when each exercise was last performed."""
+
+    def __init__(
+        self,
+        path: Path = Path("src") / "data" / "history.json",
+        writer: Optional[BackgroundWriter] = None,
+    ):
+        self.path = get_path_to_file(path)
+        self.writer = writer
+        self.last_done_timestamps = self.load_history()
+
+    def __len__(self) -> int:
+        return len(self.last_done_timestamps)
+
+    def load_history(self) -> dict[str, float]:
+        """Load the last time each exercise was done, if there is a history."""
+        return dict(read_json_file(self.path))
+
+    def last_done(self, exercise_name: str) -> Optional[float]:
+        """Get the timestamp an exercise was last done, if ever."""
+        return self.last_done_timestamps.get(exercise_name)
+
+    def record(self, exercise_names: Iterable[str], when: Optional[float] = None):
+        """Record that exercises were done, writing the history once."""
+        if when is None:
+            when = time.time()
+        recorded = {exercise_name: when for exercise_name in exercise_names}
+        self.last_done_timestamps.update(recorded)
+        persist(self.path, lambda history: history.update(recorded), self.writer)
@@ -0,0 +1,146 @@
+"""Kiosk mode: repeating workouts unattended while watching for memory leaks."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, time as time_of_day, timedelta
+from pathlib import Path
+from typing import Optional
+import json
+import tracemalloc
+
+from utils import get_path_to_file
+
+# sessions run before the baseline is taken, so that caches are warm
+WARMUP_SESSIONS = 1
+NUM_SAMPLES_KEPT = 100
+NUM_TOP_ALLOCATIONS = 25
+
+
+def parse_times(text: str) -> list[time_of_day]:
+    """Parse comma separated times of day, e.g. "07:00, 12:30"."""
+    return sorted(
+        datetime.strptime(part.strip(), "%H:%M").time()
+        for part in text.split(",")
+        if part.strip()
+    )
+
+
+@dataclass
+class KioskSchedule:
+    """When to start the next workout: after a gap, or at set times of day."""
+
+    gap_seconds: int = 60
+    times: list[time_of_day] = field(default_factory=list)
+
+    def next_start(self, now: datetime) -> datetime:
+        """Get when the next workout should start after one ends at `now`."""
+        if not self.times:
+            return now + timedelta(seconds=self.gap_seconds)
+        for day in range(2):
+            date = (now + timedelta(days=day)).date()
+            for start_time in self.times:
+                start = datetime.combine(date, start_time)
+                if start > now:
+                    return start
+        raise AssertionError("Some time of day is always within the next day")
+
+
+@dataclass
+class MemorySample:
+    """Memory use after a session."""
+
+    session: int
+    traced_bytes: int
+    peak_traced_bytes: int
+    num_widgets: int
+
+
+class LeakDetector:
+    """Samples traced memory and widget counts after each session.
+
+    A baseline is taken once the app has warmed up. Whenever traced memory
+    or the widget count has grown past a threshold over the baseline, a
+    diagnostic dump is written with the allocations that grew the most, and
+    the threshold moves up so that the same growth is only reported once.
+    Only the latest samples are kept, so the detector is bounded too.
+    """
+
+    def __init__(
+        self,
+        dump_folder: Path = Path("src") / "data" / "diagnostics",
+        growth_threshold_bytes: int = 2 * 1024 * 1024,
+        widget_growth_threshold: int = 20,
+        trace_frames: int = 1,
+    ):
+        self.dump_folder = get_path_to_file(Path(dump_folder))
+        self.growth_threshold_bytes = growth_threshold_bytes
+        self.widget_growth_threshold = widget_growth_threshold
+        self.samples: deque[MemorySample] = deque(maxlen=NUM_SAMPLES_KEPT)
+        self.num_sessions = 0
+        self.baseline: Optional[MemorySample] = None
+        self.baseline_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.next_dump_bytes = 0
+        self.next_dump_widgets = 0
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(trace_frames)
+
+    def close(self):
+        """Stop tracing allocations, if tracing was started here."""
+        if self.started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def record_session(self, num_widgets: int) -> Optional[Path]:
+        """Sample memory after a session, returning the path of any dump."""
+        self.num_sessions += 1
+        traced_bytes, peak_traced_bytes = tracemalloc.get_traced_memory()
+        sample = MemorySample(
+            self.num_sessions, traced_bytes, peak_traced_bytes, num_widgets
+        )
+        self.samples.append(sample)
+
+        if self.num_sessions == WARMUP_SESSIONS:
+            self.baseline = sample
+            self.baseline_snapshot = self.take_snapshot()
+            self.next_dump_bytes = traced_bytes + self.growth_threshold_bytes
+            self.next_dump_widgets = num_widgets + self.widget_growth_threshold
+            return None
+        elif self.baseline is None:
+            return None
+
+        if traced_bytes > self.next_dump_bytes or num_widgets > self.next_dump_widgets:
+            self.next_dump_bytes = traced_bytes + self.growth_threshold_bytes
+            self.next_dump_widgets = num_widgets + self.widget_growth_threshold
+            return self.dump(sample)
+        return None
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        """Snapshot traced allocations, leaving out those of tracemalloc."""
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+
+    def dump(self, sample: MemorySample) -> Path:
+        """Write a diagnostic dump comparing memory with the baseline."""
+        snapshot = self.take_snapshot()
+        top_allocations = []
+        if self.baseline_snapshot is not None:
+            top_allocations = [
+                str(stat)
+                for stat in snapshot.compare_to(self.baseline_snapshot, "lineno")[
+                    :NUM_TOP_ALLOCATIONS
+                ]
+            ]
+        diagnostics = {
+            "written_at": datetime.now().isoformat(timespec="seconds"),
+            "baseline": asdict(self.baseline) if self.baseline else None,
+            "sample": asdict(sample),
+            "recent_samples": [asdict(recent) for recent in self.samples],
+            "top_allocation_growth": top_allocations,
+        }
+        self.dump_folder.mkdir(parents=True, exist_ok=True)
+        path = self.dump_folder / f"memory-session-{sample.session}.json"
+        with open(path, "w") as f:
+            json.dump(diagnostics, f, indent=2)
+        return path
@@ -0,0 +1,192 @@
+"""Demo images and animations of exercises, decoded ahead of time.
+
+Decoding and resizing an animation can take far longer than a tick of the
+countdown, so media is decoded on a worker thread, typically during the
+rest before the exercise it shows, into a cache bounded by the memory the
+decoded frames take. The Tk thread only ever picks up frames which are
+ready, and picks which frame to show from the time elapsed, so playback
+stays in step with the clock however late a frame callback runs.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+import bisect
+import itertools
+import threading
+
+from PIL import Image, ImageSequence
+
+from exercise import ExerciseManager
+from utils import get_path_to_file
+from workout import base_exercise_name
+
+MEDIA_FOLDER = Path("src") / "assets" / "exercises"
+DISPLAY_SIZE = (200, 200)
+# decoded frames kept, as RGBA pixels
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+# longer animations are cut short to bound decoding time and memory
+MAX_FRAMES = 300
+# shorter frame durations are raised to this, as browsers do
+MIN_FRAME_MILLISECONDS = 20
+DEFAULT_FRAME_MILLISECONDS = 100
+
+
+@dataclass
+class Frames:
+    """Decoded frames of an image or animation, and when each starts."""
+
+    images: list[Image.Image]
+    # start of each frame within a loop of the animation
+    starts_milliseconds: list[int]
+    loop_milliseconds: int
+
+    @property
+    def num_bytes(self) -> int:
+        return sum(4 * image.width * image.height for image in self.images)
+
+    @property
+    def animated(self) -> bool:
+        return len(self.images) > 1
+
+    def frame_at(self, elapsed_milliseconds: float) -> tuple[int, float]:
+        """Get the frame to show after some time, and milliseconds until the next."""
+        if not self.animated:
+            return 0, float("inf")
+        position = elapsed_milliseconds % self.loop_milliseconds
+        index = bisect.bisect_right(self.starts_milliseconds, position) - 1
+        if index + 1 < len(self.starts_milliseconds):
+            next_start = self.starts_milliseconds[index + 1]
+        else:
+            next_start = self.loop_milliseconds
+        return index, next_start - position
+
+
+def decode_media(
+    path: Union[Path, str], size: tuple[int, int] = DISPLAY_SIZE
+) -> Frames:
+    """Decode the frames of an image or animation, each resized to fit `size`."""
+    images = []
+    durations = []
+    with Image.open(path) as media:
+        for frame in itertools.islice(ImageSequence.Iterator(media), MAX_FRAMES):
+            image = frame.convert("RGBA")
+            image.thumbnail(size)
+            images.append(image)
+            durations.append(
+                max(
+                    MIN_FRAME_MILLISECONDS,
+                    int(frame.info.get("duration") or DEFAULT_FRAME_MILLISECONDS),
+                )
+            )
+    starts = [0] + list(itertools.accumulate(durations))[:-1]
+    return Frames(images, starts, sum(durations))
+
+
+class MediaCache:
+    """Decoded media by path, evicting the least recently used beyond a budget."""
+
+    def __init__(self, max_bytes: int = MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.entries: OrderedDict[str, Frames] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Frames]:
+        with self.lock:
+            frames = self.entries.get(key)
+            if frames is not None:
+                self.entries.move_to_end(key)
+            return frames
+
+    def put(self, key: str, frames: Frames):
+        """Add frames, unless they alone would not fit in the budget."""
+        size = frames.num_bytes
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.num_bytes -= self.entries.pop(key).num_bytes
+            self.entries[key] = frames
+            self.num_bytes += size
+            while self.num_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.num_bytes -= evicted.num_bytes
+
+
+class MediaLibrary:
+    """Demo media of the exercises in a library, decoded on a worker thread.
+
+    Media paths in the library are relative to `src/assets/exercises`
+    unless absolute. Media which fails to decode is not tried again.
+    """
+
+    def __init__(
+        self,
+        exercise_manager: ExerciseManager,
+        size: tuple[int, int] = DISPLAY_SIZE,
+        cache: Optional[MediaCache] = None,
+    ):
+        self.exercise_manager = exercise_manager
+        self.size = size
+        self.cache = cache if cache is not None else MediaCache()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.decoding: dict[str, Future] = {}
+        self.failed: set[str] = set()
+
+    def media_path(self, exercise_name: str) -> Optional[str]:
+        """Get the media file of an exercise, or a side of one, if it has one."""
+        exercise = self.exercise_manager.exercises.get(
+            base_exercise_name(exercise_name)
+        )
+        if exercise is None or not exercise.media:
+            return None
+        if Path(exercise.media).is_absolute():
+            return exercise.media
+        return str(get_path_to_file(MEDIA_FOLDER / exercise.media))
+
+    def prefetch(self, exercise_name: str):
+        """Start decoding an exercise's media unless it is decoded or decoding."""
+        path = self.media_path(exercise_name)
+        if path is None or path in self.failed or self.pending(exercise_name):
+            return
+        if self.cache.get(path) is not None:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.decoding[path] = self.executor.submit(self._decode, path)
+
+    def _decode(self, path: str):
+        try:
+            self.cache.put(path, decode_media(path, self.size))
+        except Exception:
+            # Pillow raises all sorts for corrupt files, and any failure not
+            # recorded would leave the media to be decoded again and again
+            self.failed.add(path)
+
+    def get(self, exercise_name: str) -> Optional[Frames]:
+        """Get decoded media without waiting, None if there is none (yet)."""
+        path = self.media_path(exercise_name)
+        if path is None:
+            return None
+        frames = self.cache.get(path)
+        future = self.decoding.get(path)
+        if future is not None and future.done():
+            del self.decoding[path]
+        return frames
+
+    def pending(self, exercise_name: str) -> bool:
+        """Whether an exercise's media is still being decoded."""
+        path = self.media_path(exercise_name)
+        future = self.decoding.get(path) if path is not None else None
+        return future is not None and not future.done()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
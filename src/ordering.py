@@ -0,0 +1,226 @@
+"""Reordering the exercises of a workout so that similar ones are spread out."""
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+import math
+import os
+import random
+import time
+
+from exercise import Exercise, ExerciseManager
+from workout import base_exercise_name, Phase, Workout
+
+MUSCLE_GROUP_TAGS = frozenset(
+    {"legs", "core", "back", "arms", "shoulders", "chest", "grip"}
+)
+EQUIPMENT_TAGS = frozenset({"kettlebell", "bodyweight"})
+INTENSITY_LEVELS = {"low-intensity": 0, "medium-intensity": 1, "high-intensity": 2}
+# intensity assumed for exercises without an intensity tag
+DEFAULT_INTENSITY = 1
+
+
+@dataclass
+class OrderingCosts:
+    """Costs of placing two exercises back to back, summed over a workout."""
+
+    # per muscle group tag shared by adjacent exercises
+    same_muscle_group: float = 1.0
+    # per intensity level by which a pair exceeds two medium exercises
+    intensity_spike: float = 0.5
+    # when adjacent exercises need different equipment
+    equipment_change: float = 0.25
+    muscle_group_tags: frozenset[str] = MUSCLE_GROUP_TAGS
+    equipment_tags: frozenset[str] = EQUIPMENT_TAGS
+
+    def pair_cost(self, tags: set[str], other_tags: set[str]) -> float:
+        """Cost of doing exercises with these tags one after the other.
+
+        The cost is symmetric, which the optimiser relies on.
+        """
+        cost = self.same_muscle_group * len(tags & other_tags & self.muscle_group_tags)
+
+        intensity = max(
+            (INTENSITY_LEVELS[tag] for tag in tags if tag in INTENSITY_LEVELS),
+            default=DEFAULT_INTENSITY,
+        )
+        other_intensity = max(
+            (INTENSITY_LEVELS[tag] for tag in other_tags if tag in INTENSITY_LEVELS),
+            default=DEFAULT_INTENSITY,
+        )
+        cost += self.intensity_spike * max(0, intensity + other_intensity - 2)
+
+        equipment = tags & self.equipment_tags
+        other_equipment = other_tags & self.equipment_tags
+        if equipment and other_equipment and equipment != other_equipment:
+            cost += self.equipment_change
+        return cost
+
+
+def exercise_units(workout: Workout) -> list[list[Exercise]]:
+    """Group the exercises of a workout into units which must stay together.
+
+    A unit is either a single exercise or the left and right sides of a
+    1-handed exercise, which are done one after the other.
+    """
+    units: list[list[Exercise]] = []
+    previous_side: Optional[Exercise] = None
+    for phase in workout:
+        if not isinstance(phase.type, Exercise):
+            continue
+        exercise = phase.type
+        is_side = base_exercise_name(exercise.name) != exercise.name
+        if (
+            is_side
+            and previous_side is not None
+            and base_exercise_name(previous_side.name)
+            == base_exercise_name(exercise.name)
+        ):
+            units[-1].append(exercise)
+            previous_side = None
+        else:
+            units.append([exercise])
+            previous_side = exercise if is_side else None
+    return units
+
+
+def cost_matrix(
+    exercise_manager: ExerciseManager,
+    units: list[list[Exercise]],
+    costs: OrderingCosts,
+) -> list[list[float]]:
+    """Cost of each unit directly following each other unit."""
+    unit_tags = []
+    for unit in units:
+        name = base_exercise_name(unit[0].name)
+        if name in exercise_manager.exercises:
+            unit_tags.append(set(exercise_manager[name].tags))
+        else:
+            unit_tags.append(set(unit[0].tags))
+    return [[costs.pair_cost(tags, other) for other in unit_tags] for tags in unit_tags]
+
+
+def order_cost(matrix: list[list[float]], order: list[int]) -> float:
+    """Total cost of the units in this order."""
+    return sum(matrix[a][b] for a, b in zip(order, order[1:]))
+
+
+def anneal(
+    matrix: list[list[float]],
+    seed: int,
+    time_budget_seconds: float,
+    max_iterations: Optional[int] = None,
+) -> tuple[float, list[int]]:
+    """Search for a low cost order by simulated annealing from a random start.
+
+    Moves reverse a segment of the order. As the cost is symmetric only the
+    two edges at the ends of the segment change, so each move is O(1). The
+    temperature falls linearly over the time budget, or the iterations if
+    limited, and the best order seen is returned with its cost.
+    """
+    rng = random.Random(seed)
+    n = len(matrix)
+    order = list(range(n))
+    rng.shuffle(order)
+    cost = order_cost(matrix, order)
+    best_cost, best_order = cost, order[:]
+    if n < 3:
+        return best_cost, best_order
+
+    positive_costs = [c for row in matrix for c in row if c > 0]
+    initial_temperature = (
+        sum(positive_costs) / len(positive_costs) if positive_costs else 1.0
+    )
+
+    def edge(i: int, j: int) -> float:
+        """Cost between positions i and j, zero off the ends of the order."""
+        if i < 0 or j >= n:
+            return 0.0
+        return matrix[order[i]][order[j]]
+
+    start = time.monotonic()
+    iteration = 0
+    while True:
+        if max_iterations is not None:
+            if iteration >= max_iterations:
+                break
+            progress = iteration / max_iterations
+        else:
+            progress = (time.monotonic() - start) / time_budget_seconds
+            if progress >= 1:
+                break
+        iteration += 1
+
+        i, j = sorted(rng.sample(range(n), 2))
+        before = edge(i - 1, i) + edge(j, j + 1)
+        after = (matrix[order[i - 1]][order[j]] if i > 0 else 0.0) + (
+            matrix[order[i]][order[j + 1]] if j < n - 1 else 0.0
+        )
+        delta = after - before
+        temperature = initial_temperature * (1 - progress) + 1e-9
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            order[i : j + 1] = reversed(order[i : j + 1])
+            cost += delta
+            if cost < best_cost - 1e-9:
+                best_cost, best_order = cost, order[:]
+    return best_cost, best_order
+
+
+def optimise_order(
+    exercise_manager: ExerciseManager,
+    workout: Workout,
+    costs: Optional[OrderingCosts] = None,
+    time_budget_seconds: float = 1.0,
+    num_starts: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    seed: Optional[int] = None,
+    max_iterations: Optional[int] = None,
+) -> Workout:
+    """Reorder the exercises of a workout to minimise the ordering cost.
+
+    Independent annealing runs from different random starts are spread over
+    a process pool, one per CPU by default, and the best order found within
+    the time budget is used. Left and right sides stay together, and the
+    durations and rests of the workout are unchanged.
+    """
+    if costs is None:
+        costs = OrderingCosts()
+    # new names, since narrowed parameters are widened again within `run_starts`
+    runs = num_starts if num_starts is not None else os.cpu_count() or 1
+    first_seed = seed if seed is not None else random.randrange(2**32)
+
+    units = exercise_units(workout)
+    if len(units) < 3:
+        return list(workout)
+    matrix = cost_matrix(exercise_manager, units, costs)
+
+    def run_starts(executor: Executor) -> list[tuple[float, list[int]]]:
+        futures = [
+            executor.submit(
+                anneal, matrix, first_seed + i, time_budget_seconds, max_iterations
+            )
+            for i in range(runs)
+        ]
+        return [future.result() for future in futures]
+
+    if executor is not None:
+        results = run_starts(executor)
+    elif runs == 1:
+        results = [anneal(matrix, first_seed, time_budget_seconds, max_iterations)]
+    else:
+        with ProcessPoolExecutor(max_workers=runs) as pool:
+            results = run_starts(pool)
+
+    original_cost = order_cost(matrix, list(range(len(units))))
+    best_cost, best_order = min(results, key=lambda result: result[0])
+    if best_cost >= original_cost:
+        return list(workout)
+
+    reordered = iter(exercise for i in best_order for exercise in units[i])
+    return [
+        Phase(phase.duration_seconds, next(reordered))
+        if isinstance(phase.type, Exercise)
+        else phase
+        for phase in workout
+    ]
@@ -0,0 +1,289 @@
+"""Reading and writing of JSON libraries shared between processes.
+
+Each library file is an immutable snapshot: writers never change it in
+place, but write a new file next to it and atomically rename it over the
+old one. Readers therefore need no lock, as any file they open is complete
+and stays unchanged while they read it. Writers take an advisory lock on a
+`.lock` file beside the library, so that concurrent read-modify-writes from
+several processes cannot lose each other's updates.
+
+The version of a snapshot is taken from its file metadata, which is cheap
+to check, so a library is only parsed again once another version has been
+published.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+# edits a library loaded from JSON in place
+Mutation = Callable[[dict], None]
+# inode, modification time and size of a snapshot, which change on every publish
+Version = tuple[int, int, int]
+
+MAX_PUBLISH_ATTEMPTS = 5
+
+
+class VersionConflict(Exception):
+    """A snapshot changed since the version an edit was based on."""
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on a file, blocking until it is free."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def version_of(stat: os.stat_result) -> Version:
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class SnapshotStore:
+    """Versioned snapshots of one JSON library, see module docstring.
+
+    The latest snapshot read is cached, and must not be mutated by callers.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.snapshot: tuple[Optional[Version], dict] = (None, {})
+
+    def version(self) -> Optional[Version]:
+        """Get the version of the published snapshot, or None if there is none."""
+        try:
+            return version_of(os.stat(self.path))
+        except FileNotFoundError:
+            return None
+
+    def read(self) -> tuple[Optional[Version], dict]:
+        """Get the published snapshot and its version, parsing it only if new."""
+        version = self.version()
+        cached = self.snapshot
+        if version is None or version == cached[0]:
+            return cached if version is not None else (None, {})
+        try:
+            with open(self.path, "r") as f:
+                # the open file is the snapshot read, even if another is published
+                version = version_of(os.fstat(f.fileno()))
+                data = json.load(f)
+        except FileNotFoundError:
+            return None, {}
+        self.snapshot = (version, data)
+        return self.snapshot
+
+    def publish(self, data: dict, expected_version: Optional[Version]) -> Version:
+        """Publish a new snapshot if the current one has the expected version.
+
+        Raises a VersionConflict otherwise. Callers should hold the lock, so
+        that only writers ignoring it can cause a conflict.
+        """
+        if self.version() != expected_version:
+            raise VersionConflict(f"{self.path.name} changed while being edited")
+        try:
+            mode = os.stat(self.path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        fd, temp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                # dumping to a string uses the C encoder, unlike dumping to a file
+                f.write(json.dumps(data))
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        # not cached, as mutations may have put live objects of callers in it
+        version = self.version()
+        assert version is not None
+        return version
+
+    def update(self, mutations: Iterable[Mutation]) -> Version:
+        """Apply mutations in order to the latest snapshot and publish it once."""
+        mutations = list(mutations)
+        with file_lock(self.lock_path):
+            for attempt in range(MAX_PUBLISH_ATTEMPTS):
+                version, snapshot = self.read()
+                data = copy.deepcopy(snapshot)
+                for mutation in mutations:
+                    mutation(data)
+                try:
+                    return self.publish(data, version)
+                except VersionConflict:
+                    if attempt == MAX_PUBLISH_ATTEMPTS - 1:
+                        raise
+        raise AssertionError("The last attempt either returns or raises")
+
+
+stores: dict[Path, SnapshotStore] = {}
+stores_lock = threading.Lock()
+
+
+def get_store(path: Path) -> SnapshotStore:
+    """Get the store of a library, shared within the process."""
+    path = Path(os.path.abspath(path))
+    with stores_lock:
+        if path not in stores:
+            stores[path] = SnapshotStore(path)
+        return stores[path]
+
+
+def read_json_file(path: Path) -> dict:
+    """Read the latest snapshot of a JSON file, which must not be mutated."""
+    return get_store(path).read()[1]
+
+
+def update_json_file(path: Path, mutations: Iterable[Mutation]):
+    """Apply mutations in order to a JSON file, writing it back once."""
+    get_store(path).update(mutations)
+
+
+class BackgroundWriter:
+    """Single thread which writes JSON libraries, coalescing pending edits.
+
+    Edits submitted for a file are queued, and once no edit has arrived for
+    `debounce_seconds` (or `max_delay_seconds` after the first queued edit)
+    all edits queued for the file are applied with one read and one write.
+    The outcome of each write is passed to `on_result` on the writer thread,
+    with the error raised or None if the write succeeded.
+    """
+
+    def __init__(
+        self,
+        debounce_seconds: float = 0.25,
+        max_delay_seconds: float = 2.0,
+        on_result: Optional[Callable[[Path, Optional[Exception]], None]] = None,
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.on_result = on_result
+        self.pending: dict[Path, list[Mutation]] = {}
+        self.first_submit = 0.0
+        self.last_submit = 0.0
+        self.num_writes = 0
+        self.writing: set[Path] = set()
+        self.flushing = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(
+            target=self._run, name="background-writer", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, path: Path, mutation: Mutation):
+        """Queue an edit to a JSON file."""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Cannot submit edits to a closed writer")
+            now = time.monotonic()
+            if not self.pending:
+                self.first_submit = now
+            self.last_submit = now
+            self.pending.setdefault(Path(path), []).append(mutation)
+            self.condition.notify_all()
+
+    def has_pending(self, path: Path) -> bool:
+        """Whether edits to a file are queued or being written."""
+        path = Path(path)
+        with self.condition:
+            return path in self.pending or path in self.writing
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write queued edits now and wait until written, or the timeout passes.
+
+        Returns whether all edits were written.
+        """
+        with self.condition:
+            self.flushing = True
+            self.condition.notify_all()
+            done = self.condition.wait_for(
+                lambda: not self.pending and not self.writing, timeout
+            )
+            self.flushing = False
+            return done
+
+    def close(self, timeout: Optional[float] = None):
+        """Write queued edits and stop the writer thread."""
+        self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+    def _wait_for_batch(self) -> Optional[dict[Path, list[Mutation]]]:
+        """Wait until queued edits are due to be written, then take them."""
+        with self.condition:
+            while True:
+                if self.closed and not self.pending:
+                    return None
+                if not self.pending:
+                    self.condition.wait()
+                    continue
+                due = min(
+                    self.last_submit + self.debounce_seconds,
+                    self.first_submit + self.max_delay_seconds,
+                )
+                wait_seconds = due - time.monotonic()
+                if wait_seconds <= 0 or self.flushing or self.closed:
+                    batch, self.pending = self.pending, {}
+                    self.writing = set(batch)
+                    return batch
+                self.condition.wait(wait_seconds)
+
+    def _run(self):
+        while True:
+            batch = self._wait_for_batch()
+            if batch is None:
+                return
+
+            for path, mutations in batch.items():
+                error: Optional[Exception] = None
+                try:
+                    update_json_file(path, mutations)
+                except Exception as e:  # the writer thread must outlive failures
+                    error = e
+                self.num_writes += 1
+                if self.on_result is not None:
+                    self.on_result(path, error)
+
+            with self.condition:
+                self.writing = set()
+                self.condition.notify_all()
+
+
+def persist(path: Path, mutation: Mutation, writer: Optional[BackgroundWriter]):
+    """Apply an edit to a JSON file, in the background if there is a writer."""
+    if writer is None:
+        update_json_file(path, [mutation])
+    else:
+        writer.submit(path, mutation)
@@ -0,0 +1,118 @@
+"""Profiles, each with its own shard of saved workouts and history.
+
+The exercise library is shared by everyone. The default profile keeps its
+workouts and history in `src/data` as before, and other profiles each have
+a folder under `src/data/profiles`, so loading or saving one profile never
+touches another's files.
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import re
+import shutil
+
+from fingerprints import WorkoutFingerprints
+from history import ExerciseHistory
+from persistence import BackgroundWriter
+from utils import get_path_to_file
+from versions import WorkoutVersions
+from workout import WorkoutManager
+
+DEFAULT_PROFILE = "default"
+DATA_FOLDER = Path("src") / "data"
+WORKOUTS_FILE_NAME = "workouts.json"
+HISTORY_FILE_NAME = "history.json"
+FINGERPRINTS_FILE_NAME = "fingerprints.json"
+VERSIONS_FILE_NAME = "workout_versions.json"
+
+
+@dataclass
+class ProfileShard:
+    """Everything loaded for one profile."""
+
+    name: str
+    workout_manager: WorkoutManager
+    exercise_history: ExerciseHistory
+    workout_fingerprints: WorkoutFingerprints
+
+
+class ProfileManager:
+    """Finds, creates and loads profiles, loading in the background if asked.
+
+    New profiles start with a copy of the default profile's saved workouts.
+    """
+
+    def __init__(
+        self,
+        data_folder: Path = DATA_FOLDER,
+        writer: Optional[BackgroundWriter] = None,
+    ):
+        self.data_folder = get_path_to_file(data_folder)
+        self.profiles_folder = Path(self.data_folder) / "profiles"
+        self.writer = writer
+        self.loader: Optional[ThreadPoolExecutor] = None
+
+    def profile_names(self) -> list[str]:
+        """Get the names of all profiles, the default first."""
+        names = []
+        if self.profiles_folder.exists():
+            names = sorted(
+                path.name for path in self.profiles_folder.iterdir() if path.is_dir()
+            )
+        return [DEFAULT_PROFILE] + names
+
+    def profile_folder(self, name: str) -> Path:
+        """Get the folder holding a profile's files."""
+        if name == DEFAULT_PROFILE:
+            return Path(self.data_folder)
+        if not re.fullmatch(r"[\w][\w\- ]*", name) or name.strip() != name:
+            raise ValueError(
+                f"Profile name {name!r} should only have letters, numbers, "
+                "spaces, - and _"
+            )
+        return self.profiles_folder / name
+
+    def create_profile(self, name: str):
+        """Create a profile, if it doesn't exist, with the default workouts."""
+        folder = self.profile_folder(name)
+        workouts_path = folder / WORKOUTS_FILE_NAME
+        if workouts_path.exists():
+            return
+        folder.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(Path(self.data_folder) / WORKOUTS_FILE_NAME, workouts_path)
+
+    def load(self, name: str) -> ProfileShard:
+        """Load a profile's shard, creating the profile if needed."""
+        self.create_profile(name)
+        folder = self.profile_folder(name)
+        return ProfileShard(
+            name=name,
+            workout_manager=WorkoutManager(
+                path=folder / WORKOUTS_FILE_NAME,
+                writer=self.writer,
+                versions=WorkoutVersions(
+                    path=folder / VERSIONS_FILE_NAME, writer=self.writer
+                ),
+            ),
+            exercise_history=ExerciseHistory(
+                path=folder / HISTORY_FILE_NAME, writer=self.writer
+            ),
+            workout_fingerprints=WorkoutFingerprints(
+                path=folder / FINGERPRINTS_FILE_NAME, profile=name, writer=self.writer
+            ),
+        )
+
+    def load_in_background(self, name: str) -> Future:
+        """Load a profile's shard on a worker thread, see `load`."""
+        if self.loader is None:
+            self.loader = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="profile-loader"
+            )
+        return self.loader.submit(self.load, name)
+
+    def close(self):
+        if self.loader is not None:
+            self.loader.shutdown(wait=False, cancel_futures=True)
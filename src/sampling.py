@@ -0,0 +1,205 @@
+"""Weighted sampling of exercises using the alias method."""
+from __future__ import annotations
+
+from math import isqrt
+from typing import Optional
+import random
+import time
+
+from exercise import ExerciseManager
+from history import ExerciseHistory
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# exercises done moments ago still get a small chance of being picked, so that
+# a small library can always produce a workout without repeats
+MIN_RECENCY_WEIGHT = 0.05
+
+
+def build_alias_table(weights: list[float]) -> tuple[list[float], list[int]]:
+    """Build an alias table for the given weights using Vose's method.
+
+    Sampling from the table is O(1): pick a column uniformly, then keep it
+    with probability `prob[column]` or take `alias[column]` otherwise.
+    """
+    n = len(weights)
+    total = sum(weights)
+    if n == 0 or total <= 0:
+        raise ValueError("Cannot build an alias table without positive weights")
+
+    scaled = [weight * n / total for weight in weights]
+    prob = [0.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] += scaled[less] - 1
+        if scaled[more] < 1:
+            small.append(more)
+        else:
+            large.append(more)
+
+    # anything left over is within floating point error of 1, apart from
+    # zero weights which must never be kept
+    for i in large + small:
+        prob[i] = 1.0 if weights[i] > 0 else 0.0
+    return prob, alias
+
+
+class AliasSampler:
+    """Draws names in proportion to their weights in O(1) per draw.
+
+    Names are split into blocks of roughly sqrt(n) entries, each with its own
+    alias table, plus a top-level alias table over the block totals. A draw
+    is two O(1) alias lookups, while changing a weight only rebuilds the
+    block containing it and the top-level table, i.e. O(sqrt(n)) work rather
+    than rebuilding the whole table.
+    """
+
+    def __init__(
+        self,
+        weights: dict[str, float],
+        block_size: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.rng = rng if rng is not None else random.Random()
+        self.block_size = block_size or max(1, isqrt(len(weights)))
+        self.names: list[str] = []
+        self.weights: list[float] = []
+        self.positions: dict[str, int] = {}
+        for name, weight in weights.items():
+            self._append(name, weight)
+
+        self.block_totals: list[float] = []
+        self.block_tables: list[Optional[tuple[list[float], list[int]]]] = []
+        for block in range(self.num_blocks):
+            self.block_totals.append(0.0)
+            self.block_tables.append(None)
+            self._rebuild_block(block)
+        self._rebuild_top_level()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.positions
+
+    def __getitem__(self, name: str) -> float:
+        return self.weights[self.positions[name]]
+
+    @property
+    def num_blocks(self) -> int:
+        return -(-len(self.names) // self.block_size)
+
+    def _append(self, name: str, weight: float):
+        if weight < 0:
+            raise ValueError(f"Weight for {name} must be non-negative, got {weight}")
+        self.positions[name] = len(self.names)
+        self.names.append(name)
+        self.weights.append(weight)
+
+    def _rebuild_block(self, block: int):
+        """Rebuild the alias table of a single block."""
+        start = block * self.block_size
+        weights = self.weights[start : start + self.block_size]
+        total = sum(weights)
+        self.block_totals[block] = total
+        self.block_tables[block] = build_alias_table(weights) if total > 0 else None
+
+    def _rebuild_top_level(self):
+        """Rebuild the alias table over the block totals."""
+        if sum(self.block_totals) > 0:
+            self.top_level_table: Optional[
+                tuple[list[float], list[int]]
+            ] = build_alias_table(self.block_totals)
+        else:
+            self.top_level_table = None
+
+    def _resize_blocks(self):
+        """Add or drop trailing blocks after the number of names changed."""
+        while len(self.block_totals) < self.num_blocks:
+            self.block_totals.append(0.0)
+            self.block_tables.append(None)
+        del self.block_totals[self.num_blocks :]
+        del self.block_tables[self.num_blocks :]
+
+    def update(self, name: str, weight: float):
+        """Change the weight of a name, adding it if it is new."""
+        if name not in self.positions:
+            self._append(name, weight)
+            self._resize_blocks()
+        elif weight < 0:
+            raise ValueError(f"Weight for {name} must be non-negative, got {weight}")
+        else:
+            self.weights[self.positions[name]] = weight
+
+        self._rebuild_block(self.positions[name] // self.block_size)
+        self._rebuild_top_level()
+
+    def remove(self, name: str):
+        """Remove a name, moving the last name into its slot."""
+        position = self.positions.pop(name)
+        last_name = self.names.pop()
+        last_weight = self.weights.pop()
+        if last_name != name:
+            self.names[position] = last_name
+            self.weights[position] = last_weight
+            self.positions[last_name] = position
+
+        self._resize_blocks()
+        for block in {position // self.block_size, len(self.names) // self.block_size}:
+            if block < self.num_blocks:
+                self._rebuild_block(block)
+        self._rebuild_top_level()
+
+    def update_weights(self, weights: dict[str, float]):
+        """Bring the sampler in line with new weights, only touching changes."""
+        for name in [name for name in self.positions if name not in weights]:
+            self.remove(name)
+        for name, weight in weights.items():
+            if name not in self.positions or self[name] != weight:
+                self.update(name, weight)
+
+    @staticmethod
+    def _draw(table: tuple[list[float], list[int]], rng: random.Random) -> int:
+        prob, alias = table
+        column = rng.randrange(len(prob))
+        return column if rng.random() < prob[column] else alias[column]
+
+    def sample(self) -> str:
+        """Draw a name with probability proportional to its weight."""
+        if self.top_level_table is None:
+            raise ValueError("No names with positive weight to sample from")
+        block = self._draw(self.top_level_table, self.rng)
+        block_table = self.block_tables[block]
+        assert block_table is not None
+        return self.names[block * self.block_size + self._draw(block_table, self.rng)]
+
+
+def recency_weight(
+    last_done: Optional[float], now: float, half_life_days: float
+) -> float:
+    """Weight that grows back towards 1 the longer ago an exercise was done."""
+    if last_done is None:
+        return 1.0
+    days_since = max(0.0, (now - last_done) / SECONDS_PER_DAY)
+    return max(MIN_RECENCY_WEIGHT, 1.0 - 0.5 ** (days_since / half_life_days))
+
+
+def exercise_weights(
+    exercise_manager: ExerciseManager,
+    history: ExerciseHistory,
+    half_life_days: float = 7.0,
+    now: Optional[float] = None,
+) -> dict[str, float]:
+    """Combine coach weights with recency to get per-exercise sampling weights."""
+    if now is None:
+        now = time.time()
+    return {
+        name: exercise.weight
+        * recency_weight(history.last_done(name), now, half_life_days)
+        for name, exercise in exercise_manager
+    }
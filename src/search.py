@@ -0,0 +1,108 @@
+"""Incremental type-ahead search over names."""
+from collections import Counter
+from typing import Iterable, Iterator
+
+from sortedcontainers import SortedList
+
+# fraction of the n-grams of a query a name must share to be a fuzzy match
+MIN_FUZZY_OVERLAP = 0.5
+
+
+def ngrams(text: str, n: int) -> set[str]:
+    """Get the distinct n-grams of some text."""
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+class SearchIndex:
+    """Prefix and n-gram index supporting fuzzy type-ahead search.
+
+    Names are kept sorted by their lowercased form, so prefix matches are a
+    range lookup, and bigrams and trigrams of each name map back to the names
+    containing them for fuzzy matches. Adding or removing a name only touches
+    the entries for that name.
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.sorted_names: SortedList = SortedList()
+        self.gram_index: dict[str, set[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self.sorted_names)
+
+    def __contains__(self, name: str) -> bool:
+        key = (name.lower(), name)
+        return key in self.sorted_names
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for _, name in self.sorted_names)
+
+    @staticmethod
+    def _grams(text: str) -> set[str]:
+        return ngrams(text, 2) | ngrams(text, 3)
+
+    def add(self, name: str):
+        """Add a name to the index, if not present already."""
+        if name in self:
+            return
+        lowered = name.lower()
+        self.sorted_names.add((lowered, name))
+        for gram in self._grams(lowered):
+            self.gram_index.setdefault(gram, set()).add(name)
+
+    def remove(self, name: str):
+        """Remove a name from the index."""
+        lowered = name.lower()
+        self.sorted_names.remove((lowered, name))
+        for gram in self._grams(lowered):
+            names = self.gram_index[gram]
+            names.discard(name)
+            if not names:
+                del self.gram_index[gram]
+
+    def sync(self, names: Iterable[str]):
+        """Add and remove names so the index contains exactly those given."""
+        names = set(names)
+        for name in [name for name in self if name not in names]:
+            self.remove(name)
+        for name in names:
+            self.add(name)
+
+    def prefix_matches(self, prefix: str) -> Iterator[str]:
+        """Get names starting with a prefix, ignoring case, in sorted order."""
+        prefix = prefix.lower()
+        for _, name in self.sorted_names.irange(
+            (prefix,), (prefix + "\uffff",), inclusive=(True, False)
+        ):
+            yield name
+
+    def search(self, query: str) -> list[str]:
+        """Get names matching a query, best matches first.
+
+        Names starting with the query come first, then names containing it,
+        then names sharing enough of its n-grams to allow for typos.
+        """
+        query = query.strip().lower()
+        if not query:
+            return list(self)
+
+        results = list(self.prefix_matches(query))
+        if len(query) < 2:
+            return results
+
+        n = 3 if len(query) >= 3 else 2
+        query_grams = ngrams(query, n)
+        overlaps: Counter[str] = Counter()
+        for gram in query_grams:
+            overlaps.update(self.gram_index.get(gram, ()))
+
+        seen = set(results)
+        min_overlap = max(1, int(MIN_FUZZY_OVERLAP * len(query_grams)))
+        fuzzy_matches = [
+            (query not in name.lower(), -overlap, name.lower(), name)
+            for name, overlap in overlaps.items()
+            if overlap >= min_overlap and name not in seen
+        ]
+        results.extend(match[-1] for match in sorted(fuzzy_matches))
+        return results
@@ -0,0 +1,191 @@
+"""Stepping through the phases of a workout as it is performed."""
+from __future__ import annotations
+
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional, Union
+import itertools
+
+from exercise import Exercise, Rest
+from heart_rate import AdaptiveRest, HeartRateStats
+from workout import base_exercise_name, Phase, Workout, WorkoutPhases
+
+
+@dataclass
+class SessionSummary:
+    """Running totals of what was performed, independent of session length."""
+
+    exercise_counts: Counter[str] = field(default_factory=Counter)
+    exercise_seconds: int = 0
+    rest_seconds: int = 0
+
+    def add(self, phase: Phase, seconds: int):
+        """Add the seconds spent in a phase, counting exercises by base name."""
+        if isinstance(phase.type, Exercise):
+            self.exercise_seconds += seconds
+            self.exercise_counts[base_exercise_name(phase.type.name)] += 1
+        else:
+            self.rest_seconds += seconds
+
+    def describe(self) -> list[str]:
+        """Lines describing the session, most frequent exercises first."""
+
+        def minutes(seconds: int) -> str:
+            return f"{seconds // 60}:{seconds % 60:02d}"
+
+        lines = [
+            f"{sum(self.exercise_counts.values())} exercises, "
+            f"{minutes(self.exercise_seconds)} work, {minutes(self.rest_seconds)} rest"
+        ]
+        for exercise_name, count in self.exercise_counts.most_common():
+            lines.append(f"{exercise_name} x{count}" if count > 1 else exercise_name)
+        return lines
+
+
+class WorkoutSession:
+    """The position within a workout whose phases are pulled lazily.
+
+    Phases come from an iterator, which may be endless. Only the current
+    phase and a look-ahead buffer holding the next `look_ahead` exercises are
+    kept, so memory use is the same however long the session runs.
+
+    With an adaptive rest policy, rests between exercises can be extended or
+    shortened to follow recovery, so the current phase tracks its own
+    duration rather than relying on the phase's planned one.
+
+    Sessions of a whole workout, either a list of its phases or phases
+    expanded lazily from its config, rather than a generator, can also
+    jump to any phase.
+    """
+
+    def __init__(
+        self,
+        phases: Iterable[Phase],
+        num_exercises: Optional[int] = None,
+        look_ahead: int = 10,
+        adaptive_rest: Optional[AdaptiveRest] = None,
+    ):
+        self.workout: Optional[Union[Workout, WorkoutPhases]] = (
+            phases if isinstance(phases, (list, WorkoutPhases)) else None
+        )
+        self.phases: Iterator[Phase] = iter(phases)
+        self.num_exercises = num_exercises
+        self.look_ahead = look_ahead
+        self.adaptive_rest = adaptive_rest
+        self.buffer: deque[Phase] = deque()
+        self.exercises_in_buffer = 0
+        self.phase: Optional[Phase] = None
+        self.phase_index = -1
+        self.phase_remaining_seconds: Optional[int] = None
+        self.phase_duration_seconds: Optional[int] = None
+        self.exercise_index = 0
+        self.summary = SessionSummary()
+        self._fill_buffer()
+
+    def _fill_buffer(self):
+        """Pull phases until the next `look_ahead` exercises are buffered."""
+        while self.exercises_in_buffer < self.look_ahead:
+            phase = next(self.phases, None)
+            if phase is None:
+                return
+            self.buffer.append(phase)
+            if isinstance(phase.type, Exercise):
+                self.exercises_in_buffer += 1
+
+    def advance(self) -> Optional[Phase]:
+        """Complete the current phase, if any, and move on to the next one."""
+        if self.phase is not None:
+            # the current phase always has a duration
+            assert self.phase_duration_seconds is not None
+            self.summary.add(self.phase, self.phase_duration_seconds)
+
+        if not self.buffer:
+            self.phase = None
+            self.phase_remaining_seconds = None
+            self.phase_duration_seconds = None
+            return None
+
+        self.phase = self.buffer.popleft()
+        self.phase_index += 1
+        self.phase_remaining_seconds = self.phase.duration_seconds
+        self.phase_duration_seconds = self.phase.duration_seconds
+        if isinstance(self.phase.type, Exercise):
+            self.exercise_index += 1
+            self.exercises_in_buffer -= 1
+        self._fill_buffer()
+        return self.phase
+
+    def stop(self) -> SessionSummary:
+        """Stop part way through the current phase and summarise the session."""
+        if (
+            self.phase is not None
+            and self.phase_remaining_seconds is not None
+            and self.phase_duration_seconds is not None
+        ):
+            elapsed_seconds = self.phase_duration_seconds - self.phase_remaining_seconds
+            self.summary.add(self.phase, elapsed_seconds)
+        self.phase = None
+        return self.summary
+
+    def jump_to(self, phase_index: int) -> Phase:
+        """Skip forwards or back to a phase of the workout.
+
+        The part of the current phase done so far counts towards the summary.
+        """
+        if self.workout is None:
+            raise ValueError("Only sessions of a whole workout can jump to a phase")
+        if not 0 <= phase_index < len(self.workout):
+            raise IndexError(f"No phase {phase_index} in workout")
+        self.stop()
+
+        self.phases = itertools.islice(self.workout, phase_index, None)
+        self.buffer.clear()
+        self.exercises_in_buffer = 0
+        self.phase_index = phase_index - 1
+        self.exercise_index = sum(
+            1
+            for phase in itertools.islice(self.workout, phase_index)
+            if isinstance(phase.type, Exercise)
+        )
+        self._fill_buffer()
+        phase = self.advance()
+        # the workout has a phase at the index
+        assert phase is not None
+        return phase
+
+    def adapt_rest(self, stats: Optional[HeartRateStats]) -> bool:
+        """Extend or shorten the current rest following the heart rate.
+
+        Only rests after the first exercise are adapted, since the heart rate
+        says nothing about readiness to start. Returns whether the seconds
+        remaining changed.
+        """
+        if (
+            self.adaptive_rest is None
+            or self.phase is None
+            or not isinstance(self.phase.type, Rest)
+            or self.exercise_index == 0
+        ):
+            return False
+
+        planned_remaining_seconds = self.phase_remaining_seconds
+        assert planned_remaining_seconds is not None
+        assert self.phase_duration_seconds is not None
+        elapsed_seconds = self.phase_duration_seconds - planned_remaining_seconds
+        remaining_seconds = self.adaptive_rest.adjust(
+            self.phase.duration_seconds,
+            elapsed_seconds,
+            planned_remaining_seconds,
+            stats,
+        )
+        if remaining_seconds == planned_remaining_seconds:
+            return False
+        self.phase_duration_seconds = elapsed_seconds + remaining_seconds
+        self.phase_remaining_seconds = remaining_seconds
+        return True
+
+    def upcoming_exercise_names(self) -> list[str]:
+        """Get names of the buffered exercises after the current phase."""
+        return [
+            phase.type.name for phase in self.buffer if isinstance(phase.type, Exercise)
+        ]
@@ -0,0 +1,250 @@
+"""Short URL-safe codes for sharing saved workouts.
+
+A code is the URL-safe base64 of
+
+    version | library hash | name | durations | exercises | checksum
+
+where numbers are varints, exercises refer to the sorted exercise library
+by index and the library is identified by a hash of its names. Exercises
+not in the library are written inline by name instead, and the checksum is
+a CRC-32 of everything before it.
+
+Such codes can only be decoded against the same library, so portable codes
+have a different version and, in place of the library hash, a table of the
+names of the exercises in the workout, which exercises refer to instead.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Optional, Union
+import base64
+import binascii
+import hashlib
+import zlib
+
+from workout import Block, iter_exercise_names, WorkoutConfig
+
+VERSION = 1
+PORTABLE_VERSION = 2
+LIBRARY_HASH_SIZE = 4
+CHECKSUM_SIZE = 4
+
+# blocks nested deeper than this are rejected, well within Python's recursion limit
+MAX_BLOCK_DEPTH = 32
+# exercise items are a varint whose remainder mod 3 gives the kind
+LIBRARY_EXERCISE, INLINE_EXERCISE, BLOCK = 0, 1, 2
+
+
+def library_hash(exercise_names: list[str]) -> bytes:
+    """Identify a library by a hash of its sorted exercise names."""
+    return hashlib.sha256("\n".join(exercise_names).encode()).digest()[
+        :LIBRARY_HASH_SIZE
+    ]
+
+
+def write_varint(buffer: bytearray, value: int):
+    """Append a non-negative integer, 7 bits per byte, low bits first."""
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, offset: int) -> tuple[int, int]:
+    """Read a varint, returning it and the offset after it."""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Workout code is truncated")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def write_optional(buffer: bytearray, value: Optional[int]):
+    """Write an optional number, shifted by one so that 0 means None."""
+    write_varint(buffer, 0 if value is None else value + 1)
+
+
+def read_optional(data: bytes, offset: int) -> tuple[Optional[int], int]:
+    """Read an optional number written by `write_optional`."""
+    value, offset = read_varint(data, offset)
+    return (None if value == 0 else value - 1), offset
+
+
+def write_text(buffer: bytearray, text: str):
+    """Append text as UTF-8 prefixed by its length."""
+    encoded = text.encode()
+    write_varint(buffer, len(encoded))
+    buffer += encoded
+
+
+def read_text(
+    data: bytes, offset: int, length: Optional[int] = None
+) -> tuple[str, int]:
+    """Read text, prefixed by its length unless the length is given."""
+    if length is None:
+        length, offset = read_varint(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Workout code is truncated")
+    return str(data[offset:end], "utf-8"), end
+
+
+class WorkoutCodec:
+    """Encodes and decodes workout codes against an exercise library.
+
+    The library lookups are built once, so one codec can process many codes
+    without redoing them, and each code is written into a single buffer.
+    """
+
+    def __init__(self, exercise_names: Iterable[str]):
+        self.exercise_names = sorted(exercise_names)
+        self.exercise_indices = {
+            name: index for index, name in enumerate(self.exercise_names)
+        }
+        self.library_hash = library_hash(self.exercise_names)
+
+    def encode(
+        self, workout_name: str, config: WorkoutConfig, portable: bool = False
+    ) -> str:
+        """Encode a named workout as a code.
+
+        Portable codes name each exercise once, so can be decoded against
+        any library, at the cost of being longer.
+        """
+        buffer = bytearray()
+        if portable:
+            exercise_names = sorted(set(iter_exercise_names(config.exercises)))
+            exercise_indices = {name: i for i, name in enumerate(exercise_names)}
+            buffer.append(PORTABLE_VERSION)
+            write_varint(buffer, len(exercise_names))
+            for name in exercise_names:
+                write_text(buffer, name)
+        else:
+            exercise_indices = self.exercise_indices
+            buffer.append(VERSION)
+            buffer += self.library_hash
+        write_text(buffer, workout_name)
+        write_varint(buffer, config.exercise_duration_seconds)
+        write_varint(buffer, config.rest_duration_seconds)
+        self._write_exercises(buffer, config.exercises, exercise_indices)
+        buffer += zlib.crc32(buffer).to_bytes(CHECKSUM_SIZE, "big")
+        return base64.urlsafe_b64encode(buffer).rstrip(b"=").decode("ascii")
+
+    def _write_exercises(
+        self,
+        buffer: bytearray,
+        items: list[Union[str, Block]],
+        exercise_indices: dict[str, int],
+    ):
+        write_varint(buffer, len(items))
+        for item in items:
+            if isinstance(item, Block):
+                write_varint(buffer, BLOCK)
+                write_varint(buffer, item.rounds)
+                write_optional(buffer, item.exercise_duration_seconds)
+                write_optional(buffer, item.rest_duration_seconds)
+                write_optional(buffer, item.round_rest_seconds)
+                self._write_exercises(buffer, item.exercises, exercise_indices)
+            elif item in exercise_indices:
+                write_varint(buffer, 3 * exercise_indices[item] + LIBRARY_EXERCISE)
+            else:
+                encoded = item.encode()
+                write_varint(buffer, 3 * len(encoded) + INLINE_EXERCISE)
+                buffer += encoded
+
+    def decode(self, code: str) -> tuple[str, WorkoutConfig]:
+        """Decode a code into a workout name and config.
+
+        Raises a ValueError if the code is corrupt, or is not portable and
+        refers to exercises in a library other than this one.
+        """
+        code = code.strip()
+        try:
+            data = base64.urlsafe_b64decode(code + "=" * (-len(code) % 4))
+        except (binascii.Error, ValueError):
+            raise ValueError("Workout code is not valid") from None
+        if len(data) < 1 + CHECKSUM_SIZE:
+            raise ValueError("Workout code is truncated")
+        body_end = len(data) - CHECKSUM_SIZE
+        checksum = int.from_bytes(data[body_end:], "big")
+        data = memoryview(data)[:body_end]
+        if zlib.crc32(data) != checksum:
+            raise ValueError("Workout code is corrupt, its checksum does not match")
+
+        # the names exercises refer to by index, None if from another library
+        exercise_names: Optional[list[str]]
+        if data[0] == VERSION:
+            offset = 1 + LIBRARY_HASH_SIZE
+            if len(data) < offset:
+                raise ValueError("Workout code is truncated")
+            same_library = data[1:offset] == self.library_hash
+            exercise_names = self.exercise_names if same_library else None
+        elif data[0] == PORTABLE_VERSION:
+            num_names, offset = read_varint(data, 1)
+            exercise_names = []
+            for _ in range(num_names):
+                name, offset = read_text(data, offset)
+                exercise_names.append(name)
+        else:
+            raise ValueError(f"Workout code version {data[0]} is not supported")
+
+        workout_name, offset = read_text(data, offset)
+        exercise_duration_seconds, offset = read_varint(data, offset)
+        rest_duration_seconds, offset = read_varint(data, offset)
+        exercises, offset = self._read_exercises(data, offset, exercise_names)
+        if offset != len(data):
+            raise ValueError("Workout code has unexpected trailing data")
+        config = WorkoutConfig(
+            exercise_duration_seconds=exercise_duration_seconds,
+            rest_duration_seconds=rest_duration_seconds,
+            exercises=exercises,
+        )
+        return workout_name, config
+
+    def _read_exercises(
+        self,
+        data: memoryview,
+        offset: int,
+        exercise_names: Optional[list[str]],
+        depth: int = 0,
+    ) -> tuple[list[Union[str, Block]], int]:
+        if depth > MAX_BLOCK_DEPTH:
+            raise ValueError("Workout code has blocks nested too deeply")
+        num_items, offset = read_varint(data, offset)
+        items: list[Union[str, Block]] = []
+        for _ in range(num_items):
+            value, offset = read_varint(data, offset)
+            kind = value % 3
+            if kind == BLOCK:
+                rounds, offset = read_varint(data, offset)
+                exercise_duration_seconds, offset = read_optional(data, offset)
+                rest_duration_seconds, offset = read_optional(data, offset)
+                round_rest_seconds, offset = read_optional(data, offset)
+                exercises, offset = self._read_exercises(
+                    data, offset, exercise_names, depth + 1
+                )
+                items.append(
+                    Block(
+                        exercises,
+                        rounds,
+                        exercise_duration_seconds,
+                        rest_duration_seconds,
+                        round_rest_seconds,
+                    )
+                )
+            elif kind == INLINE_EXERCISE:
+                name, offset = read_text(data, offset, value // 3)
+                items.append(name)
+            else:
+                index = value // 3
+                if exercise_names is None or index >= len(exercise_names):
+                    raise ValueError(
+                        "Workout code was made with a different exercise library"
+                    )
+                items.append(exercise_names[index])
+        return items, offset
@@ -0,0 +1,178 @@
+"""Staging of edits to exercises and workouts before they are saved."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from exercise import Exercise, ExerciseManager
+from workout import WorkoutConfig, WorkoutManager
+
+
+@dataclass
+class Change:
+    """A single staged edit; a value of None means removal."""
+
+    kind: str  # "exercise" or "workout"
+    name: str
+    value: Optional[Union[Exercise, WorkoutConfig]]
+
+
+class StagedChanges:
+    """Edits to exercises and workouts held in memory until committed.
+
+    Edits are kept in order so the latest can be undone, and are only
+    written when committed, with one write per library, once the edits have
+    been validated together.
+    """
+
+    def __init__(
+        self, exercise_manager: ExerciseManager, workout_manager: WorkoutManager
+    ):
+        self.exercise_manager = exercise_manager
+        self.workout_manager = workout_manager
+        self.changes: list[Change] = []
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def add_exercise(self, exercise: Exercise):
+        """Stage adding (or updating) an exercise."""
+        self.changes.append(Change("exercise", exercise.name, exercise))
+
+    def remove_exercise(self, exercise_name: str):
+        """Stage removing an exercise."""
+        self.changes.append(Change("exercise", exercise_name, None))
+
+    def add_workout(self, workout_name: str, config: WorkoutConfig):
+        """Stage adding (or updating) a saved workout."""
+        self.changes.append(Change("workout", workout_name, config))
+
+    def remove_workout(self, workout_name: str):
+        """Stage removing a saved workout."""
+        self.changes.append(Change("workout", workout_name, None))
+
+    def undo(self) -> Optional[Change]:
+        """Unstage the latest edit, if any."""
+        return self.changes.pop() if self.changes else None
+
+    def discard(self):
+        """Unstage all edits."""
+        self.changes = []
+
+    def net_changes(
+        self, kind: str
+    ) -> dict[str, Optional[Union[Exercise, WorkoutConfig]]]:
+        """Get the final staged value for each edited name of a kind."""
+        net: dict[str, Optional[Union[Exercise, WorkoutConfig]]] = {}
+        for change in self.changes:
+            if change.kind == kind:
+                net[change.name] = change.value
+        return net
+
+    def staged_exercise_names(self) -> list[str]:
+        """Get the names of exercises as they would be after committing."""
+        names = dict.fromkeys(self.exercise_manager.exercises)
+        for name, value in self.net_changes("exercise").items():
+            if value is None:
+                names.pop(name, None)
+            else:
+                names[name] = None
+        return list(names)
+
+    def staged_exercise(self, exercise_name: str) -> Optional[Exercise]:
+        """Get an exercise as it would be after committing, None if absent."""
+        net = self.net_changes("exercise")
+        if exercise_name in net:
+            value = net[exercise_name]
+            assert value is None or isinstance(value, Exercise)
+            return value
+        return self.exercise_manager.exercises.get(exercise_name)
+
+    def staged_workouts(self) -> dict[str, WorkoutConfig]:
+        """Get saved workouts as they would be after committing."""
+        workouts = dict(self.workout_manager.workouts)
+        for name, value in self.net_changes("workout").items():
+            if value is None:
+                workouts.pop(name, None)
+            else:
+                assert isinstance(value, WorkoutConfig)
+                workouts[name] = value
+        return workouts
+
+    def diff(self) -> list[str]:
+        """Describe what committing would change, one line per edited name.
+
+        Lines start with "+" for additions, "-" for removals and "~" for
+        updates. Edits that cancel out are not shown.
+        """
+        lines = []
+        libraries: dict[str, dict] = {
+            "exercise": self.exercise_manager.exercises,
+            "workout": self.workout_manager.workouts,
+        }
+        for kind, current in libraries.items():
+            for name, value in self.net_changes(kind).items():
+                if value is None and name in current:
+                    lines.append(f"- {kind} {name}")
+                elif value is not None and name not in current:
+                    lines.append(f"+ {kind} {name}")
+                elif value is not None and value != current[name]:
+                    lines.append(f"~ {kind} {name}")
+        return lines
+
+    def validate(self) -> list[str]:
+        """Get problems with the staged edits taken as a whole."""
+        errors = []
+        for name, value in self.net_changes("exercise").items():
+            if value is not None and not name.strip():
+                errors.append("Exercises need a name")
+
+        exercise_names = set(self.staged_exercise_names())
+        for workout_name, config in self.staged_workouts().items():
+            if not workout_name.strip():
+                errors.append("Workouts need a name")
+            if not config.exercises:
+                errors.append(f"Workout {workout_name!r} has no exercises")
+            for exercise_name in sorted(config.exercise_names - exercise_names):
+                errors.append(
+                    f"Workout {workout_name!r} uses missing exercise {exercise_name!r}"
+                )
+        return errors
+
+    def commit(self):
+        """Validate and save all staged edits, writing each library once.
+
+        Raises a ValueError listing the problems if the edits are invalid, in
+        which case nothing is written.
+        """
+        errors = self.validate()
+        if errors:
+            raise ValueError("\n".join(errors))
+
+        exercise_upserts, exercise_removals = self._split_net_changes(
+            "exercise", self.exercise_manager.exercises
+        )
+        if exercise_upserts or exercise_removals:
+            self.exercise_manager.apply_changes(
+                exercise_upserts.values(), exercise_removals
+            )
+
+        workout_upserts, workout_removals = self._split_net_changes(
+            "workout", self.workout_manager.workouts
+        )
+        if workout_upserts or workout_removals:
+            self.workout_manager.apply_changes(workout_upserts, workout_removals)
+        self.discard()
+
+    def _split_net_changes(self, kind: str, current: dict) -> tuple[dict, list[str]]:
+        """Split net changes into values which differ and names to remove."""
+        net = self.net_changes(kind)
+        upserts = {
+            name: value
+            for name, value in net.items()
+            if value is not None and current.get(name) != value
+        }
+        removals = [
+            name for name, value in net.items() if value is None and name in current
+        ]
+        return upserts, removals
@@ -0,0 +1,172 @@
+"""Circuit classes, where groups rotate between stations on one clock.
+
+A workout's exercises are split into circuits of one exercise per station.
+Within a circuit each group starts at a different station and moves on to
+the next one after every exercise, so that every group does every exercise
+of the circuit before the class moves on to the next circuit. All stations
+share one timeline of rests, for moving between stations, and exercises,
+so a single countdown drives the whole class.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+import bisect
+
+from exercise import Exercise, ExerciseManager, Rest
+from workout import Phase, Workout, workout_from_config, WorkoutConfig
+
+# every exercise phase of the shared timeline, whatever each station does
+ROTATION = Exercise("Rotation", False)
+
+
+@dataclass
+class Circuit:
+    """The exercise at each station, None if unused, and the durations."""
+
+    exercise_names: list[Optional[str]]
+    exercise_duration_seconds: int
+    rest_duration_seconds: int
+
+
+@dataclass
+class StationView:
+    """What a station shows during a rotation, and its rest beforehand."""
+
+    station: int
+    exercise_name: Optional[str]
+    group: int
+
+
+class RotationPlan:
+    """Which group is at which station doing what, for each phase of a class.
+
+    There are as many groups as stations, numbered from 1 like the stations,
+    and group g starts each circuit at station g.
+    """
+
+    def __init__(self, circuits: list[Circuit]):
+        if not circuits:
+            raise ValueError("A class needs at least one exercise")
+        self.circuits = circuits
+        self.num_stations = len(circuits[0].exercise_names)
+        # index of the first phase of each circuit, as rests can be skipped
+        self.circuit_starts: list[int] = []
+        self.timeline = self._build_timeline()
+
+    @classmethod
+    def from_workout(cls, workout: Workout, num_stations: int) -> RotationPlan:
+        """Split the exercises of a workout into circuits of `num_stations`.
+
+        The stations of the last circuit are left unused if there are not
+        enough exercises to fill them. Each circuit's rotations last as long
+        as its longest exercise and rest.
+        """
+        if num_stations < 1:
+            raise ValueError("A class needs at least one station")
+        exercises: list[tuple[str, int, int]] = []
+        rest_seconds = 0
+        for phase in workout:
+            if isinstance(phase.type, Exercise):
+                exercises.append(
+                    (phase.type.name, phase.duration_seconds, rest_seconds)
+                )
+                rest_seconds = 0
+            else:
+                rest_seconds += phase.duration_seconds
+
+        circuits = []
+        for start in range(0, len(exercises), num_stations):
+            chunk = exercises[start : start + num_stations]
+            names: list[Optional[str]] = [name for name, _, _ in chunk]
+            circuits.append(
+                Circuit(
+                    exercise_names=names + [None] * (num_stations - len(names)),
+                    exercise_duration_seconds=max(seconds for _, seconds, _ in chunk),
+                    rest_duration_seconds=max(seconds for _, _, seconds in chunk),
+                )
+            )
+        return cls(circuits)
+
+    @classmethod
+    def from_config(
+        cls,
+        exercise_manager: ExerciseManager,
+        config: WorkoutConfig,
+        num_stations: int,
+    ) -> RotationPlan:
+        """Plan a class from a saved workout."""
+        return cls.from_workout(
+            workout_from_config(exercise_manager, config), num_stations
+        )
+
+    def _build_timeline(self) -> Workout:
+        """The shared phases, a rest then an exercise for every rotation.
+
+        Phases of the same duration are shared rather than copied.
+        """
+        phases: dict[tuple[int, bool], Phase] = {}
+
+        def phase(duration_seconds: int, is_rest: bool) -> Phase:
+            key = (duration_seconds, is_rest)
+            if key not in phases:
+                phases[key] = Phase(duration_seconds, Rest() if is_rest else ROTATION)
+            return phases[key]
+
+        timeline: list[Phase] = []
+        for circuit in self.circuits:
+            self.circuit_starts.append(len(timeline))
+            for _ in range(self.num_stations):
+                if circuit.rest_duration_seconds:
+                    timeline.append(phase(circuit.rest_duration_seconds, True))
+                timeline.append(phase(circuit.exercise_duration_seconds, False))
+        return timeline
+
+    def rotation_at(self, phase_index: int) -> tuple[int, int]:
+        """Get the circuit and rotation within it of a phase of the timeline.
+
+        A rest belongs to the rotation it leads into.
+        """
+        if not 0 <= phase_index < len(self.timeline):
+            raise IndexError(f"No phase {phase_index} in class")
+        circuit_index = bisect.bisect_right(self.circuit_starts, phase_index) - 1
+        circuit = self.circuits[circuit_index]
+        phases_per_rotation = 2 if circuit.rest_duration_seconds else 1
+        offset = phase_index - self.circuit_starts[circuit_index]
+        return circuit_index, offset // phases_per_rotation
+
+    def group_at(self, station: int, rotation: int) -> int:
+        """Get the group at a station (both from 1) during a rotation."""
+        return (station - 1 - rotation) % self.num_stations + 1
+
+    def stations_at(self, phase_index: int) -> list[StationView]:
+        """Get what every station shows during a phase of the timeline."""
+        circuit_index, rotation = self.rotation_at(phase_index)
+        circuit = self.circuits[circuit_index]
+        return [
+            StationView(
+                station=station,
+                exercise_name=exercise_name,
+                group=self.group_at(station, rotation),
+            )
+            for station, exercise_name in enumerate(circuit.exercise_names, start=1)
+        ]
+
+    def describe(self, phase_index: int) -> list[str]:
+        """Lines describing where the class is, and the next circuit if any."""
+        circuit_index, rotation = self.rotation_at(phase_index)
+        lines = [
+            f"Circuit {circuit_index + 1}/{len(self.circuits)}, "
+            f"rotation {rotation + 1}/{self.num_stations}"
+        ]
+        if circuit_index + 1 < len(self.circuits):
+            next_circuit = self.circuits[circuit_index + 1]
+            lines.append("Next circuit:")
+            lines += [
+                f"{station}. {exercise_name}"
+                for station, exercise_name in enumerate(
+                    next_circuit.exercise_names, start=1
+                )
+                if exercise_name is not None
+            ]
+        return lines
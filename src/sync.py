@@ -0,0 +1,449 @@
+"""Syncing of libraries between devices through a shared hub directory, e.g.
+
+    python src/sync.py /mnt/hub
+    python src/sync.py /mnt/hub --profile alex --prefer hub
+
+The hub, a local or mounted directory, holds each library as a Merkle tree
+of immutable, content-addressed files
+
+    <hub>/<library>/root.json               bucket -> hash of its bucket file
+    <hub>/<library>/buckets/<hash>.json     entry name -> hash of the entry
+    <hub>/<library>/objects/<hash>.json     entry
+
+where entries are put in buckets by a hash of their name. Each device keeps
+the entry hashes it last agreed with the hub, its base, next to the library.
+A sync only reads the buckets whose hash differs from the base on either
+side, and only writes the entries and buckets that changed, so syncing a
+large library with a few changes is cheap.
+
+Entries changed on both sides are merged field by field against the base.
+Entries where both sides changed a field differently, or where one side
+deleted what the other changed, are reported as conflicts: each side keeps
+its own version until one is edited to match the other, or the sync is run
+preferring one side.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from persistence import SnapshotStore, Version, file_lock, get_store
+from profiles import DEFAULT_PROFILE, ProfileManager, WORKOUTS_FILE_NAME
+
+BUCKET_PREFIX_LENGTH = 2
+SYNC_STATE_SUFFIX = ".sync.json"
+EXERCISES_FILE_NAME = "exercises.json"
+LOCAL, HUB = "local", "hub"
+
+# name -> entry hash, for all entries or those in one bucket
+Hashes = dict[str, str]
+
+
+def entry_hash(value: Any) -> str:
+    """Hash of an entry, the same whatever the order of its keys."""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def bucket_of(name: str) -> str:
+    return hashlib.sha256(name.encode()).hexdigest()[:BUCKET_PREFIX_LENGTH]
+
+
+def bucket_hash(hashes: Hashes) -> str:
+    return hashlib.sha256(json.dumps(sorted(hashes.items())).encode()).hexdigest()
+
+
+def group_by_bucket(hashes: Hashes) -> dict[str, Hashes]:
+    buckets: dict[str, Hashes] = {}
+    for name, hash_ in hashes.items():
+        buckets.setdefault(bucket_of(name), {})[name] = hash_
+    return buckets
+
+
+def merge_fields(base: dict, local: dict, hub: dict) -> Optional[dict]:
+    """Merge two edits of an entry field by field, or None if they conflict."""
+    merged = {}
+    missing = object()
+    for key in sorted(set(base) | set(local) | set(hub)):
+        base_value = base.get(key, missing)
+        local_value = local.get(key, missing)
+        hub_value = hub.get(key, missing)
+        if local_value == hub_value or hub_value == base_value:
+            value = local_value
+        elif local_value == base_value:
+            value = hub_value
+        else:
+            return None
+        if value is not missing:
+            merged[key] = value
+    return merged
+
+
+def write_immutable(path: Path, data: Any):
+    """Write a content-addressed file, unless it was already written."""
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(data))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+@dataclass
+class Conflict:
+    """An entry changed differently on both sides."""
+
+    name: str
+    reason: str
+
+
+@dataclass
+class SyncReport:
+    """What a sync of one library changed on each side."""
+
+    library: str
+    uploaded: list[str] = field(default_factory=list)
+    downloaded: list[str] = field(default_factory=list)
+    merged: list[str] = field(default_factory=list)
+    conflicts: list[Conflict] = field(default_factory=list)
+    buckets_read: int = 0
+
+    def describe(self) -> list[str]:
+        """Describe the sync, one line per change or conflict."""
+        lines = [
+            f"{self.library}: {len(self.uploaded)} uploaded, "
+            f"{len(self.downloaded)} downloaded, {len(self.merged)} merged, "
+            f"{len(self.conflicts)} conflicts"
+        ]
+        lines += [f"  conflict in {c.name!r}: {c.reason}" for c in self.conflicts]
+        return lines
+
+
+class Hub:
+    """One library's tree in the hub directory, see module docstring."""
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self.root_store = SnapshotStore(self.folder / "root.json")
+
+    def object_path(self, hash_: str) -> Path:
+        return self.folder / "objects" / hash_[:2] / f"{hash_}.json"
+
+    def bucket_path(self, hash_: str) -> Path:
+        return self.folder / "buckets" / f"{hash_}.json"
+
+    def read_object(self, hash_: str) -> Any:
+        with open(self.object_path(hash_), "r") as f:
+            return json.load(f)
+
+    def read_bucket(self, hash_: str) -> Hashes:
+        with open(self.bucket_path(hash_), "r") as f:
+            return json.load(f)
+
+    def write_object(self, hash_: str, value: Any):
+        write_immutable(self.object_path(hash_), value)
+
+    def write_bucket(self, hashes: Hashes) -> str:
+        hash_ = bucket_hash(hashes)
+        write_immutable(self.bucket_path(hash_), hashes)
+        return hash_
+
+
+class LibrarySync:
+    """Syncs a JSON library of named entries with its tree in a hub.
+
+    The library is locked for the whole sync, and the hub's root is only
+    published once all new entries and buckets are written, with a
+    compare-and-swap on its version under the hub's lock, so concurrent
+    syncs from several devices are serialised and a crashed sync leaves
+    the hub as it was.
+    """
+
+    def __init__(self, library_path: Path, hub_folder: Path):
+        self.library_path = Path(library_path)
+        self.hub = Hub(hub_folder)
+        self.state_store = SnapshotStore(
+            self.library_path.with_name(self.library_path.name + SYNC_STATE_SUFFIX)
+        )
+
+    def load_state(self) -> dict:
+        """Load the base agreed with this hub at the last sync, if any."""
+        _, state = self.state_store.read()
+        if state.get("hub") != str(self.hub.folder.resolve()):
+            return {"base": {}, "base_tree": {}, "overrides": {}}
+        return state
+
+    def local_buckets(
+        self,
+        state: dict,
+        library_version: Optional[Version],
+        library: dict,
+    ) -> dict[str, Hashes]:
+        """Get local hashes of buckets which differ from the base.
+
+        If the library is the version written at the last sync, it matches
+        the base but for conflicting entries, and nothing is hashed.
+        """
+        base: dict[str, Hashes] = state["base"]
+        if library_version is not None and state.get("library_version") == list(
+            library_version
+        ):
+            changed: dict[str, Hashes] = {}
+            for name, hash_ in state["overrides"].items():
+                bucket = bucket_of(name)
+                hashes = changed.setdefault(bucket, dict(base.get(bucket, {})))
+                if hash_ is None:
+                    hashes.pop(name, None)
+                else:
+                    hashes[name] = hash_
+            return changed
+
+        local = group_by_bucket(
+            {name: entry_hash(value) for name, value in library.items()}
+        )
+        return {
+            bucket: local.get(bucket, {})
+            for bucket in set(local) | set(base)
+            if local.get(bucket, {}) != base.get(bucket, {})
+        }
+
+    def sync(self, prefer: Optional[str] = None) -> SyncReport:
+        """Sync both ways, preferring one side in conflicts if given."""
+        report = SyncReport(self.library_path.stem)
+        library_store = get_store(self.library_path)
+        self.hub.folder.mkdir(parents=True, exist_ok=True)
+        with file_lock(library_store.lock_path), file_lock(
+            self.hub.root_store.lock_path
+        ):
+            library_version, library = library_store.read()
+            state = self.load_state()
+            base: dict[str, Hashes] = state["base"]
+            base_tree: dict[str, str] = state["base_tree"]
+            root_version, root = self.hub.root_store.read()
+
+            local_changed = self.local_buckets(state, library_version, library)
+            hub_changed = {
+                bucket
+                for bucket in set(root) | set(base_tree)
+                if root.get(bucket) != base_tree.get(bucket)
+            }
+
+            new_root = dict(root)
+            new_base_tree = dict(base_tree)
+            new_base = dict(base)
+            overrides = {
+                name: hash_
+                for name, hash_ in state["overrides"].items()
+                if bucket_of(name) not in set(local_changed) | hub_changed
+            }
+            local_edits: dict[str, Optional[Any]] = {}
+
+            for bucket in sorted(set(local_changed) | hub_changed):
+                base_hashes = base.get(bucket, {})
+                local_hashes = local_changed.get(bucket, base_hashes)
+                if bucket in hub_changed:
+                    hub_hashes = (
+                        self.hub.read_bucket(root[bucket]) if bucket in root else {}
+                    )
+                    report.buckets_read += 1
+                else:
+                    hub_hashes = base_hashes
+                agreed, new_hub_hashes = self.merge_bucket(
+                    base_hashes,
+                    local_hashes,
+                    hub_hashes,
+                    library,
+                    prefer,
+                    report,
+                    local_edits,
+                    overrides,
+                )
+
+                if new_hub_hashes != hub_hashes:
+                    if new_hub_hashes:
+                        new_root[bucket] = self.hub.write_bucket(new_hub_hashes)
+                    else:
+                        new_root.pop(bucket, None)
+                if agreed:
+                    new_base[bucket] = agreed
+                    new_base_tree[bucket] = bucket_hash(agreed)
+                else:
+                    new_base.pop(bucket, None)
+                    new_base_tree.pop(bucket, None)
+
+            if new_root != root:
+                self.hub.root_store.publish(new_root, root_version)
+            if local_edits:
+                new_library = copy.copy(library)
+                for name, value in local_edits.items():
+                    if value is None:
+                        new_library.pop(name, None)
+                    else:
+                        new_library[name] = value
+                library_version = library_store.publish(new_library, library_version)
+
+            self.state_store.publish(
+                {
+                    "hub": str(self.hub.folder.resolve()),
+                    "library_version": (
+                        list(library_version) if library_version else None
+                    ),
+                    "base": new_base,
+                    "base_tree": new_base_tree,
+                    "overrides": overrides,
+                },
+                self.state_store.version(),
+            )
+        return report
+
+    def merge_bucket(
+        self,
+        base: Hashes,
+        local: Hashes,
+        hub: Hashes,
+        library: dict,
+        prefer: Optional[str],
+        report: SyncReport,
+        local_edits: dict[str, Optional[Any]],
+        overrides: dict[str, Optional[str]],
+    ) -> tuple[Hashes, Hashes]:
+        """Merge one bucket three ways, returning the new base and hub hashes.
+
+        Local edits and entries left conflicting are recorded as it goes.
+        """
+        agreed: Hashes = {}
+        new_hub = dict(hub)
+        for name in sorted(set(base) | set(local) | set(hub)):
+            base_hash, local_hash, hub_hash = (
+                base.get(name),
+                local.get(name),
+                hub.get(name),
+            )
+            if local_hash == hub_hash:
+                result = local_hash
+            elif local_hash == base_hash:
+                result = self.download(name, hub_hash, local_edits)
+                report.downloaded.append(name)
+            elif hub_hash == base_hash:
+                result = self.upload(name, local_hash, library, new_hub)
+                report.uploaded.append(name)
+            else:
+                merged = None
+                if (
+                    base_hash is not None
+                    and local_hash is not None
+                    and hub_hash is not None
+                ):
+                    merged = merge_fields(
+                        self.hub.read_object(base_hash),
+                        library[name],
+                        self.hub.read_object(hub_hash),
+                    )
+                if merged is not None:
+                    result = entry_hash(merged)
+                    self.hub.write_object(result, merged)
+                    new_hub[name] = result
+                    local_edits[name] = merged
+                    report.merged.append(name)
+                elif prefer == HUB:
+                    result = self.download(name, hub_hash, local_edits)
+                    report.downloaded.append(name)
+                elif prefer == LOCAL:
+                    result = self.upload(name, local_hash, library, new_hub)
+                    report.uploaded.append(name)
+                else:
+                    reason = (
+                        "deleted on one side and changed on the other"
+                        if None in (local_hash, hub_hash)
+                        else "changed differently on both sides"
+                    )
+                    report.conflicts.append(Conflict(name, reason))
+                    if base_hash is not None:
+                        agreed[name] = base_hash
+                    overrides[name] = local_hash
+                    continue
+
+            if result is not None:
+                agreed[name] = result
+        return agreed, new_hub
+
+    def download(
+        self,
+        name: str,
+        hash_: Optional[str],
+        local_edits: dict[str, Optional[Any]],
+    ) -> Optional[str]:
+        local_edits[name] = None if hash_ is None else self.hub.read_object(hash_)
+        return hash_
+
+    def upload(
+        self, name: str, hash_: Optional[str], library: dict, hub: Hashes
+    ) -> Optional[str]:
+        if hash_ is None:
+            hub.pop(name, None)
+        else:
+            self.hub.write_object(hash_, library[name])
+            hub[name] = hash_
+        return hash_
+
+
+def sync_profile(
+    hub_folder: Path,
+    profile_name: str = DEFAULT_PROFILE,
+    prefer: Optional[str] = None,
+    profile_manager: Optional[ProfileManager] = None,
+) -> list[SyncReport]:
+    """Sync the shared exercise library and a profile's saved workouts."""
+    profile_manager = profile_manager or ProfileManager()
+    profile_manager.create_profile(profile_name)
+    hub_folder = Path(hub_folder)
+    workouts_hub = "workouts" + (
+        "" if profile_name == DEFAULT_PROFILE else f"-{profile_name}"
+    )
+    libraries = [
+        (Path(profile_manager.data_folder) / EXERCISES_FILE_NAME, "exercises"),
+        (
+            profile_manager.profile_folder(profile_name) / WORKOUTS_FILE_NAME,
+            workouts_hub,
+        ),
+    ]
+    return [
+        LibrarySync(path, hub_folder / hub_name).sync(prefer)
+        for path, hub_name in libraries
+    ]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("hub", type=Path, help="local or mounted hub directory")
+    parser.add_argument(
+        "--profile", default=DEFAULT_PROFILE, help="profile whose workouts to sync"
+    )
+    parser.add_argument(
+        "--prefer",
+        choices=[LOCAL, HUB],
+        help="side whose version wins in conflicts, instead of reporting them",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    reports = sync_profile(args.hub, args.profile, args.prefer)
+    for report in reports:
+        print("\n".join(report.describe()))
+    sys.exit(1 if any(report.conflicts for report in reports) else 0)
@@ -0,0 +1,238 @@
+"""Terminal HIIT workout runner, for machines where the GUI is too heavy.
+
+Only the workout core is used, none of Tk, customtkinter or PIL, e.g.
+
+    python src/tui.py                     # pick a workout from a menu
+    python src/tui.py --workout "Standard 20-minute"
+    python src/tui.py --num-exercises 12 --tags "legs, -jumping"
+    python src/tui.py --workout "Standard 20-minute" --spread-out
+    python src/tui.py --profile alex
+    python src/tui.py --workout "Standard 20-minute" --export-audio workout.wav
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+import argparse
+import curses
+import time
+
+from audio_export import export_workout_audio
+from exercise import Exercise, ExerciseManager, Rest
+from ordering import optimise_order
+from profiles import DEFAULT_PROFILE, ProfileManager
+from sampling import AliasSampler, exercise_weights
+from workout import (
+    base_exercise_name,
+    generate_workout,
+    TagConstraints,
+    Workout,
+    workout_from_config,
+    WorkoutManager,
+)
+
+CUSTOM = "Custom"
+NUM_NEXT_EXERCISES = 5
+
+# colour pair ids
+FIRST_REST, REST, EXERCISE = 1, 2, 3
+
+
+@dataclass
+class PhaseInfo:
+    """What to display during a phase."""
+
+    title: str
+    progress: str
+    next_exercises: list[str]
+    colour: int
+
+
+def phase_info(workout: Workout, phase_index: int) -> PhaseInfo:
+    """Describe a phase in the same terms as the GUI countdown."""
+    exercise_names = [
+        phase.type.name for phase in workout if isinstance(phase.type, Exercise)
+    ]
+    num_exercises = len(exercise_names)
+    exercise_index = sum(
+        1 for phase in workout[: phase_index + 1] if isinstance(phase.type, Exercise)
+    )
+    phase = workout[phase_index]
+    if isinstance(phase.type, Rest):
+        return PhaseInfo(
+            title="Rest",
+            progress=f"{exercise_index}/{num_exercises} exercises completed",
+            next_exercises=exercise_names[exercise_index:],
+            colour=FIRST_REST if exercise_index == 0 else REST,
+        )
+    return PhaseInfo(
+        title=phase.type.name,
+        progress=f"Exercise {exercise_index}/{num_exercises}",
+        next_exercises=exercise_names[exercise_index:],
+        colour=EXERCISE,
+    )
+
+
+def choose_workout_name(stdscr, workout_manager: WorkoutManager) -> Optional[str]:
+    """Menu to pick a saved workout or a custom one, None if cancelled."""
+    options = [CUSTOM] + list(workout_manager.workouts.keys())
+    selected = 0
+    while True:
+        stdscr.erase()
+        stdscr.addstr(0, 2, "Choose a workout (enter to start, q to quit)")
+        height, _ = stdscr.getmaxyx()
+        first = max(0, selected - (height - 4))
+        for row, option in enumerate(options[first : first + height - 3]):
+            attribute = curses.A_REVERSE if first + row == selected else 0
+            stdscr.addstr(row + 2, 4, option, attribute)
+        stdscr.refresh()
+
+        key = stdscr.getch()
+        if key in (curses.KEY_UP, ord("k")):
+            selected = max(0, selected - 1)
+        elif key in (curses.KEY_DOWN, ord("j")):
+            selected = min(len(options) - 1, selected + 1)
+        elif key in (curses.KEY_ENTER, ord("\n"), ord("\r")):
+            return options[selected]
+        elif key in (ord("q"), 27):
+            return None
+
+
+def draw_phase(stdscr, info: PhaseInfo, remaining_seconds: int, paused: bool):
+    """Draw the countdown, current exercise and next exercises."""
+    stdscr.erase()
+    height, width = stdscr.getmaxyx()
+    colour = curses.color_pair(info.colour) | curses.A_BOLD
+
+    def centred(row: int, text: str, attribute: int = 0):
+        if 0 <= row < height:
+            text = text[: width - 1]
+            stdscr.addstr(row, max(0, (width - len(text)) // 2), text, attribute)
+
+    centred(1, info.title, colour)
+    centred(2, info.progress)
+    centred(4, f"{remaining_seconds:>3}", colour)
+    if paused:
+        centred(5, "PAUSED (p to resume)")
+    centred(7, "Next exercises", curses.A_UNDERLINE)
+    for row, name in enumerate(info.next_exercises[:NUM_NEXT_EXERCISES]):
+        centred(8 + row, name)
+    centred(height - 1, "p: pause/resume  q: quit")
+    stdscr.refresh()
+
+
+def run_workout(stdscr, workout: Workout) -> int:
+    """Count down through a workout, returning the index of the last phase reached.
+
+    Ticks are scheduled against a monotonic clock so that time spent drawing
+    does not accumulate as drift.
+    """
+    stdscr.nodelay(False)
+    last_phase_index = -1
+    for phase_index, phase in enumerate(workout):
+        info = phase_info(workout, phase_index)
+        last_phase_index = phase_index
+        remaining_seconds = phase.duration_seconds
+        next_tick = time.monotonic()
+        paused = False
+        while remaining_seconds > 0:
+            draw_phase(stdscr, info, remaining_seconds, paused)
+            if paused:
+                stdscr.timeout(-1)
+            else:
+                wait_seconds = max(0.0, next_tick + 1 - time.monotonic())
+                stdscr.timeout(int(wait_seconds * 1000))
+            key = stdscr.getch()
+            if key == ord("q"):
+                return last_phase_index
+            elif key == ord("p"):
+                paused = not paused
+                if not paused:
+                    next_tick = time.monotonic()
+            elif key == -1 and not paused:
+                remaining_seconds -= 1
+                next_tick += 1
+            # any other key, e.g. a terminal resize, just redraws
+    return last_phase_index
+
+
+def setup_colours():
+    """Colours for the countdown, matching the GUI where the terminal allows."""
+    curses.start_color()
+    curses.use_default_colors()
+    curses.init_pair(FIRST_REST, curses.COLOR_YELLOW, -1)
+    curses.init_pair(REST, curses.COLOR_GREEN, -1)
+    curses.init_pair(EXERCISE, curses.COLOR_RED, -1)
+
+
+def main(stdscr, args: argparse.Namespace):
+    curses.curs_set(0)
+    setup_colours()
+
+    exercise_manager = ExerciseManager()
+    profile = ProfileManager().load(args.profile)
+    workout_manager = profile.workout_manager
+    history = profile.exercise_history
+
+    workout_name = args.workout or choose_workout_name(stdscr, workout_manager)
+    if workout_name is None:
+        return
+    elif workout_name == CUSTOM:
+        workout = generate_workout(
+            exercise_manager,
+            num_exercises=args.num_exercises,
+            exercise_duration_seconds=args.exercise_duration,
+            rest_duration_seconds=args.rest_duration,
+            sampler=AliasSampler(exercise_weights(exercise_manager, history)),
+            constraints=TagConstraints.parse(args.tags) if args.tags else None,
+            fingerprints=profile.workout_fingerprints,
+        )
+    else:
+        workout = workout_from_config(exercise_manager, workout_manager[workout_name])
+    if args.spread_out:
+        workout = optimise_order(exercise_manager, workout)
+    if args.export_audio:
+        export_workout_audio(workout, args.export_audio)
+        return
+
+    last_phase_index = run_workout(stdscr, workout)
+    exercise_names = {
+        base_exercise_name(phase.type.name)
+        for phase in workout[: last_phase_index + 1]
+        if isinstance(phase.type, Exercise)
+    }
+    if exercise_names:
+        history.record(exercise_names)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workout", help="name of a saved workout, or 'Custom'")
+    parser.add_argument(
+        "--profile", default=DEFAULT_PROFILE, help="profile whose workouts to use"
+    )
+    parser.add_argument("--num-exercises", type=int, default=20)
+    parser.add_argument("--exercise-duration", type=int, default=40)
+    parser.add_argument("--rest-duration", type=int, default=20)
+    parser.add_argument("--tags", help="tag constraints, e.g. 'legs, -jumping'")
+    parser.add_argument(
+        "--spread-out",
+        action="store_true",
+        help="reorder exercises so that similar ones are not back to back",
+    )
+    parser.add_argument(
+        "--export-audio",
+        metavar="PATH",
+        help=(
+            "write the workout to a WAV track to follow offline, "
+            "instead of running it"
+        ),
+    )
+    args = parser.parse_args()
+    if args.tags and args.workout is None:
+        args.workout = CUSTOM
+    return args
+
+
+if __name__ == "__main__":
+    curses.wrapper(main, parse_args())
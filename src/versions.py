@@ -0,0 +1,273 @@
+"""Version history of saved workouts, stored as deltas between versions.
+
+Every saved version of a workout is kept as a record. A record is either a
+checkpoint holding the whole config, a delta holding the durations that
+changed and an edit script turning the previous version's exercises into
+this version's, or a marker that the workout was removed. A checkpoint is
+stored every `checkpoint_interval` versions, so any version is rebuilt from
+the checkpoint before it with fewer than `checkpoint_interval` deltas.
+"""
+from __future__ import annotations
+
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Any, Optional
+import bisect
+import json
+import time
+
+from persistence import BackgroundWriter, Version, get_store, persist
+from utils import get_path_to_file
+from workout import WorkoutConfig
+
+SECONDS_PER_DAY = 24 * 60 * 60
+DURATION_KEYS = ("exercise_duration_seconds", "rest_duration_seconds")
+
+# an edit script is a list of [start, end, items] replacing old items[start:end]
+EditScript = list[list[Any]]
+
+
+def item_key(item: Any) -> str:
+    """Hashable form of a serialised exercise or block, for diffing."""
+    return json.dumps(item, sort_keys=True)
+
+
+def exercises_delta(old: list, new: list) -> EditScript:
+    """Get an edit script turning one list of serialised exercises into another."""
+    matcher = SequenceMatcher(
+        None, [item_key(item) for item in old], [item_key(item) for item in new]
+    )
+    return [
+        [start, end, new[new_start:new_end]]
+        for tag, start, end, new_start, new_end in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_exercises_delta(items: list, script: EditScript) -> list:
+    """Apply an edit script, going backwards so positions stay valid."""
+    items = list(items)
+    for start, end, replacement in reversed(script):
+        items[start:end] = replacement
+    return items
+
+
+def describe_item(item: Any) -> str:
+    """Describe a serialised exercise or block on one line."""
+    if isinstance(item, str):
+        return item
+    names = ", ".join(describe_item(child) for child in item["exercises"])
+    return f"{item.get('rounds', 1)} x [{names}]"
+
+
+class WorkoutVersions:
+    """Version history of a profile's saved workouts, see module docstring.
+
+    Histories are pruned when a version is recorded, to at most
+    `max_versions` versions none older than `max_age_days`, though the
+    latest version of a workout is always kept.
+    """
+
+    def __init__(
+        self,
+        path: Path = Path("src") / "data" / "workout_versions.json",
+        checkpoint_interval: int = 10,
+        max_versions: int = 50,
+        max_age_days: float = 365.0,
+        writer: Optional[BackgroundWriter] = None,
+    ):
+        self.path = get_path_to_file(path)
+        self.checkpoint_interval = checkpoint_interval
+        self.max_versions = max_versions
+        self.max_age_seconds = max_age_days * SECONDS_PER_DAY
+        self.writer = writer
+        self.version: Optional[Version] = None
+        self.histories = self.load_histories()
+
+    def __len__(self) -> int:
+        return len(self.histories)
+
+    def load_histories(self) -> dict[str, list[dict]]:
+        """Load the histories of all workouts, if there are any."""
+        self.version, histories = get_store(self.path).read()
+        # records are replaced rather than changed, so the lists are enough to copy
+        return {name: list(records) for name, records in histories.items()}
+
+    def reload_if_changed(self):
+        """Reload histories if another version of the file has been published."""
+        if self.writer is not None and self.writer.has_pending(Path(self.path)):
+            return
+        if get_store(self.path).version() != self.version:
+            self.histories = self.load_histories()
+
+    def versions(self, workout_name: str) -> list[int]:
+        """Get the version numbers kept for a workout, oldest first."""
+        return [record["version"] for record in self.histories.get(workout_name, [])]
+
+    def saved_at(self, workout_name: str, version: int) -> float:
+        """Get when a version of a workout was saved."""
+        records = self.histories[workout_name]
+        return records[self._index(records, version)]["saved_at"]
+
+    def get(self, workout_name: str, version: int) -> Optional[WorkoutConfig]:
+        """Rebuild a version of a workout, or None if it was a removal.
+
+        Raises a KeyError if the version is not kept.
+        """
+        records = self.histories.get(workout_name, [])
+        config = self._rebuild(records, self._index(records, version))
+        return None if config is None else WorkoutConfig.from_dict(config)
+
+    def latest(self, workout_name: str) -> Optional[WorkoutConfig]:
+        """Rebuild the latest version of a workout, if there is one."""
+        records = self.histories.get(workout_name)
+        if not records:
+            return None
+        config = self._rebuild(records, len(records) - 1)
+        return None if config is None else WorkoutConfig.from_dict(config)
+
+    @staticmethod
+    def _index(records: list[dict], version: int) -> int:
+        versions = [record["version"] for record in records]
+        index = bisect.bisect_left(versions, version)
+        if index == len(versions) or versions[index] != version:
+            raise KeyError(f"Version {version} is not kept")
+        return index
+
+    @staticmethod
+    def _rebuild(records: list[dict], index: int) -> Optional[dict]:
+        """Rebuild the config of a record from the checkpoint before it."""
+        start = index
+        while "delta" in records[start]:
+            start -= 1
+        if records[start].get("removed"):
+            return None
+        config = dict(records[start]["config"])
+        for record in records[start + 1 : index + 1]:
+            delta = record["delta"]
+            for key in DURATION_KEYS:
+                if key in delta:
+                    config[key] = delta[key]
+            if "exercises" in delta:
+                config["exercises"] = apply_exercises_delta(
+                    config["exercises"], delta["exercises"]
+                )
+        return config
+
+    def record(
+        self,
+        changes: dict[str, Optional[WorkoutConfig]],
+        previous: Optional[dict[str, Optional[WorkoutConfig]]] = None,
+        when: Optional[float] = None,
+    ):
+        """Record new versions of workouts, None meaning a workout was removed.
+
+        Workouts without a history start with their `previous` config, so
+        the version they had before the first recorded change is kept.
+        """
+        if when is None:
+            when = time.time()
+        self.reload_if_changed()
+        previous = previous or {}
+        recorded = {}
+        for workout_name, config in changes.items():
+            records = self.histories.setdefault(workout_name, [])
+            old = previous.get(workout_name)
+            if not records and old is not None:
+                records.append(self._new_record(records, old.to_dict(), 1, when))
+            self._append(records, None if config is None else config.to_dict(), when)
+            self.prune(records, when)
+            if records:
+                recorded[workout_name] = list(records)
+            else:
+                del self.histories[workout_name]
+        if recorded:
+            persist(self.path, lambda data: data.update(recorded), self.writer)
+
+    def _append(self, records: list[dict], config: Optional[dict], when: float):
+        """Append a version unless it is the same as the latest."""
+        latest = self._rebuild(records, len(records) - 1) if records else None
+        if latest == config:
+            return
+        version = records[-1]["version"] + 1 if records else 1
+        if config is None:
+            records.append({"version": version, "saved_at": when, "removed": True})
+        else:
+            records.append(self._new_record(records, config, version, when, latest))
+
+    def _new_record(
+        self,
+        records: list[dict],
+        config: dict,
+        version: int,
+        when: float,
+        latest: Optional[dict] = None,
+    ) -> dict:
+        """Make a delta against the latest version, or a checkpoint if due."""
+        checkpoint = {"version": version, "saved_at": when, "config": config}
+        if latest is None:
+            return checkpoint
+        num_deltas = 0
+        for record in reversed(records):
+            if "delta" not in record:
+                break
+            num_deltas += 1
+        if num_deltas + 1 >= self.checkpoint_interval:
+            return checkpoint
+
+        delta: dict[str, Any] = {
+            key: config[key] for key in DURATION_KEYS if config[key] != latest[key]
+        }
+        script = exercises_delta(latest["exercises"], config["exercises"])
+        if script:
+            delta["exercises"] = script
+        # a delta rewriting most of a workout is no smaller than a checkpoint
+        if len(json.dumps(delta)) >= len(json.dumps(config)):
+            return checkpoint
+        return {"version": version, "saved_at": when, "delta": delta}
+
+    def prune(self, records: list[dict], now: float):
+        """Apply the retention policy, keeping the oldest kept version whole."""
+        keep_from = max(0, len(records) - self.max_versions)
+        while (
+            keep_from < len(records) - 1
+            and records[keep_from]["saved_at"] < now - self.max_age_seconds
+        ):
+            keep_from += 1
+        if keep_from == 0:
+            return
+        first = records[keep_from]
+        if "delta" in first:
+            config = self._rebuild(records, keep_from)
+            assert config is not None
+            first = {
+                "version": first["version"],
+                "saved_at": first["saved_at"],
+                "config": config,
+            }
+        records[:] = [first] + records[keep_from + 1 :]
+
+    def diff(self, workout_name: str, old_version: int, new_version: int) -> list[str]:
+        """Describe how one version of a workout differs from another.
+
+        Lines start with "+" for added exercises, "-" for removed ones and
+        "~" for duration changes.
+        """
+        old = self.get(workout_name, old_version)
+        new = self.get(workout_name, new_version)
+        if old is None or new is None:
+            if old is new:
+                return []
+            return ["+ workout"] if old is None else ["- workout"]
+
+        lines = []
+        for key in DURATION_KEYS:
+            old_seconds, new_seconds = getattr(old, key), getattr(new, key)
+            if old_seconds != new_seconds:
+                label = key.replace("_", " ").replace(" seconds", "")
+                lines.append(f"~ {label} {old_seconds}s -> {new_seconds}s")
+        old_items, new_items = old.to_dict()["exercises"], new.to_dict()["exercises"]
+        for start, end, replacement in exercises_delta(old_items, new_items):
+            lines += [f"- {describe_item(item)}" for item in old_items[start:end]]
+            lines += [f"+ {describe_item(item)}" for item in replacement]
+        return lines
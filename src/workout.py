@@ -1,14 +1,25 @@
 """Functions and structs for creating workouts."""
 from __future__ import annotations
 
-from dataclasses import asdict, dataclass
+from collections import Counter, deque
+from dataclasses import dataclass, field
 from pathlib import Path
-import json
+from typing import Iterable, Iterator, Optional, TYPE_CHECKING, Union
 import random
 
 from exercise import Exercise, ExerciseManager, Rest
+from persistence import BackgroundWriter, Version, get_store, persist
 from utils import get_path_to_file
 
+if TYPE_CHECKING:
+    from fingerprints import WorkoutFingerprints
+    from sampling import AliasSampler
+    from versions import WorkoutVersions
+    from workout_index import WorkoutIndex, WorkoutQuery
+
+# candidates drawn before accepting a workout generated recently
+MAX_FINGERPRINT_REDRAWS = 20
+
 
 @dataclass
 class Phase:
@@ -21,35 +32,198 @@ class Phase:
 Workout = list[Phase]
 
 
+@dataclass
+class Block:
+    """Exercises repeated for a number of rounds, e.g. a circuit.
+
+    Blocks can be nested. Durations that are not set are inherited from the
+    enclosing block or workout, and from the second round on the rest before
+    the first exercise of the block lasts `round_rest_seconds`, if set.
+    """
+
+    exercises: list[Union[str, Block]]
+    rounds: int = 1
+    exercise_duration_seconds: Optional[int] = None
+    rest_duration_seconds: Optional[int] = None
+    round_rest_seconds: Optional[int] = None
+
+    @classmethod
+    def tabata(
+        cls,
+        exercises: list[Union[str, Block]],
+        rounds: int = 8,
+        work_seconds: int = 20,
+        rest_seconds: int = 10,
+    ) -> Block:
+        """Tabata intervals: by default 8 rounds of 20s work and 10s rest."""
+        return cls(exercises, rounds, work_seconds, rest_seconds)
+
+    @classmethod
+    def emom(
+        cls, exercises: list[Union[str, Block]], minutes: int, work_seconds: int
+    ) -> Block:
+        """Every minute on the minute: each exercise starts on a new minute.
+
+        Assumes exercises have no 1-handed variations, as both sides would
+        each take a minute.
+        """
+        return cls(
+            exercises,
+            rounds=max(1, minutes // max(1, len(exercises))),
+            exercise_duration_seconds=work_seconds,
+            rest_duration_seconds=60 - work_seconds,
+        )
+
+    @classmethod
+    def from_dict(cls, block: dict) -> Block:
+        """Create a block from JSON, where unset durations are left out."""
+        return cls(
+            exercises=parse_exercises(block["exercises"]),
+            rounds=block.get("rounds", 1),
+            exercise_duration_seconds=block.get("exercise_duration_seconds"),
+            rest_duration_seconds=block.get("rest_duration_seconds"),
+            round_rest_seconds=block.get("round_rest_seconds"),
+        )
+
+
+def parse_exercises(items: list) -> list[Union[str, Block]]:
+    """Parse exercises loaded from JSON, where blocks are dicts."""
+    return [item if isinstance(item, str) else Block.from_dict(item) for item in items]
+
+
+def serialise_exercises(items: list[Union[str, Block]]) -> list:
+    """Convert exercises to JSON, leaving out unset block durations."""
+    serialised: list = []
+    for item in items:
+        if isinstance(item, str):
+            serialised.append(item)
+        else:
+            block = {
+                key: value
+                for key, value in vars(item).items()
+                if value is not None and key != "exercises"
+            }
+            block["exercises"] = serialise_exercises(item.exercises)
+            serialised.append(block)
+    return serialised
+
+
+def iter_exercise_names(items: list[Union[str, Block]]) -> Iterator[str]:
+    """Get names of exercises referenced, once per reference ignoring rounds."""
+    for item in items:
+        if isinstance(item, str):
+            yield item
+        else:
+            yield from iter_exercise_names(item.exercises)
+
+
 @dataclass
 class WorkoutConfig:
-    """Config for a stored workout."""
+    """Config for a stored workout.
+
+    Exercises are names of exercises or nested blocks of them.
+    """
 
     exercise_duration_seconds: int
     rest_duration_seconds: int
-    exercises: list[str]
+    exercises: list[Union[str, Block]]
+
+    @classmethod
+    def from_dict(cls, config: dict) -> WorkoutConfig:
+        """Create config from JSON, where workouts may be flat or nested."""
+        return cls(
+            exercise_duration_seconds=config["exercise_duration_seconds"],
+            rest_duration_seconds=config["rest_duration_seconds"],
+            exercises=parse_exercises(config["exercises"]),
+        )
+
+    def to_dict(self) -> dict:
+        """Convert config to JSON, so flat workouts look as they always have."""
+        return {
+            "exercise_duration_seconds": self.exercise_duration_seconds,
+            "rest_duration_seconds": self.rest_duration_seconds,
+            "exercises": serialise_exercises(self.exercises),
+        }
+
+    @property
+    def exercise_names(self) -> set[str]:
+        """Get names of all exercises used in the workout."""
+        return set(iter_exercise_names(self.exercises))
 
     def calculate_num_exercises(self, exercise_manager: ExerciseManager) -> int:
         """Get # exercises in workout, taking 1-handed variants into account."""
-        num_exercises = 0
-        for exercise_name in self.exercises:
-            exercise = exercise_manager[exercise_name]
-            if exercise.single_handed_variations:
-                num_exercises += 2
+
+        def count(items: list[Union[str, Block]]) -> int:
+            num_exercises = 0
+            for item in items:
+                if isinstance(item, Block):
+                    num_exercises += item.rounds * count(item.exercises)
+                elif exercise_manager[item].single_handed_variations:
+                    num_exercises += 2
+                else:
+                    num_exercises += 1
+            return num_exercises
+
+        return count(self.exercises)
+
+
+@dataclass
+class TagConstraints:
+    """Constraints on the tags of exercises in a generated workout.
+
+    Every exercise must have all of `with_tags` and none of `without_tags`,
+    while the min/max counts bound how many exercises have a given tag. As
+    for the # of exercises, 1-handed variations count twice.
+    """
+
+    with_tags: list[str] = field(default_factory=list)
+    without_tags: list[str] = field(default_factory=list)
+    min_counts: dict[str, int] = field(default_factory=dict)
+    max_counts: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, text: str) -> TagConstraints:
+        """Parse comma-separated constraints, e.g. "legs, -jumping, core>=2"."""
+        constraints = cls()
+        for token in text.split(","):
+            token = token.strip()
+            if not token:
+                continue
+            elif ">=" in token:
+                tag, count = token.split(">=", 1)
+                constraints.min_counts[tag.strip()] = int(count)
+            elif "<=" in token:
+                tag, count = token.split("<=", 1)
+                constraints.max_counts[tag.strip()] = int(count)
+            elif token.startswith("-"):
+                constraints.without_tags.append(token[1:].strip())
             else:
-                num_exercises += 1
-        return num_exercises
+                constraints.with_tags.append(token)
+        return constraints
 
 
 class WorkoutManager:
-    """Manages stored workouts and creating them."""
+    """Manages stored workouts and creating them.
+
+    If a background writer is given, changes are reflected in memory
+    straight away while the file is written by the writer thread. Changes
+    published by other processes are picked up by `reload_if_changed`. If
+    a version history is given, every change is recorded in it, and if an
+    index is used, it is kept up to date with every change for `query`.
+    """
 
     def __init__(
         self,
         path: Path = Path("src") / "data" / "workouts.json",
+        writer: Optional[BackgroundWriter] = None,
+        versions: Optional[WorkoutVersions] = None,
     ):
         self.path = get_path_to_file(path)
+        self.writer = writer
+        self.versions = versions
+        self.version: Optional[Version] = None
         self.workouts = self.load_workouts()
+        self.index: Optional[WorkoutIndex] = None
 
     def __len__(self):
         return len(self.workouts)
@@ -62,37 +236,102 @@ class WorkoutManager:
 
     def load_workouts(self) -> dict[str, WorkoutConfig]:
         """Load previously stored workouts."""
-        with open(self.path, "r") as f:
-            return {k: WorkoutConfig(**v) for k, v in json.load(f).items()}
+        self.version, library = get_store(self.path).read()
+        return {k: WorkoutConfig.from_dict(v) for k, v in library.items()}
+
+    def reload_if_changed(self) -> bool:
+        """Reload workouts if another version of the file has been published.
+
+        Nothing is reloaded while our own edits are waiting to be written,
+        as they would be missing from the file. Returns whether reloaded.
+        """
+        if self.writer is not None and self.writer.has_pending(Path(self.path)):
+            return False
+        if get_store(self.path).version() == self.version:
+            return False
+        self.workouts = self.load_workouts()
+        if self.versions is not None:
+            self.versions.reload_if_changed()
+        if self.index is not None:
+            self.index.sync(self.workouts)
+        return True
+
+    def use_index(self, index: WorkoutIndex):
+        """Index the saved workouts for queries, keeping the index up to date."""
+        index.sync(self.workouts)
+        self.index = index
+
+    def query(self, query: WorkoutQuery) -> list[str]:
+        """Get the names of saved workouts matching a query, shortest first."""
+        if self.index is None:
+            raise ValueError("Saved workouts are not indexed for queries")
+        return self.index.query(query)
 
     def add_workout(self, workout_name: str, config: WorkoutConfig):
         """Add (or update) a new saved workout."""
-        self.workouts[workout_name] = config
-
-        with open(self.path, "r") as f:
-            workouts = json.load(f)
-
-        workouts[workout_name] = asdict(config)
-        with open(self.path, "w") as f:
-            json.dump(workouts, f)
+        self.apply_changes(upserts={workout_name: config})
 
     def remove_workout(self, workout_name: str):
         """Remove a stored workout."""
-        del self.workouts[workout_name]
-
-        with open(self.path, "r") as f:
-            workouts = json.load(f)
-
-        del workouts[workout_name]
-        with open(self.path, "w") as f:
-            json.dump(workouts, f)
+        self.apply_changes(removals=[workout_name])
+
+    def restore_version(self, workout_name: str, version: int):
+        """Save an earlier version of a workout as its latest version.
+
+        Raises a ValueError if there is no history or the version was a removal.
+        """
+        if self.versions is None:
+            raise ValueError("Workout versions are not being kept")
+        try:
+            config = self.versions.get(workout_name, version)
+        except KeyError:
+            raise ValueError(
+                f"Version {version} of {workout_name!r} is not kept"
+            ) from None
+        if config is None:
+            raise ValueError(f"Version {version} of {workout_name!r} was a removal")
+        self.add_workout(workout_name, config)
+
+    def apply_changes(
+        self,
+        upserts: Optional[dict[str, WorkoutConfig]] = None,
+        removals: Iterable[str] = (),
+    ):
+        """Add (or update) and remove saved workouts with a single write."""
+        upserts, removals = upserts or {}, list(removals)
+        if self.versions is not None:
+            changes: dict[str, Optional[WorkoutConfig]] = dict.fromkeys(removals)
+            changes.update(upserts)
+            self.versions.record(
+                changes, previous={name: self.workouts.get(name) for name in changes}
+            )
+        for workout_name in removals:
+            del self.workouts[workout_name]
+        self.workouts.update(upserts)
+        if self.index is not None:
+            for workout_name in removals:
+                self.index.remove(workout_name)
+            for workout_name, config in upserts.items():
+                self.index.add(workout_name, config)
+
+        serialised = {
+            workout_name: config.to_dict() for workout_name, config in upserts.items()
+        }
+
+        def mutate(workouts: dict):
+            # another process may have removed it already
+            for workout_name in removals:
+                workouts.pop(workout_name, None)
+            workouts.update(serialised)
+
+        persist(self.path, mutate, self.writer)
 
     @property
     def exercises_in_workouts(self) -> set[str]:
         """Get all exercises which appear in any saved workout"""
         exercises = set()
         for workout in self.workouts.values():
-            exercises.update(workout.exercises)
+            exercises.update(workout.exercise_names)
         return exercises
 
 
@@ -118,14 +357,174 @@ def apply_workout_correction(workout: Workout) -> Workout:
     return workout
 
 
+def choose_exercises_with_tags(
+    exercise_manager: ExerciseManager,
+    num_exercises: int,
+    constraints: TagConstraints,
+    allow_repeats: bool = False,
+    sampler: Optional[AliasSampler] = None,
+) -> list[str]:
+    """Choose exercises for a workout that satisfy tag constraints.
+
+    Exercises needed to reach the minimum count of each tag are drawn first,
+    then the rest of the workout is filled, after which the order is shuffled.
+    All filtering is done with the tag bitsets of the exercise manager.
+
+    Raises a ValueError as soon as it is clear that the constraints cannot be
+    satisfied.
+    """
+    candidates = exercise_manager.filter_bitset(
+        constraints.with_tags, constraints.without_tags
+    )
+    if not candidates:
+        raise ValueError(
+            f"No exercises have all of the tags {constraints.with_tags} "
+            f"and none of the tags {constraints.without_tags}"
+        )
+
+    def size(bitset: int) -> int:
+        """Get # of exercises in a bitset, taking 1-handed variants into account."""
+        return bin(bitset).count("1") + bin(
+            bitset & exercise_manager.single_handed_bitset
+        ).count("1")
+
+    for tag, minimum in constraints.min_counts.items():
+        tagged = candidates & exercise_manager.tag_bitset(tag)
+        if not tagged:
+            raise ValueError(f"No matching exercises are tagged {tag!r}")
+        if not allow_repeats and size(tagged) < minimum:
+            raise ValueError(
+                f"At least {minimum} exercises tagged {tag!r} are needed but only "
+                f"{size(tagged)} are available"
+            )
+        if minimum > constraints.max_counts.get(tag, minimum):
+            raise ValueError(f"Minimum count for {tag!r} exceeds its maximum count")
+    if not allow_repeats and size(candidates) < num_exercises:
+        raise ValueError(
+            f"{num_exercises} exercises are needed but only {size(candidates)} "
+            "match the tags"
+        )
+
+    tag_counts: Counter[str] = Counter()
+    used = 0
+    chosen: list[str] = []
+    total = 0
+
+    def pick(pool: int):
+        nonlocal used, total
+        if not allow_repeats:
+            pool &= ~used
+        for tag, maximum in constraints.max_counts.items():
+            if tag_counts[tag] + 1 > maximum:
+                pool &= ~exercise_manager.tag_bitset(tag)
+            elif tag_counts[tag] + 2 > maximum:
+                pool &= ~(
+                    exercise_manager.tag_bitset(tag)
+                    & exercise_manager.single_handed_bitset
+                )
+        if num_exercises - total == 1 and pool & ~exercise_manager.single_handed_bitset:
+            # avoid going over the # of exercises with both sides of an exercise
+            pool &= ~exercise_manager.single_handed_bitset
+        if not pool:
+            raise ValueError(
+                f"Could not choose {num_exercises} exercises satisfying {constraints}"
+            )
+
+        names = list(exercise_manager.names_in_bitset(pool))
+        weights = [sampler[name] for name in names] if sampler is not None else None
+        if weights is not None and sum(weights) > 0:
+            exercise_name = random.choices(names, weights=weights)[0]
+        else:
+            exercise_name = random.choice(names)
+
+        exercise = exercise_manager[exercise_name]
+        count = 2 if exercise.single_handed_variations else 1
+        tag_counts.update({tag: count for tag in exercise.tags})
+        used |= 1 << exercise_manager.slot_indices[exercise_name]
+        chosen.append(exercise_name)
+        total += count
+
+    for tag, minimum in constraints.min_counts.items():
+        while tag_counts[tag] < minimum:
+            if total >= num_exercises:
+                raise ValueError(
+                    f"Minimum tag counts cannot all be met with {num_exercises} "
+                    "exercises"
+                )
+            pick(candidates & exercise_manager.tag_bitset(tag))
+    while total < num_exercises:
+        pick(candidates)
+
+    random.shuffle(chosen)
+    return chosen
+
+
 def generate_workout(
     exercise_manager: ExerciseManager,
     num_exercises: int,
     exercise_duration_seconds: int = 5,
     rest_duration_seconds: int = 3,
     allow_repeats: bool = False,
+    sampler: Optional[AliasSampler] = None,
+    constraints: Optional[TagConstraints] = None,
+    fingerprints: Optional[WorkoutFingerprints] = None,
 ) -> Workout:
-    """Generate a workout with desired # of exercises."""
+    """Generate a workout with desired # of exercises.
+
+    If fingerprints of previously generated workouts are given, candidates
+    generated recently are redrawn, up to `MAX_FINGERPRINT_REDRAWS` times for
+    small exercise libraries, and the workout generated is recorded. See
+    `draw_workout` for how candidates are drawn.
+    """
+    for _ in range(MAX_FINGERPRINT_REDRAWS):
+        workout = draw_workout(
+            exercise_manager,
+            num_exercises,
+            exercise_duration_seconds,
+            rest_duration_seconds,
+            allow_repeats,
+            sampler,
+            constraints,
+        )
+        if fingerprints is None or not fingerprints.contains(workout):
+            break
+    if fingerprints is not None:
+        fingerprints.add(workout)
+    return workout
+
+
+def draw_workout(
+    exercise_manager: ExerciseManager,
+    num_exercises: int,
+    exercise_duration_seconds: int = 5,
+    rest_duration_seconds: int = 3,
+    allow_repeats: bool = False,
+    sampler: Optional[AliasSampler] = None,
+    constraints: Optional[TagConstraints] = None,
+) -> Workout:
+    """Draw a workout with desired # of exercises.
+
+    Exercises are drawn uniformly unless a sampler is given, in which case
+    they are drawn according to its weights. When repeats are not allowed,
+    exercises already drawn are given zero weight in the sampler for the rest
+    of the generation and their weights are restored afterwards.
+
+    If tag constraints are given, exercises are chosen to satisfy them, see
+    `choose_exercises_with_tags`.
+    """
+    if constraints is not None:
+        chosen: list[Union[str, Block]] = list(
+            choose_exercises_with_tags(
+                exercise_manager, num_exercises, constraints, allow_repeats, sampler
+            )
+        )
+        config = WorkoutConfig(
+            exercise_duration_seconds=exercise_duration_seconds,
+            rest_duration_seconds=rest_duration_seconds,
+            exercises=chosen,
+        )
+        return workout_from_config(exercise_manager, config)
+
     exercise_names = list(exercise_manager.exercises.keys())
 
     if not allow_repeats:
@@ -133,22 +532,34 @@ def generate_workout(
 
     rest_phase = Phase(rest_duration_seconds, Rest())
     already_done = set()
+    excluded_weights: dict[str, float] = {}
     workout: Workout = []
-    while len(workout) < 2 * num_exercises:
-        exercise = exercise_manager[random.choice(exercise_names)]
-        if exercise.name in already_done:
-            continue
-        if not allow_repeats:
-            already_done.add(exercise.name)
+    try:
+        while len(workout) < 2 * num_exercises:
+            if sampler is None:
+                exercise = exercise_manager[random.choice(exercise_names)]
+            else:
+                exercise = exercise_manager[sampler.sample()]
+            if exercise.name in already_done:
+                continue
+            if not allow_repeats:
+                already_done.add(exercise.name)
+                if sampler is not None:
+                    excluded_weights[exercise.name] = sampler[exercise.name]
+                    sampler.update(exercise.name, 0.0)
 
-        if exercise.single_handed_variations:
-            for side in ("left", "right"):
-                one_sided_exercise = Exercise(f"{exercise.name} ({side})", True)
+            if exercise.single_handed_variations:
+                for side in ("left", "right"):
+                    one_sided_exercise = Exercise(f"{exercise.name} ({side})", True)
+                    workout.append(rest_phase)
+                    workout.append(Phase(exercise_duration_seconds, one_sided_exercise))
+            else:
                 workout.append(rest_phase)
-                workout.append(Phase(exercise_duration_seconds, one_sided_exercise))
-        else:
-            workout.append(rest_phase)
-            workout.append(Phase(exercise_duration_seconds, exercise))
+                workout.append(Phase(exercise_duration_seconds, exercise))
+    finally:
+        if sampler is not None:
+            for exercise_name, weight in excluded_weights.items():
+                sampler.update(exercise_name, weight)
 
     if len(workout) > 2 * num_exercises:
         return apply_workout_correction(workout)
@@ -156,23 +567,149 @@ def generate_workout(
     return workout
 
 
-def workout_from_config(
-    exercise_manager: ExerciseManager, config: WorkoutConfig
-) -> Workout:
-    """Create a workout from config."""
-    rest_phase = Phase(config.rest_duration_seconds, Rest())
-    workout = []
-    for exercise_name in config.exercises:
-        exercise = exercise_manager[exercise_name]
+MAX_ENDLESS_REDRAWS = 100
+
+
+def generate_endless_phases(
+    exercise_manager: ExerciseManager,
+    exercise_duration_seconds: int = 5,
+    rest_duration_seconds: int = 3,
+    sampler: Optional[AliasSampler] = None,
+    num_recent_to_avoid: int = 5,
+) -> Iterator[Phase]:
+    """Endlessly generate phases, drawing each exercise just before it is needed.
+
+    Exercises are drawn as in `generate_workout`, except that only the most
+    recently drawn exercises are avoided, so memory use stays constant.
+    """
+    exercise_names = list(exercise_manager.exercises.keys())
+    num_recent_to_avoid = min(num_recent_to_avoid, len(exercise_names) - 1)
+    recent: deque[str] = deque(maxlen=max(1, num_recent_to_avoid))
+    rest_phase = Phase(rest_duration_seconds, Rest())
+    while True:
+        # give up avoiding recent exercises if the weights allow little else
+        for _ in range(MAX_ENDLESS_REDRAWS):
+            if sampler is None:
+                exercise = exercise_manager[random.choice(exercise_names)]
+            else:
+                exercise = exercise_manager[sampler.sample()]
+            if num_recent_to_avoid <= 0 or exercise.name not in recent:
+                break
+        recent.append(exercise.name)
 
         if exercise.single_handed_variations:
             for side in ("left", "right"):
                 one_sided_exercise = Exercise(f"{exercise.name} ({side})", True)
-                workout.append(rest_phase)
-                workout.append(
-                    Phase(config.exercise_duration_seconds, one_sided_exercise)
-                )
+                yield rest_phase
+                yield Phase(exercise_duration_seconds, one_sided_exercise)
         else:
-            workout.append(rest_phase)
-            workout.append(Phase(config.exercise_duration_seconds, exercise))
-    return workout
+            yield rest_phase
+            yield Phase(exercise_duration_seconds, exercise)
+
+
+def base_exercise_name(exercise_name: str) -> str:
+    """Strip the side from the name of a 1-handed variation, if present."""
+    for side in ("left", "right"):
+        suffix = f" ({side})"
+        if exercise_name.endswith(suffix):
+            return exercise_name[: -len(suffix)]
+    return exercise_name
+
+
+def iter_workout_phases(
+    exercise_manager: ExerciseManager, config: WorkoutConfig
+) -> Iterator[Phase]:
+    """Lazily expand a workout config into its phases.
+
+    Repeated rounds are expanded by walking the block again rather than by
+    copying it, so memory use does not grow with the number of rounds.
+    """
+    rest_phases: dict[int, Phase] = {}
+
+    def rest(duration_seconds: int) -> Phase:
+        if duration_seconds not in rest_phases:
+            rest_phases[duration_seconds] = Phase(duration_seconds, Rest())
+        return rest_phases[duration_seconds]
+
+    def expand(
+        items: list[Union[str, Block]],
+        exercise_duration_seconds: int,
+        rest_duration_seconds: int,
+        first_rest_seconds: Optional[int],
+    ) -> Iterator[Phase]:
+        # the rest before the first exercise can differ, e.g. between rounds
+        for item in items:
+            if isinstance(item, Block):
+                # durations of 0 are set, e.g. no rest in an EMOM of full minutes
+                block_exercise_duration_seconds = (
+                    item.exercise_duration_seconds
+                    if item.exercise_duration_seconds is not None
+                    else exercise_duration_seconds
+                )
+                block_rest_duration_seconds = (
+                    item.rest_duration_seconds
+                    if item.rest_duration_seconds is not None
+                    else rest_duration_seconds
+                )
+                for round_index in range(item.rounds):
+                    if round_index > 0:
+                        first_rest_seconds = item.round_rest_seconds
+                    yield from expand(
+                        item.exercises,
+                        block_exercise_duration_seconds,
+                        block_rest_duration_seconds,
+                        first_rest_seconds,
+                    )
+                    first_rest_seconds = None
+                continue
+
+            exercise = exercise_manager[item]
+            if exercise.single_handed_variations:
+                exercises = [
+                    Exercise(f"{exercise.name} ({side})", True)
+                    for side in ("left", "right")
+                ]
+            else:
+                exercises = [exercise]
+            for phase_exercise in exercises:
+                if first_rest_seconds is None:
+                    yield rest(rest_duration_seconds)
+                else:
+                    yield rest(first_rest_seconds)
+                    first_rest_seconds = None
+                yield Phase(exercise_duration_seconds, phase_exercise)
+
+    return expand(
+        config.exercises,
+        config.exercise_duration_seconds,
+        config.rest_duration_seconds,
+        None,
+    )
+
+
+class WorkoutPhases:
+    """Phases of a workout config, expanded lazily whenever iterated.
+
+    Unlike a list of the phases, memory use does not grow with the number of
+    rounds, yet the phases can be iterated again, e.g. to jump back to one.
+    """
+
+    def __init__(self, exercise_manager: ExerciseManager, config: WorkoutConfig):
+        self.exercise_manager = exercise_manager
+        self.config = config
+        self.num_phases: Optional[int] = None
+
+    def __iter__(self) -> Iterator[Phase]:
+        return iter_workout_phases(self.exercise_manager, self.config)
+
+    def __len__(self) -> int:
+        if self.num_phases is None:
+            self.num_phases = sum(1 for _ in self)
+        return self.num_phases
+
+
+def workout_from_config(
+    exercise_manager: ExerciseManager, config: WorkoutConfig
+) -> Workout:
+    """Create a workout from config, for when all of its phases are needed."""
+    return list(iter_workout_phases(exercise_manager, config))
@@ -1,35 +1,41 @@
 """Module for GUI window to edit workouts."""
-from typing import Callable
+from datetime import datetime
+from typing import Callable, Optional
 
 import customtkinter
 import tkinter
 
-from gui_components import Slider
-from workout import WorkoutConfig, WorkoutManager
+from gui_components import SearchPicker, Slider, StagedChangesPanel
+from share_codes import WorkoutCodec
+from staging import StagedChanges
+from versions import WorkoutVersions
+from workout import WorkoutConfig
 
 
 class WorkoutEditor:
-    """Window that allows editing workouts."""
+    """Window that allows editing workouts.
+
+    Edits are staged and only written once saved. The window is created once
+    and hidden when closed, then refreshed from the staged edits when shown.
+    """
 
     def __init__(
         self,
         parent,
-        workout_manager: WorkoutManager,
-        exercises: list[str],
+        staged_changes: StagedChanges,
         on_close_callback: Callable,
     ):
         self.window = customtkinter.CTkToplevel(parent)
         self.window.title("Edit workouts")
-        self.workout_manager = workout_manager
-        self.exercises = exercises
+        self.staged_changes = staged_changes
         self.on_close_callback = on_close_callback
-        self.window.geometry("600x650")
+        self.window.geometry("600x950")
         self.window.grid_rowconfigure((0,), weight=1)
         self.window.grid_columnconfigure((0, 1), weight=1)
 
         def on_closing():
             on_close_callback()
-            self.window.destroy()
+            self.hide()
 
         self.window.protocol("WM_DELETE_WINDOW", on_closing)
 
@@ -70,10 +76,11 @@ class WorkoutEditor:
             label_template="{value} seconds/rest",
         )
 
-        self.exercises_dropdown = customtkinter.CTkOptionMenu(
-            master=self.add_frame,
-            values=self.exercises,
+        self.exercises_dropdown = SearchPicker(
+            parent=self.add_frame,
+            values=self.staged_changes.staged_exercise_names(),
             command=self.add_exercise_to_workout,
+            placeholder_text="Search exercises...",
         )
         self.exercises_dropdown.pack(padx=10, pady=10)
 
@@ -99,8 +106,10 @@ class WorkoutEditor:
         )
         self.remove_workout_label.pack(side="top", fill="both", padx=10, pady=10)
 
-        self.workouts_dropdown = customtkinter.CTkOptionMenu(
-            master=self.remove_frame, values=list(self.workout_manager.workouts.keys())
+        self.workouts_dropdown = SearchPicker(
+            parent=self.remove_frame,
+            values=self.staged_changes.staged_workouts().keys(),
+            placeholder_text="Search workouts...",
         )
         self.workouts_dropdown.pack(padx=10, pady=10)
 
@@ -109,31 +118,206 @@ class WorkoutEditor:
         )
         self.remove_workout_button.pack(padx=10, pady=10)
 
-    def update_workouts_dropdown(self):
-        """Update the workouts in the dropdown for removal."""
-        values = list(self.workout_manager.workouts.keys())
-        self.workouts_dropdown.set(values[0])
-        self.workouts_dropdown.configure(values=values)
+        self.share_workout_label = customtkinter.CTkLabel(
+            self.remove_frame, text="Share workout", font=("roboto", 24)
+        )
+        self.share_workout_label.pack(side="top", fill="both", padx=10, pady=10)
+        self.share_code = customtkinter.CTkEntry(
+            self.remove_frame, placeholder_text="Workout code", width=200
+        )
+        self.share_code.pack(padx=10, pady=10)
+        self.share_buttons = customtkinter.CTkFrame(self.remove_frame)
+        self.share_buttons.pack()
+        self.export_workout_button = customtkinter.CTkButton(
+            master=self.share_buttons,
+            command=self.export_workout,
+            text="Export",
+            width=90,
+        )
+        self.export_workout_button.pack(side="left", padx=5, pady=10)
+        self.import_workout_button = customtkinter.CTkButton(
+            master=self.share_buttons,
+            command=self.import_workout,
+            text="Import",
+            width=90,
+        )
+        self.import_workout_button.pack(side="left", padx=5, pady=10)
+        self.share_status = customtkinter.CTkLabel(
+            self.remove_frame, text="", wraplength=220
+        )
+        self.share_status.pack(padx=10, pady=10)
+
+        self.history_label = customtkinter.CTkLabel(
+            self.remove_frame, text="Workout history", font=("roboto", 24)
+        )
+        self.history_label.pack(side="top", fill="both", padx=10, pady=10)
+        self.show_history_button = customtkinter.CTkButton(
+            master=self.remove_frame, command=self.show_history, text="Show history"
+        )
+        self.show_history_button.pack(padx=10, pady=5)
+        self.history_workout_name: Optional[str] = None
+        self.version_dropdown = customtkinter.CTkOptionMenu(
+            master=self.remove_frame, values=[""], command=self.show_version_diff
+        )
+        self.version_dropdown.pack(padx=10, pady=5)
+        self.history_text_box = customtkinter.CTkTextbox(
+            master=self.remove_frame, state=tkinter.DISABLED, height=120
+        )
+        self.history_text_box.pack(padx=10, pady=5)
+        self.restore_version_button = customtkinter.CTkButton(
+            master=self.remove_frame, command=self.restore_version, text="Restore"
+        )
+        self.restore_version_button.pack(padx=10, pady=5)
+
+        self.staged_changes_panel = StagedChangesPanel(
+            parent=self.window,
+            staged_changes=self.staged_changes,
+            on_change=self.refresh,
+            on_commit=on_close_callback,
+        )
+        self.staged_changes_panel.grid(
+            row=1, column=0, columnspan=2, padx=10, pady=10, sticky="nsew"
+        )
+
+    def show(self):
+        """Show the window with up-to-date exercises and workouts."""
+        self.refresh()
+        self.window.deiconify()
+        self.window.lift()
+        self.window.focus()
+
+    def hide(self):
+        """Hide the window, keeping it for next time."""
+        self.window.withdraw()
+
+    def refresh(self):
+        """Update dropdowns and staged edits, only touching what changed."""
+        self.exercises_dropdown.sync(self.staged_changes.staged_exercise_names())
+        self.workouts_dropdown.sync(self.staged_changes.staged_workouts().keys())
+        self.staged_changes_panel.refresh()
 
     def add_workout(self):
-        """Add a workout ."""
+        """Stage adding a workout."""
         workout_name = self.new_workout_name.get("0.0", "end").rstrip()
         config = WorkoutConfig(
             exercise_duration_seconds=self.exercise_duration_seconds_slider.value,
             rest_duration_seconds=self.rest_duration_seconds_slider.value,
             exercises=self.new_workout_exercises,
         )
-        self.workout_manager.add_workout(workout_name, config)
+        self.staged_changes.add_workout(workout_name, config)
         self.new_workout_name.delete("0.0", "end")
         self.clear_new_workout_exercises()
         self.new_workout_exercises = []
-        self.update_workouts_dropdown()
+        self.workouts_dropdown.add(workout_name)
+        self.staged_changes_panel.refresh()
 
     def remove_workout(self):
-        """Remove a workout."""
+        """Stage removing a workout."""
         to_remove = self.workouts_dropdown.get()
-        self.workout_manager.remove_workout(to_remove)
-        self.update_workouts_dropdown()
+        if to_remove is not None:
+            self.staged_changes.remove_workout(to_remove)
+            self.workouts_dropdown.remove(to_remove)
+            self.staged_changes_panel.refresh()
+
+    def workout_codec(self) -> WorkoutCodec:
+        """Codec for the saved exercise library, which codes refer to."""
+        return WorkoutCodec(self.staged_changes.exercise_manager.exercises)
+
+    def export_workout(self):
+        """Show a code for the selected workout and copy it to the clipboard."""
+        workout_name = self.workouts_dropdown.get()
+        if workout_name is None:
+            self.share_status.configure(text="Choose a workout to export")
+            return
+        config = self.staged_changes.staged_workouts()[workout_name]
+        # codes are shared with others, whose libraries likely differ
+        code = self.workout_codec().encode(workout_name, config, portable=True)
+        self.share_code.delete(0, "end")
+        self.share_code.insert(0, code)
+        self.window.clipboard_clear()
+        self.window.clipboard_append(code)
+        self.share_status.configure(text=f"Copied code for {workout_name!r}")
+
+    def import_workout(self):
+        """Stage adding the workout in the entered code."""
+        try:
+            workout_name, config = self.workout_codec().decode(self.share_code.get())
+        except ValueError as error:
+            self.share_status.configure(text=str(error))
+            return
+        self.staged_changes.add_workout(workout_name, config)
+        self.workouts_dropdown.add(workout_name)
+        self.staged_changes_panel.refresh()
+        self.share_code.delete(0, "end")
+        self.share_status.configure(text=f"Imported {workout_name!r}")
+
+    def workout_versions(self) -> Optional[WorkoutVersions]:
+        """Version history of the saved workouts, if one is kept."""
+        return self.staged_changes.workout_manager.versions
+
+    def show_history_lines(self, lines: list[str]):
+        self.history_text_box.configure(state=tkinter.NORMAL)
+        self.history_text_box.delete("0.0", "end")
+        self.history_text_box.insert("0.0", "\n".join(lines))
+        self.history_text_box.configure(state=tkinter.DISABLED)
+
+    def show_history(self):
+        """List the kept versions of the selected workout, newest first."""
+        workout_name = self.workouts_dropdown.get()
+        versions = self.workout_versions()
+        kept = (
+            versions.versions(workout_name)
+            if versions is not None and workout_name is not None
+            else []
+        )
+        if not kept:
+            self.history_workout_name = None
+            self.version_dropdown.configure(values=[""])
+            self.version_dropdown.set("")
+            self.show_history_lines(["No history for this workout"])
+            return
+
+        assert versions is not None and workout_name is not None
+        self.history_workout_name = workout_name
+        labels = []
+        for version in reversed(kept):
+            saved_at = datetime.fromtimestamp(versions.saved_at(workout_name, version))
+            labels.append(f"v{version}  {saved_at:%Y-%m-%d %H:%M}")
+        self.version_dropdown.configure(values=labels)
+        self.version_dropdown.set(labels[0])
+        self.show_version_diff(labels[0])
+
+    def selected_version(self) -> Optional[int]:
+        label = self.version_dropdown.get()
+        return int(label.split()[0][1:]) if label else None
+
+    def show_version_diff(self, _label: str):
+        """Show how the chosen version differs from the one before it."""
+        versions, version = self.workout_versions(), self.selected_version()
+        if versions is None or version is None or self.history_workout_name is None:
+            return
+        kept = versions.versions(self.history_workout_name)
+        index = kept.index(version)
+        if index == 0:
+            lines = ["Oldest kept version"]
+        else:
+            lines = versions.diff(self.history_workout_name, kept[index - 1], version)
+        self.show_history_lines(lines or ["No changes"])
+
+    def restore_version(self):
+        """Stage saving the chosen version as the workout's latest version."""
+        versions, version = self.workout_versions(), self.selected_version()
+        workout_name = self.history_workout_name
+        if versions is None or version is None or workout_name is None:
+            return
+        config = versions.get(workout_name, version)
+        if config is None:
+            self.show_history_lines([f"Version {version} is a removal"])
+            return
+        self.staged_changes.add_workout(workout_name, config)
+        self.workouts_dropdown.add(workout_name)
+        self.staged_changes_panel.refresh()
+        self.show_history_lines([f"Staged restoring version {version}"])
 
     def add_exercise_to_workout(self, exercise_name: str):
         """Add exercise to the current workout."""
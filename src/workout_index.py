@@ -0,0 +1,245 @@
+"""Queries over saved workouts, e.g. "<25, Kettlebell swing, -Burpees".
+
+A query combines exercises a workout must or must not use with ranges on
+its total duration in minutes, number of phases and rest ratio, i.e. the
+fraction of its time spent resting. Queries are comma separated, e.g.
+
+    duration<25, phases>=30, rest<0.4, Kettlebell swing, -Burpees
+
+where a bare range such as "<25" is on the duration.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Iterable, Optional
+import math
+import re
+
+from sortedcontainers import SortedKeyList
+
+from exercise import ExerciseManager, Rest
+from workout import iter_workout_phases, WorkoutConfig
+
+STATS = ("duration", "phases", "rest")
+RANGE_PATTERN = re.compile(r"^(duration|phases|rest)?\s*(<=|>=|<|>)\s*([\d.]+)$")
+
+
+@dataclass
+class WorkoutStats:
+    """Numbers describing a workout, as indexed for range queries."""
+
+    duration: float  # minutes
+    phases: int
+    rest: float
+
+    @classmethod
+    def of(cls, exercise_manager: ExerciseManager, config: WorkoutConfig):
+        total_seconds = rest_seconds = num_phases = 0
+        for phase in iter_workout_phases(exercise_manager, config):
+            total_seconds += phase.duration_seconds
+            num_phases += 1
+            if isinstance(phase.type, Rest):
+                rest_seconds += phase.duration_seconds
+        return cls(
+            duration=total_seconds / 60,
+            phases=num_phases,
+            rest=rest_seconds / total_seconds if total_seconds else 0.0,
+        )
+
+
+@dataclass
+class Range:
+    """Bounds on a statistic, each inclusive or not."""
+
+    low: float = -math.inf
+    low_inclusive: bool = True
+    high: float = math.inf
+    high_inclusive: bool = True
+
+    def __contains__(self, value: float) -> bool:
+        above = value >= self.low if self.low_inclusive else value > self.low
+        below = value <= self.high if self.high_inclusive else value < self.high
+        return above and below
+
+
+@dataclass
+class WorkoutQuery:
+    """Exercises a workout must and must not use, and ranges on its stats."""
+
+    with_exercises: list[str] = field(default_factory=list)
+    without_exercises: list[str] = field(default_factory=list)
+    ranges: dict[str, Range] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, text: str) -> WorkoutQuery:
+        """Parse a comma separated query, see module docstring.
+
+        Raises a ValueError if a range cannot be parsed.
+        """
+        query = cls()
+        for token in text.split(","):
+            token = token.strip()
+            if not token:
+                continue
+            match = RANGE_PATTERN.match(token)
+            if match:
+                stat, operator, number = match.groups()
+                try:
+                    value = float(number)
+                except ValueError:
+                    raise ValueError(f"{number!r} is not a number") from None
+                bounds = query.ranges.setdefault(stat or "duration", Range())
+                if operator.startswith("<"):
+                    bounds.high, bounds.high_inclusive = value, operator == "<="
+                else:
+                    bounds.low, bounds.low_inclusive = value, operator == ">="
+            elif any(operator in token for operator in "<>"):
+                raise ValueError(
+                    f"Cannot parse {token!r}, ranges are on {', '.join(STATS)}"
+                )
+            elif token.startswith("-"):
+                query.without_exercises.append(token[1:].strip())
+            else:
+                query.with_exercises.append(token)
+        return query
+
+
+class WorkoutIndex:
+    """Indexes of saved workouts by exercise and by each statistic.
+
+    Each exercise maps to the workouts using it, and each statistic has a
+    sorted index, so a query starts from whichever exercise or range
+    matches fewest workouts, found in logarithmic time, and only checks the
+    other conditions for those. Adding or removing a workout only touches
+    its own entries. Exercise names are matched ignoring case.
+    """
+
+    def __init__(self, exercise_manager: ExerciseManager):
+        self.exercise_manager = exercise_manager
+        self.configs: dict[str, WorkoutConfig] = {}
+        self.exercises: dict[str, set[str]] = {}
+        self.stats: dict[str, Optional[WorkoutStats]] = {}
+        self.by_exercise: dict[str, set[str]] = {}
+        self.by_stat = {stat: SortedKeyList(key=itemgetter(0)) for stat in STATS}
+        self.library_key = self._library_key()
+
+    def __len__(self) -> int:
+        return len(self.configs)
+
+    def _library_key(self) -> tuple[int, int]:
+        # durations only depend on which exercises have 1-handed variations
+        return self.exercise_manager.single_handed_bitset, len(self.exercise_manager)
+
+    def add(self, workout_name: str, config: WorkoutConfig):
+        """Add (or update) a workout."""
+        if workout_name in self.configs:
+            self.remove(workout_name)
+        self.configs[workout_name] = config
+        exercises = {name.lower() for name in config.exercise_names}
+        self.exercises[workout_name] = exercises
+        for exercise_name in exercises:
+            self.by_exercise.setdefault(exercise_name, set()).add(workout_name)
+        try:
+            stats: Optional[WorkoutStats] = WorkoutStats.of(
+                self.exercise_manager, config
+            )
+        except KeyError:
+            # uses an exercise missing from the library, so has no durations
+            stats = None
+        self.stats[workout_name] = stats
+        if stats is not None:
+            for stat in STATS:
+                self.by_stat[stat].add((getattr(stats, stat), workout_name))
+
+    def remove(self, workout_name: str):
+        """Remove a workout."""
+        del self.configs[workout_name]
+        for exercise_name in self.exercises.pop(workout_name):
+            workouts = self.by_exercise[exercise_name]
+            workouts.discard(workout_name)
+            if not workouts:
+                del self.by_exercise[exercise_name]
+        stats = self.stats.pop(workout_name)
+        if stats is not None:
+            for stat in STATS:
+                self.by_stat[stat].remove((getattr(stats, stat), workout_name))
+
+    def sync(self, workouts: dict[str, WorkoutConfig]):
+        """Add, update and remove workouts so the index has exactly those given.
+
+        Everything is re-indexed if exercises gained or lost 1-handed
+        variations since, as durations depend on them.
+        """
+        library_key = self._library_key()
+        if library_key != self.library_key:
+            self.library_key = library_key
+            for workout_name in list(self.configs):
+                self.remove(workout_name)
+        for workout_name in [name for name in self.configs if name not in workouts]:
+            self.remove(workout_name)
+        for workout_name, config in workouts.items():
+            if self.configs.get(workout_name) != config:
+                self.add(workout_name, config)
+
+    def _in_range(self, stat: str, bounds: Range) -> Iterable[str]:
+        return (
+            workout_name
+            for _, workout_name in self.by_stat[stat].irange_key(
+                bounds.low, bounds.high, (bounds.low_inclusive, bounds.high_inclusive)
+            )
+        )
+
+    def _count_in_range(self, stat: str, bounds: Range) -> int:
+        index = self.by_stat[stat]
+        start = (
+            index.bisect_key_left(bounds.low)
+            if bounds.low_inclusive
+            else index.bisect_key_right(bounds.low)
+        )
+        end = (
+            index.bisect_key_right(bounds.high)
+            if bounds.high_inclusive
+            else index.bisect_key_left(bounds.high)
+        )
+        return max(0, end - start)
+
+    def query(self, query: WorkoutQuery) -> list[str]:
+        """Get the names of workouts matching a query, sorted by duration."""
+        if self._library_key() != self.library_key:
+            self.sync(dict(self.configs))
+        sources: list[tuple[int, Iterable[str]]] = []
+        for exercise_name in query.with_exercises:
+            workouts = self.by_exercise.get(exercise_name.lower(), set())
+            sources.append((len(workouts), workouts))
+        for stat, bounds in query.ranges.items():
+            sources.append(
+                (self._count_in_range(stat, bounds), self._in_range(stat, bounds))
+            )
+        _, candidates = min(
+            sources, key=itemgetter(0), default=(len(self.configs), self.configs)
+        )
+
+        with_exercises = {name.lower() for name in query.with_exercises}
+        without_exercises = {name.lower() for name in query.without_exercises}
+        matches = []
+        for workout_name in candidates:
+            exercises = self.exercises[workout_name]
+            stats = self.stats[workout_name]
+            if not with_exercises <= exercises or exercises & without_exercises:
+                continue
+            if query.ranges and (
+                stats is None
+                or not all(
+                    getattr(stats, stat) in bounds
+                    for stat, bounds in query.ranges.items()
+                )
+            ):
+                continue
+            matches.append(workout_name)
+
+        def duration(workout_name: str) -> tuple[float, str]:
+            stats = self.stats[workout_name]
+            return (math.inf if stats is None else stats.duration), workout_name
+
+        return sorted(matches, key=duration)
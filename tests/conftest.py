@@ -18,7 +18,7 @@ def exercise_manager(tmpdir) -> ExerciseManager:
         "2-handed-exercise": {"single_handed_variations": False},
     }
     folder = tmpdir / "data"
-    folder.mkdir()
+    folder.ensure(dir=True)
     path = folder / "exercises.json"
     with open(path, "w") as f:
         json.dump(exercises, f)
@@ -34,7 +34,33 @@ def exercise_manager_with_more_exercises(tmpdir) -> ExerciseManager:
         exercises[f"1-handed-exercise-{suffix}"] = {"single_handed_variations": True}
         exercises[f"2-handed-exercise-{suffix}"] = {"single_handed_variations": False}
     folder = tmpdir / "data"
-    folder.mkdir()
+    folder.ensure(dir=True)
+    path = folder / "exercises.json"
+    with open(path, "w") as f:
+        json.dump(exercises, f)
+
+    return ExerciseManager(path=path)
+
+
+@pytest.fixture(scope="function")
+def tagged_exercise_manager(tmpdir) -> ExerciseManager:
+    """Create exercise manager with tagged exercises and temp file."""
+    exercises = {}
+    for suffix in string.ascii_lowercase[:10]:
+        exercises[f"legs-kettlebell-{suffix}"] = {
+            "single_handed_variations": False,
+            "tags": ["legs", "kettlebell"],
+        }
+        exercises[f"legs-jumping-{suffix}"] = {
+            "single_handed_variations": False,
+            "tags": ["legs", "jumping", "bodyweight"],
+        }
+        exercises[f"core-kettlebell-{suffix}"] = {
+            "single_handed_variations": True,
+            "tags": ["core", "kettlebell"],
+        }
+    folder = tmpdir / "data"
+    folder.ensure(dir=True)
     path = folder / "exercises.json"
     with open(path, "w") as f:
         json.dump(exercises, f)
@@ -64,7 +90,7 @@ def workout_manager(tmpdir) -> WorkoutManager:
         },
     }
     folder = tmpdir / "data"
-    folder.mkdir()
+    folder.ensure(dir=True)
     path = folder / "workouts.json"
     with open(path, "w") as f:
         json.dump(workouts, f)
@@ -0,0 +1,76 @@
+"""Tests for audio_export module."""
+from pathlib import Path
+import io
+import wave
+
+from audio_export import AudioRenderer, exercise_tune, export_workout_audio
+from exercise import Exercise, Rest
+from workout import Phase
+
+SAMPLE_RATE = 8000
+
+
+class UnseekableStream(io.RawIOBase):
+    """Write-only stream without seeking, like a pipe."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+
+def make_workout(num_exercises: int = 20) -> list[Phase]:
+    workout = []
+    for i in range(num_exercises):
+        workout.append(Phase(10, Rest()))
+        workout.append(Phase(30, Exercise(f"exercise-{i}", False)))
+    return workout
+
+
+def test_track_covers_the_workout(tmpdir):
+    workout = make_workout()
+    path = Path(tmpdir) / "workout.wav"
+    renderer = AudioRenderer(SAMPLE_RATE)
+    export_workout_audio(workout, path, renderer)
+
+    with wave.open(str(path), "rb") as f:
+        assert f.getframerate() == SAMPLE_RATE
+        assert f.getnchannels() == 1
+        # every second of the workout, then the finishing tone
+        assert f.getnframes() == (20 * 40 + 1) * SAMPLE_RATE
+        frames = f.readframes(f.getnframes())
+    assert len(frames) == f.getnframes() * 2
+
+    # silence, beeps, rest start, finish and each exercise start
+    assert len(renderer.blocks) == 4 + 20
+    seconds = [
+        frames[i : i + 2 * SAMPLE_RATE] for i in range(0, len(frames), 2 * SAMPLE_RATE)
+    ]
+    assert seconds[0] == renderer.block(("rest",))
+    assert seconds[7:10] == [renderer.block(("beep",))] * 3
+    assert seconds[10] == renderer.block(("exercise:exercise-0",))
+    assert seconds[-1] == renderer.block(("finish",))
+
+
+def test_track_can_be_streamed():
+    workout = make_workout(2)
+    stream = UnseekableStream()
+    AudioRenderer(SAMPLE_RATE, exercise_tunes=False).render(workout, stream)
+
+    with wave.open(io.BytesIO(bytes(stream.buffer)), "rb") as f:
+        assert f.getnframes() == (2 * 40 + 1) * SAMPLE_RATE
+        assert len(f.readframes(f.getnframes())) == f.getnframes() * 2
+
+
+def test_exercise_tunes():
+    assert exercise_tune("Lunge (left)") == exercise_tune("Lunge (right)")
+    assert exercise_tune("Lunge") == exercise_tune("Lunge (left)")
+    # only sides are stripped
+    assert exercise_tune("Plank (weighted)") != exercise_tune("Plank")
+    tunes = {tuple(exercise_tune(f"exercise-{i}")) for i in range(20)}
+    assert len(tunes) > 15
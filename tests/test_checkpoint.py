@@ -0,0 +1,88 @@
+"""Tests for checkpoint module."""
+from pathlib import Path
+import hashlib
+import os
+
+import pytest
+
+from checkpoint import decode_workout, encode_workout, SessionCheckpointer, SLOT_SIZE
+from exercise import Exercise, Rest
+from workout import Phase, workout_from_config
+
+
+@pytest.fixture(scope="function")
+def checkpointer(tmpdir) -> SessionCheckpointer:
+    return SessionCheckpointer(path=Path(tmpdir) / "session.checkpoint")
+
+
+@pytest.fixture(scope="function")
+def workout(exercise_manager, workout_manager) -> list[Phase]:
+    return workout_from_config(exercise_manager, workout_manager["workout-2"])
+
+
+def test_encode_workout_round_trip(workout):
+    assert decode_workout(encode_workout("workout-2", workout)) == (
+        "workout-2",
+        workout,
+    )
+
+
+def test_resume_from_latest_checkpoint(checkpointer, workout):
+    assert checkpointer.load() is None
+    assert checkpointer.start("workout-2", workout, num_stations=3)
+    assert checkpointer.save(0, 10, 10, paused=False)
+    assert checkpointer.save(1, 7, 12, paused=True)
+    assert os.path.getsize(checkpointer.path) == 2 * SLOT_SIZE
+    checkpointer.close()
+
+    resumed = SessionCheckpointer(path=checkpointer.path)
+    checkpoint = resumed.load()
+    assert checkpoint.workout_name == "workout-2"
+    assert checkpoint.workout == workout
+    assert (checkpoint.phase_index, checkpoint.remaining_seconds) == (1, 7)
+    assert checkpoint.phase_duration_seconds == 12
+    assert checkpoint.paused
+    assert checkpoint.num_stations == 3
+
+    # the resumed session carries on checkpointing with the same phases
+    assert not resumed.save(1, 7, 12, paused=True)
+    assert resumed.save(2, 10, 10, paused=False)
+    resumed.close()
+    assert SessionCheckpointer(path=checkpointer.path).load().phase_index == 2
+
+
+def test_torn_write_falls_back_to_previous_checkpoint(checkpointer, workout):
+    checkpointer.start("workout-2", workout)
+    checkpointer.save(0, 10, 10, paused=False)
+    checkpointer.save(1, 10, 10, paused=False)
+    checkpointer.close()
+
+    # the second checkpoint went to the second slot, cut short by a crash
+    with open(checkpointer.path, "r+b") as f:
+        f.seek(SLOT_SIZE + 30)
+        f.write(b"\0" * 10)
+    assert SessionCheckpointer(path=checkpointer.path).load().phase_index == 0
+
+
+def test_redundant_checkpoints_are_skipped(checkpointer, workout, monkeypatch):
+    syncs = []
+    monkeypatch.setattr(os, "fdatasync", syncs.append, raising=False)
+    monkeypatch.setattr(os, "fsync", syncs.append)
+    checkpointer.start("workout-2", workout)
+    assert checkpointer.save(0, 10, 10, paused=False)
+    assert not checkpointer.save(0, 10, 10, paused=False)
+    assert len(syncs) == 1
+
+    checkpointer.clear()
+    checkpointer.clear()
+    assert len(syncs) == 2
+    assert not checkpointer.save(1, 10, 10, paused=False)
+    assert checkpointer.load() is None
+
+
+def test_too_long_workouts_are_not_checkpointed(checkpointer):
+    # names which do not compress well
+    names = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(1000)]
+    workout = [Phase(20, Rest())] + [Phase(40, Exercise(name, False)) for name in names]
+    assert not checkpointer.start("long", workout)
+    assert not checkpointer.save(0, 20, 20, paused=False)
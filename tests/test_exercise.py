@@ -40,3 +40,39 @@ def test_remove_exercise(exercise_manager, exercise):
     for manager in (exercise_manager, new_exercise_manager):
         assert current_num_exercises - 1 == len(manager)
         assert exercise.name not in manager.exercises
+
+
+def test_filter_exercises(tagged_exercise_manager):
+    """Exercises should be filtered by tags using the tag index."""
+    legs_no_jumping = tagged_exercise_manager.filter_exercises(
+        with_tags=["legs"], without_tags=["jumping"]
+    )
+    assert sorted(legs_no_jumping) == sorted(
+        name for name, _ in tagged_exercise_manager if name.startswith("legs-kettle")
+    )
+    assert tagged_exercise_manager.filter_exercises(with_tags=["unknown"]) == []
+    assert len(tagged_exercise_manager.filter_exercises()) == len(
+        tagged_exercise_manager
+    )
+
+
+def test_tag_index_updates(tagged_exercise_manager):
+    """Tag index should stay in line with added, updated and removed exercises."""
+    manager = tagged_exercise_manager
+    manager.remove_exercise("legs-jumping-a")
+    manager.add_exercise(Exercise("new-exercise", False, tags=["legs", "grip"]))
+    manager.add_exercise(Exercise("legs-kettlebell-a", False, tags=["core"]))
+
+    for current_manager in (manager, ExerciseManager(path=manager.path)):
+        assert "legs-jumping-a" not in current_manager.filter_exercises(["legs"])
+        assert current_manager.filter_exercises(["grip"]) == ["new-exercise"]
+        assert "legs-kettlebell-a" in current_manager.filter_exercises(["core"])
+        assert "legs-kettlebell-a" not in current_manager.filter_exercises(["legs"])
+        assert bin(current_manager.all_bitset).count("1") == len(current_manager)
+
+
+def test_media_is_saved_in_the_library(exercise_manager):
+    exercise_manager.add_exercise(Exercise("demo", False, media="demo.gif"))
+    reloaded = ExerciseManager(path=exercise_manager.path)
+    assert reloaded["demo"].media == "demo.gif"
+    assert reloaded["2-handed-exercise"].media is None
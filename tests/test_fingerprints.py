@@ -0,0 +1,93 @@
+"""Tests for fingerprints module."""
+import os
+
+from exercise import Exercise, Rest
+from fingerprints import (
+    BloomFilter,
+    SECONDS_PER_DAY,
+    workout_fingerprint,
+    WorkoutFingerprints,
+)
+from workout import generate_workout, Phase
+
+
+def make_workout(exercise_name: str, exercise_duration_seconds: int = 40):
+    return [
+        Phase(10, Rest()),
+        Phase(exercise_duration_seconds, Exercise(exercise_name, False)),
+    ]
+
+
+def test_workout_fingerprint():
+    """Fingerprints should depend on exercises and durations, but not order."""
+    assert workout_fingerprint(make_workout("a")) == workout_fingerprint(
+        make_workout("a")
+    )
+    assert workout_fingerprint(make_workout("a")) != workout_fingerprint(
+        make_workout("b")
+    )
+    assert workout_fingerprint(make_workout("a")) != workout_fingerprint(
+        make_workout("a", 30)
+    )
+    assert workout_fingerprint(
+        make_workout("a") + make_workout("b", 30)
+    ) == workout_fingerprint(make_workout("b", 30) + make_workout("a"))
+
+
+def test_bloom_filter_false_positive_rate():
+    """There should be no false negatives and few false positives."""
+    bloom_filter = BloomFilter.for_capacity(1000, 0.01)
+    added = [os.urandom(32) for _ in range(1000)]
+    for fingerprint in added:
+        bloom_filter.add(fingerprint)
+    assert all(fingerprint in bloom_filter for fingerprint in added)
+
+    false_positives = sum(os.urandom(32) in bloom_filter for _ in range(10000))
+    assert false_positives < 300
+
+    restored = BloomFilter.from_dict(bloom_filter.to_dict())
+    assert all(fingerprint in restored for fingerprint in added)
+
+
+def test_fingerprints_rolling_window(tmpdir):
+    """Workouts should be remembered within the window and forgotten after."""
+    path = tmpdir / "fingerprints.json"
+    fingerprints = WorkoutFingerprints(path=path, window_days=28, num_slices=4)
+    start = 1_700_000_000.0
+    fingerprints.add(make_workout("a"), when=start)
+    for day in range(1, 60):
+        fingerprints.add(make_workout(f"day-{day}"), when=start + day * SECONDS_PER_DAY)
+        assert len(fingerprints) <= 4
+
+    now = start + 59 * SECONDS_PER_DAY
+    assert not fingerprints.contains(make_workout("a"), now=now)
+    assert not fingerprints.contains(make_workout("day-20"), now=now)
+    assert fingerprints.contains(make_workout("day-40"), now=now)
+    assert fingerprints.contains(make_workout("day-59"), now=now)
+
+
+def test_fingerprints_per_profile(tmpdir):
+    """Each profile should have its own fingerprints, persisted together."""
+    path = tmpdir / "fingerprints.json"
+    WorkoutFingerprints(path=path, profile="alice").add(make_workout("a"))
+    WorkoutFingerprints(path=path, profile="bob").add(make_workout("b"))
+
+    alice = WorkoutFingerprints(path=path, profile="alice")
+    bob = WorkoutFingerprints(path=path, profile="bob")
+    assert alice.contains(make_workout("a")) and not alice.contains(make_workout("b"))
+    assert bob.contains(make_workout("b")) and not bob.contains(make_workout("a"))
+
+
+def test_generate_workout_avoids_fingerprinted(exercise_manager, tmpdir):
+    """Generated workouts should not repeat while there are alternatives.
+
+    With 2 exercises and 1 exercise per workout there are only 2 workouts.
+    """
+    fingerprints = WorkoutFingerprints(path=tmpdir / "fingerprints.json")
+    first = generate_workout(exercise_manager, 1, fingerprints=fingerprints)
+    second = generate_workout(exercise_manager, 1, fingerprints=fingerprints)
+    assert workout_fingerprint(first) != workout_fingerprint(second)
+    assert fingerprints.contains(first) and fingerprints.contains(second)
+
+    # all workouts have been generated, so one is still returned
+    assert generate_workout(exercise_manager, 1, fingerprints=fingerprints)
@@ -0,0 +1,179 @@
+"""Tests for heart_rate module."""
+import io
+import os
+import random
+import socket
+import statistics
+import threading
+
+import pytest
+
+from exercise import Exercise, Rest
+from heart_rate import (
+    AdaptiveRest,
+    HeartRateMonitor,
+    HeartRateStats,
+    open_source,
+    RingBuffer,
+    SimulatedHeartRate,
+    StreamHeartRateSource,
+)
+from session import WorkoutSession
+from workout import Phase
+
+
+def test_ring_buffer_rolling_statistics():
+    """Statistics should only cover the latest values once the buffer is full."""
+    buffer = RingBuffer(capacity=5)
+    assert buffer.mean is None and buffer.latest is None
+
+    values = [random.uniform(60, 180) for _ in range(23)]
+    for i, value in enumerate(values):
+        buffer.append(value)
+        window = values[max(0, i - 4) : i + 1]
+        assert len(buffer) == len(window)
+        assert buffer.latest == value
+        assert buffer.mean == pytest.approx(statistics.mean(window))
+        assert buffer.std == pytest.approx(statistics.pstdev(window), abs=1e-6)
+
+
+def test_stream_source_skips_bad_lines():
+    """Both line formats should be read and anything else skipped."""
+    stream = io.StringIO("120\n1700000000.5,125.5\nnot a sample\n\n130")
+    assert list(StreamHeartRateSource(stream)) == [120.0, 125.5, 130.0]
+
+
+def test_socket_source():
+    """Samples should be read from a local socket."""
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+
+    def send_samples():
+        connection, _ = server.accept()
+        with connection:
+            connection.sendall(b"100\n110\n")
+
+    thread = threading.Thread(target=send_samples)
+    thread.start()
+    source = open_source(f"tcp://127.0.0.1:{port}")
+    assert list(source) == [100.0, 110.0]
+    source.close()
+    thread.join()
+    server.close()
+
+
+def test_simulated_heart_rate_responds_to_exercise():
+    """The simulated rate should rise during exercise and fall during rest."""
+    simulator = SimulatedHeartRate(interval_seconds=0, rng=random.Random(0))
+    samples = iter(simulator)
+    simulator.exercising = True
+    peak = [next(samples) for _ in range(40)][-1]
+    simulator.exercising = False
+    recovered = [next(samples) for _ in range(40)][-1]
+    simulator.close()
+    assert peak > 150 and recovered < 80
+
+
+def test_monitor_reads_in_background():
+    """Samples should end up in the buffer, read on the monitor's thread."""
+    monitor = HeartRateMonitor(StreamHeartRateSource(io.StringIO("100\n110\n120\n")))
+    assert monitor.stats() is None
+    monitor.start()
+    monitor.thread.join(timeout=5)
+    stats = monitor.stats()
+    assert stats.latest_bpm == 120
+    assert stats.mean_bpm == 110
+    assert stats.num_samples == 3
+    monitor.stop()
+
+
+def test_monitor_stale_samples():
+    """Samples should be ignored once older than the maximum age."""
+    monitor = HeartRateMonitor(
+        StreamHeartRateSource(io.StringIO("100\n")), max_age_seconds=0
+    )
+    monitor.start()
+    monitor.thread.join(timeout=5)
+    assert monitor.stats() is None
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_monitor_opens_source_in_background(tmpdir):
+    """Opening a named pipe waits for a writer, which should not block starting."""
+    path = os.path.join(tmpdir, "samples")
+    os.mkfifo(path)
+    monitor = HeartRateMonitor.from_spec(f"file:{path}")
+    monitor.start()
+    assert monitor.source is None and monitor.stats() is None
+
+    with open(path, "w") as writer:
+        writer.write("100\n110\n")
+    monitor.thread.join(timeout=5)
+    assert monitor.stats().latest_bpm == 110
+    monitor.stop()
+
+
+def test_monitor_reports_source_failing_to_open():
+    """A source which cannot be opened should be reported by the monitor."""
+    server = socket.create_server(("127.0.0.1", 0))
+    port = server.getsockname()[1]
+    server.close()
+    monitor = HeartRateMonitor.from_spec(f"tcp://127.0.0.1:{port}")
+    monitor.start()
+    monitor.thread.join(timeout=10)
+    assert monitor.error is not None and monitor.source is None
+    monitor.stop()
+
+    with pytest.raises(ValueError):
+        HeartRateMonitor.from_spec("bluetooth")
+
+
+def stats(bpm: float) -> HeartRateStats:
+    return HeartRateStats(bpm, bpm, 0.0, 10)
+
+
+@pytest.mark.parametrize(
+    "elapsed_seconds,remaining_seconds,bpm,expected",
+    [
+        # no data leaves the rest as it is
+        (5, 15, None, 15),
+        # recovered, so cut to the minimum or the lead-in
+        (2, 18, 100, 8),
+        (12, 8, 100, 3),
+        (18, 2, 100, 2),
+        # not recovered, so extend at the end up to the maximum
+        (5, 15, 150, 15),
+        (19, 1, 150, 6),
+        (37, 1, 150, 3),
+        (39, 1, 150, 1),
+    ],
+)
+def test_adaptive_rest(elapsed_seconds, remaining_seconds, bpm, expected):
+    adaptive_rest = AdaptiveRest(target_bpm=120)
+    adjusted = adaptive_rest.adjust(
+        20, elapsed_seconds, remaining_seconds, None if bpm is None else stats(bpm)
+    )
+    assert adjusted == expected
+
+
+def test_session_adapts_rests_between_exercises():
+    """Only rests after the first exercise should adapt, tracking the duration."""
+    workout = [
+        Phase(10, Rest()),
+        Phase(40, Exercise("2-handed-exercise", False)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("2-handed-exercise", False)),
+    ]
+    session = WorkoutSession(workout, adaptive_rest=AdaptiveRest(target_bpm=120))
+    session.advance()
+    assert not session.adapt_rest(stats(100))
+    session.advance()
+    assert not session.adapt_rest(stats(100))
+
+    session.advance()
+    session.phase_remaining_seconds = 1
+    assert session.adapt_rest(stats(150))
+    assert session.phase_remaining_seconds == 6
+    assert session.phase_duration_seconds == 25
+    session.advance()
+    assert session.summary.rest_seconds == 10 + 25
@@ -0,0 +1,63 @@
+"""Tests for kiosk module."""
+from datetime import datetime, time
+import json
+
+from kiosk import KioskSchedule, LeakDetector, parse_times
+
+
+def test_parse_times():
+    assert parse_times("12:30, 07:00,") == [time(7, 0), time(12, 30)]
+
+
+def test_schedule_gap():
+    now = datetime(2024, 1, 1, 9, 0)
+    assert KioskSchedule(gap_seconds=90).next_start(now) == datetime(
+        2024, 1, 1, 9, 1, 30
+    )
+
+
+def test_schedule_times_of_day():
+    """The next time today should be used, or the first time tomorrow."""
+    schedule = KioskSchedule(times=parse_times("07:00, 12:30"))
+    assert schedule.next_start(datetime(2024, 1, 1, 9, 0)) == datetime(
+        2024, 1, 1, 12, 30
+    )
+    assert schedule.next_start(datetime(2024, 1, 1, 12, 30)) == datetime(
+        2024, 1, 2, 7, 0
+    )
+    assert schedule.next_start(datetime(2024, 12, 31, 23, 0)) == datetime(
+        2025, 1, 1, 7, 0
+    )
+
+
+def test_leak_detector_dumps_on_growth(tmpdir):
+    """A dump should be written once growth passes the threshold, and only once."""
+    detector = LeakDetector(
+        dump_folder=tmpdir,
+        growth_threshold_bytes=1024 * 1024,
+        widget_growth_threshold=5,
+    )
+    assert detector.record_session(num_widgets=50) is None
+    assert detector.record_session(num_widgets=52) is None
+
+    leaked = [bytearray(1024) for _ in range(2048)]
+    dump_path = detector.record_session(num_widgets=52)
+    assert dump_path is not None
+    with open(dump_path) as f:
+        diagnostics = json.load(f)
+    assert diagnostics["sample"]["session"] == 3
+    assert diagnostics["top_allocation_growth"]
+    assert detector.record_session(num_widgets=52) is None
+
+    assert detector.record_session(num_widgets=60) is not None
+    detector.close()
+    del leaked
+
+
+def test_leak_detector_keeps_bounded_samples(tmpdir):
+    detector = LeakDetector(dump_folder=tmpdir)
+    for _ in range(1000):
+        detector.record_session(num_widgets=50)
+    assert len(detector.samples) < 1000
+    assert detector.samples[-1].session == 1000
+    detector.close()
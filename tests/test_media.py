@@ -0,0 +1,95 @@
+"""Tests for media module."""
+from pathlib import Path
+
+from PIL import Image
+
+from exercise import Exercise
+import media
+from media import decode_media, MediaCache, MediaLibrary
+
+
+def write_gif(path: Path, durations: list[int], size=(400, 300)) -> Path:
+    frames = [
+        Image.new("RGB", size, (i * 60 % 256, 100, 200)) for i in range(len(durations))
+    ]
+    frames[0].save(
+        path, save_all=True, append_images=frames[1:], duration=durations, loop=0
+    )
+    return path
+
+
+def test_decode_animation(tmpdir):
+    path = write_gif(Path(tmpdir) / "demo.gif", [50, 100, 30])
+    frames = decode_media(path, size=(200, 200))
+    assert len(frames.images) == 3
+    # resized to fit, keeping the aspect ratio
+    assert frames.images[0].size == (200, 150)
+    assert frames.starts_milliseconds == [0, 50, 150]
+    assert frames.loop_milliseconds == 180
+
+    assert frames.frame_at(0) == (0, 50)
+    assert frames.frame_at(160) == (2, 20)
+    # loops, and a late check skips ahead rather than falling behind
+    assert frames.frame_at(180 * 10 + 60) == (1, 90)
+
+
+def test_still_image_is_one_frame(tmpdir):
+    path = Path(tmpdir) / "demo.png"
+    Image.new("RGB", (50, 50)).save(path)
+    frames = decode_media(path)
+    assert not frames.animated
+    assert frames.frame_at(12345)[0] == 0
+
+
+def test_cache_is_bounded(tmpdir):
+    frames = decode_media(write_gif(Path(tmpdir) / "demo.gif", [100], (10, 10)))
+    cache = MediaCache(max_bytes=2 * frames.num_bytes)
+    cache.put("a", frames)
+    cache.put("b", frames)
+    cache.get("a")
+    cache.put("c", frames)
+    # the least recently used is evicted
+    assert set(cache.entries) == {"a", "c"}
+    assert cache.num_bytes == 2 * frames.num_bytes
+
+
+def test_library_prefetches_in_the_background(exercise_manager, tmpdir):
+    path = write_gif(Path(tmpdir) / "demo.gif", [40, 40])
+    exercise_manager.add_exercise(Exercise("demo", True, media=str(path)))
+    exercise_manager.add_exercise(
+        Exercise("broken", False, media=str(Path(tmpdir) / "missing.gif"))
+    )
+    library = MediaLibrary(exercise_manager)
+    try:
+        assert library.get("demo (left)") is None
+        library.prefetch("demo (left)")
+        library.decoding[str(path)].result(timeout=10)
+        # both sides share the decoded frames
+        assert library.get("demo (right)") is library.get("demo (left)")
+        assert not library.pending("demo (left)")
+
+        library.prefetch("broken")
+        library.decoding[str(Path(tmpdir) / "missing.gif")].result(timeout=10)
+        assert library.get("broken") is None
+        library.prefetch("broken")
+        assert not library.pending("broken")
+        assert library.get("2-handed-exercise") is None
+    finally:
+        library.close()
+
+
+def test_library_gives_up_on_any_decoding_error(exercise_manager, monkeypatch):
+    def decode_media(path, size):
+        raise SyntaxError("not a GIF file")
+
+    monkeypatch.setattr(media, "decode_media", decode_media)
+    exercise_manager.add_exercise(Exercise("demo", False, media="/demo.gif"))
+    library = MediaLibrary(exercise_manager)
+    try:
+        library.prefetch("demo")
+        library.decoding["/demo.gif"].result(timeout=10)
+        assert "/demo.gif" in library.failed
+        library.prefetch("demo")
+        assert not library.pending("demo")
+    finally:
+        library.close()
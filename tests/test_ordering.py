@@ -0,0 +1,104 @@
+"""Tests for ordering module."""
+from concurrent.futures import ThreadPoolExecutor
+
+from exercise import Exercise, Rest
+from ordering import (
+    anneal,
+    cost_matrix,
+    exercise_units,
+    optimise_order,
+    order_cost,
+    OrderingCosts,
+)
+from workout import base_exercise_name, generate_workout, Phase
+
+
+def test_pair_cost():
+    """Shared muscle groups, intensity and equipment changes should add up."""
+    costs = OrderingCosts()
+    assert costs.pair_cost({"legs", "grip"}, {"legs", "grip"}) == 2.0
+    assert costs.pair_cost({"legs", "high-intensity"}, {"high-intensity"}) == 1.0
+    assert costs.pair_cost({"kettlebell"}, {"bodyweight"}) == 0.25
+    assert costs.pair_cost({"legs"}, {"arms"}) == 0.0
+
+
+def test_exercise_units_keep_sides_together():
+    """Left and right sides should form one unit, other exercises their own."""
+    workout = [
+        Phase(10, Rest()),
+        Phase(40, Exercise("a (left)", True)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("a (right)", True)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("b", False)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("b", False)),
+    ]
+    units = exercise_units(workout)
+    assert [[exercise.name for exercise in unit] for unit in units] == [
+        ["a (left)", "a (right)"],
+        ["b"],
+        ["b"],
+    ]
+
+
+def test_anneal_finds_optimal_order():
+    """Units which clash should be separated when that is possible."""
+    # units 0 and 1 clash, as do 2 and 3
+    matrix = [
+        [0, 5, 0, 0],
+        [5, 0, 0, 0],
+        [0, 0, 0, 5],
+        [0, 0, 5, 0],
+    ]
+    cost, order = anneal(matrix, seed=0, time_budget_seconds=1, max_iterations=500)
+    assert cost == 0
+    assert order_cost(matrix, order) == 0
+    assert sorted(order) == [0, 1, 2, 3]
+
+
+def test_optimise_order(tagged_exercise_manager):
+    """Reordering should not increase the cost or change the workout otherwise."""
+    workout = generate_workout(tagged_exercise_manager, num_exercises=12)
+    costs = OrderingCosts()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        reordered = optimise_order(
+            tagged_exercise_manager,
+            workout,
+            costs=costs,
+            num_starts=4,
+            executor=executor,
+            seed=0,
+            max_iterations=2000,
+        )
+
+    assert [phase.duration_seconds for phase in reordered] == [
+        phase.duration_seconds for phase in workout
+    ]
+    assert [isinstance(phase.type, Rest) for phase in reordered] == [
+        isinstance(phase.type, Rest) for phase in workout
+    ]
+    assert sorted(p.type.name for p in reordered if isinstance(p.type, Exercise)) == (
+        sorted(p.type.name for p in workout if isinstance(p.type, Exercise))
+    )
+
+    units = exercise_units(reordered)
+    for unit in units:
+        assert len({base_exercise_name(exercise.name) for exercise in unit}) == 1
+    assert len(units) == len(exercise_units(workout))
+
+    def cost(workout):
+        units = exercise_units(workout)
+        matrix = cost_matrix(tagged_exercise_manager, units, costs)
+        return order_cost(matrix, list(range(len(units))))
+
+    assert cost(reordered) <= cost(workout)
+
+
+def test_optimise_order_with_process_pool(tagged_exercise_manager):
+    """Starts should be spread over worker processes by default."""
+    workout = generate_workout(tagged_exercise_manager, num_exercises=8)
+    reordered = optimise_order(
+        tagged_exercise_manager, workout, num_starts=2, time_budget_seconds=0.1
+    )
+    assert len(reordered) == len(workout)
@@ -0,0 +1,212 @@
+"""Tests for the persistence module."""
+import json
+import multiprocessing
+import threading
+
+import pytest
+
+from exercise import Exercise, ExerciseManager
+from persistence import (
+    BackgroundWriter,
+    SnapshotStore,
+    VersionConflict,
+    get_store,
+    update_json_file,
+)
+from workout import WorkoutConfig, WorkoutManager
+
+
+def test_update_json_file(tmpdir):
+    """Mutations should be applied in order with a single write."""
+    path = tmpdir / "library.json"
+    update_json_file(path, [lambda data: data.update(a=1), lambda data: data.pop("a")])
+    with open(path, "r") as f:
+        assert json.load(f) == {}
+
+
+def test_background_writer_coalesces_edits(tmpdir):
+    """Edits within the debounce window should become one write."""
+    path = tmpdir / "library.json"
+    writer = BackgroundWriter(debounce_seconds=10, max_delay_seconds=10)
+    for i in range(50):
+        writer.submit(path, lambda data, i=i: data.update({f"key-{i}": i}))
+    assert writer.num_writes == 0
+
+    assert writer.flush(timeout=5)
+    assert writer.num_writes == 1
+    with open(path, "r") as f:
+        assert json.load(f) == {f"key-{i}": i for i in range(50)}
+    writer.close()
+
+
+def test_background_writer_reports_results(tmpdir):
+    """Both successful and failed writes should be reported."""
+    results = []
+    done = threading.Event()
+
+    def on_result(path, error):
+        results.append((path.name, error))
+        if len(results) == 2:
+            done.set()
+
+    writer = BackgroundWriter(debounce_seconds=0, on_result=on_result)
+    writer.submit(tmpdir / "good.json", lambda data: data.update(a=1))
+    writer.submit(tmpdir / "missing" / "bad.json", lambda data: data.update(a=1))
+    assert done.wait(timeout=5)
+    writer.close()
+
+    errors = dict(results)
+    assert errors["good.json"] is None
+    assert isinstance(errors["bad.json"], OSError)
+
+
+def test_managers_with_background_writer(exercise_manager, workout_manager):
+    """Changes should be in memory at once and on disk once flushed."""
+    writer = BackgroundWriter(debounce_seconds=10, max_delay_seconds=10)
+    exercises = ExerciseManager(path=exercise_manager.path, writer=writer)
+    workouts = WorkoutManager(path=workout_manager.path, writer=writer)
+
+    exercises.add_exercise(Exercise("new-exercise", False))
+    exercises.remove_exercise("1-handed-exercise")
+    workouts.add_workout("new-workout", WorkoutConfig(30, 30, ["new-exercise"]))
+    workouts.remove_workout("workout-1")
+    assert "new-exercise" in exercises.exercises
+    assert "workout-1" not in workouts.workouts
+    assert "new-exercise" not in ExerciseManager(path=exercise_manager.path).exercises
+
+    writer.close()
+    assert writer.num_writes == 2
+    assert set(ExerciseManager(path=exercise_manager.path).exercises) == {
+        "new-exercise",
+        "2-handed-exercise",
+    }
+    assert set(WorkoutManager(path=workout_manager.path).workouts) == {
+        "workout-2",
+        "new-workout",
+    }
+
+
+def increment_counter(path, num_increments):
+    """Increment a counter in a JSON file, one write at a time."""
+    for _ in range(num_increments):
+        update_json_file(path, [lambda data: data.update(n=data.get("n", 0) + 1)])
+
+
+def test_concurrent_writers_do_not_lose_updates(tmpdir):
+    """Writers in several processes should each see the others' updates."""
+    path = str(tmpdir / "library.json")
+    processes = [
+        multiprocessing.Process(target=increment_counter, args=(path, 25))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+    with open(path, "r") as f:
+        assert json.load(f) == {"n": 100}
+    # no temporary files should be left behind
+    assert sorted(p.basename for p in tmpdir.listdir()) == [
+        "library.json",
+        "library.json.lock",
+    ]
+
+
+def test_snapshots_are_only_parsed_when_changed(tmpdir, monkeypatch):
+    """Unchanged snapshots should be served from the cache."""
+    path = tmpdir / "library.json"
+    update_json_file(path, [lambda data: data.update(a=1)])
+    store = SnapshotStore(path)
+    version, data = store.read()
+    assert data == {"a": 1}
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unchanged snapshot was parsed again")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(json, "load", fail)
+        assert store.read() == (version, data)
+
+    # another process publishing a snapshot
+    SnapshotStore(path).update([lambda data: data.update(b=2)])
+    new_version, new_data = store.read()
+    assert new_version != version
+    assert new_data == {"a": 1, "b": 2}
+    assert data == {"a": 1}
+
+
+def test_publish_is_compare_and_swap(tmpdir):
+    """Publishing over a snapshot other than the expected one should fail."""
+    path = tmpdir / "library.json"
+    store = SnapshotStore(path)
+    assert store.read() == (None, {})
+    version = store.publish({"a": 1}, None)
+    with pytest.raises(VersionConflict):
+        store.publish({"a": 2}, None)
+    store.publish({"a": 3}, version)
+    assert store.read()[1] == {"a": 3}
+
+
+def test_managers_reload_if_changed(exercise_manager, workout_manager):
+    """Managers should pick up versions published by other processes."""
+    assert not exercise_manager.reload_if_changed()
+    assert not workout_manager.reload_if_changed()
+
+    update_json_file(
+        exercise_manager.path,
+        [
+            lambda data: data.update(
+                {"new-exercise": {"single_handed_variations": False}}
+            )
+        ],
+    )
+    update_json_file(workout_manager.path, [lambda data: data.pop("workout-1")])
+    assert exercise_manager.reload_if_changed()
+    assert workout_manager.reload_if_changed()
+    assert "new-exercise" in exercise_manager.exercises
+    assert "workout-1" not in workout_manager.workouts
+    assert not exercise_manager.reload_if_changed()
+
+
+def test_managers_do_not_reload_over_pending_edits(exercise_manager):
+    """Edits waiting to be written should not be dropped by reloading."""
+    writer = BackgroundWriter(debounce_seconds=10, max_delay_seconds=10)
+    exercises = ExerciseManager(path=exercise_manager.path, writer=writer)
+    exercises.add_exercise(Exercise("new-exercise", False))
+    get_store(exercise_manager.path).update(
+        [lambda data: data.pop("1-handed-exercise")]
+    )
+
+    assert not exercises.reload_if_changed()
+    assert "new-exercise" in exercises.exercises
+    writer.close()
+    assert exercises.reload_if_changed()
+    assert set(exercises.exercises) == {"new-exercise", "2-handed-exercise"}
+
+
+def test_removing_entries_already_removed_on_disk(exercise_manager, workout_manager):
+    """Removals published by another process first should not fail the write."""
+    errors = []
+    writer = BackgroundWriter(
+        debounce_seconds=10,
+        max_delay_seconds=10,
+        on_result=lambda path, error: errors.append(error),
+    )
+    exercises = ExerciseManager(path=exercise_manager.path, writer=writer)
+    exercises.apply_changes(
+        upserts=[Exercise("new-exercise", False)], removals=["1-handed-exercise"]
+    )
+    get_store(exercise_manager.path).update(
+        [lambda data: data.pop("1-handed-exercise")]
+    )
+    update_json_file(workout_manager.path, [lambda data: data.pop("workout-1")])
+    workout_manager.remove_workout("workout-1")
+
+    writer.close()
+    assert errors == [None]
+    assert set(ExerciseManager(path=exercise_manager.path).exercises) == {
+        "new-exercise",
+        "2-handed-exercise",
+    }
+    assert set(WorkoutManager(path=workout_manager.path).workouts) == {"workout-2"}
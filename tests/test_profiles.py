@@ -0,0 +1,64 @@
+"""Tests for profiles module."""
+from pathlib import Path
+
+import pytest
+
+from persistence import BackgroundWriter
+from profiles import DEFAULT_PROFILE, ProfileManager
+from workout import WorkoutConfig
+
+
+@pytest.fixture(scope="function")
+def profile_manager(workout_manager) -> ProfileManager:
+    """Profile manager whose default profile has the fixture's workouts."""
+    return ProfileManager(data_folder=Path(workout_manager.path).parent)
+
+
+def test_default_profile_uses_existing_files(profile_manager, workout_manager):
+    assert profile_manager.profile_names() == [DEFAULT_PROFILE]
+    shard = profile_manager.load(DEFAULT_PROFILE)
+    assert shard.workout_manager.path == workout_manager.path
+    assert shard.workout_manager.workouts == workout_manager.workouts
+
+
+def test_new_profile_starts_with_default_workouts(profile_manager, workout_manager):
+    shard = profile_manager.load("alex")
+    assert profile_manager.profile_names() == [DEFAULT_PROFILE, "alex"]
+    assert shard.workout_manager.workouts == workout_manager.workouts
+    assert len(shard.exercise_history) == 0
+
+
+def test_profile_writes_only_touch_own_shard(profile_manager, workout_manager):
+    """Saving a workout or history for a profile should leave others alone."""
+    alex = profile_manager.load("alex")
+    sam = profile_manager.load("sam")
+    default_contents = Path(workout_manager.path).read_text()
+    sam_contents = Path(sam.workout_manager.path).read_text()
+
+    config = WorkoutConfig(30, 15, ["2-handed-exercise"])
+    alex.workout_manager.add_workout("alex-workout", config)
+    alex.exercise_history.record(["2-handed-exercise"])
+
+    assert Path(workout_manager.path).read_text() == default_contents
+    assert Path(sam.workout_manager.path).read_text() == sam_contents
+    assert not Path(sam.exercise_history.path).exists()
+    assert profile_manager.load("alex").workout_manager["alex-workout"] == config
+    assert "alex-workout" not in profile_manager.load("sam").workout_manager.workouts
+
+
+def test_load_in_background(workout_manager):
+    writer = BackgroundWriter(debounce_seconds=0)
+    profile_manager = ProfileManager(
+        data_folder=Path(workout_manager.path).parent, writer=writer
+    )
+    shard = profile_manager.load_in_background("alex").result(timeout=5)
+    assert shard.name == "alex"
+    assert shard.workout_manager.writer is writer
+    profile_manager.close()
+    writer.close()
+
+
+@pytest.mark.parametrize("name", ["", "../escape", "a/b", " padded", "dot.name"])
+def test_invalid_profile_names(profile_manager, name):
+    with pytest.raises(ValueError):
+        profile_manager.load(name)
@@ -0,0 +1,128 @@
+"""Tests for the sampling module."""
+from collections import Counter
+import random
+
+import pytest
+
+from exercise import Exercise
+from history import ExerciseHistory
+from sampling import (
+    AliasSampler,
+    build_alias_table,
+    exercise_weights,
+    MIN_RECENCY_WEIGHT,
+    SECONDS_PER_DAY,
+)
+from workout import generate_workout
+
+
+def table_probabilities(prob: list[float], alias: list[int]) -> list[float]:
+    """Exact probability of drawing each index from an alias table."""
+    n = len(prob)
+    probabilities = [0.0] * n
+    for column in range(n):
+        probabilities[column] += prob[column] / n
+        probabilities[alias[column]] += (1 - prob[column]) / n
+    return probabilities
+
+
+@pytest.mark.parametrize(
+    "weights", [[1, 1, 1, 1], [1, 2, 3, 4], [0, 5, 0, 1], [10, 0.1, 0.1, 0.1, 3]]
+)
+def test_build_alias_table(weights):
+    """An alias table should reproduce the normalised weights exactly."""
+    prob, alias = build_alias_table(weights)
+    total = sum(weights)
+    assert table_probabilities(prob, alias) == pytest.approx(
+        [weight / total for weight in weights]
+    )
+
+
+def test_build_alias_table_without_positive_weights():
+    """There is nothing to sample from if all weights are zero."""
+    with pytest.raises(ValueError):
+        build_alias_table([0, 0])
+
+
+def test_sampler_never_draws_zero_weights():
+    """Names with zero weight should never be drawn."""
+    weights = {f"exercise-{i}": float(i % 3) for i in range(30)}
+    sampler = AliasSampler(weights, rng=random.Random(0))
+    drawn = {sampler.sample() for _ in range(2000)}
+    assert drawn == {name for name, weight in weights.items() if weight > 0}
+
+
+def test_sampler_frequencies():
+    """Draws should be roughly proportional to the weights."""
+    weights = {"a": 1.0, "b": 3.0, "c": 6.0}
+    sampler = AliasSampler(weights, block_size=2, rng=random.Random(0))
+    counts = Counter(sampler.sample() for _ in range(20000))
+    for name, weight in weights.items():
+        assert counts[name] / 20000 == pytest.approx(weight / 10, abs=0.02)
+
+
+def test_sampler_incremental_updates():
+    """Updates, additions and removals should match a sampler built afresh."""
+    weights = {f"exercise-{i}": float(i + 1) for i in range(10)}
+    sampler = AliasSampler(weights, block_size=3)
+
+    new_weights = dict(weights)
+    new_weights["exercise-2"] = 0.0
+    new_weights["new-exercise"] = 7.0
+    del new_weights["exercise-0"]
+    del new_weights["exercise-9"]
+    sampler.update_weights(new_weights)
+
+    assert len(sampler) == len(new_weights)
+    for name, weight in new_weights.items():
+        assert sampler[name] == weight
+    assert sum(sampler.block_totals) == pytest.approx(sum(new_weights.values()))
+    for block, table in enumerate(sampler.block_tables):
+        start = block * sampler.block_size
+        block_weights = sampler.weights[start : start + sampler.block_size]
+        if table is None:
+            assert sum(block_weights) == 0
+        else:
+            total = sum(block_weights)
+            assert table_probabilities(*table) == pytest.approx(
+                [weight / total for weight in block_weights]
+            )
+
+
+def test_exercise_weights(exercise_manager, tmpdir):
+    """Recently done exercises get less weight, scaled by coach weights."""
+    now = 100 * SECONDS_PER_DAY
+    history = ExerciseHistory(path=tmpdir / "history.json")
+    history.record(["1-handed-exercise"], when=now)
+    exercise_manager.add_exercise(Exercise("heavy-exercise", False, weight=2.0))
+
+    weights = exercise_weights(exercise_manager, history, now=now)
+    assert weights == {
+        "1-handed-exercise": MIN_RECENCY_WEIGHT,
+        "2-handed-exercise": 1.0,
+        "heavy-exercise": 2.0,
+    }
+
+    # a week later with a week-long half life, half of the weight is back
+    weights = exercise_weights(
+        exercise_manager, history, half_life_days=7, now=now + 7 * SECONDS_PER_DAY
+    )
+    assert weights["1-handed-exercise"] == pytest.approx(0.5)
+
+
+def test_generate_workout_with_sampler(exercise_manager_with_more_exercises):
+    """Only exercises with weight are used and the sampler is left unchanged."""
+    weights = {
+        name: 1.0 if name.startswith("2-handed") else 0.0
+        for name, _ in exercise_manager_with_more_exercises
+    }
+    sampler = AliasSampler(weights, rng=random.Random(0))
+    workout = generate_workout(
+        exercise_manager_with_more_exercises, num_exercises=20, sampler=sampler
+    )
+    exercise_names = [
+        phase.type.name for phase in workout if isinstance(phase.type, Exercise)
+    ]
+    assert len(exercise_names) == len(set(exercise_names)) == 20
+    assert all(name.startswith("2-handed") for name in exercise_names)
+    assert all(sampler[name] == weight for name, weight in weights.items())
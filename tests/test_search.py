@@ -0,0 +1,55 @@
+"""Tests for the search module."""
+import pytest
+
+from search import SearchIndex
+
+NAMES = [
+    "2-handed swing",
+    "1-handed swing",
+    "Goblet squat",
+    "Romanian deadlift",
+    "Sumo deadlift",
+    "Swing squat combo",
+]
+
+
+def test_empty_query_returns_everything_sorted():
+    """An empty query should give all names in case-insensitive order."""
+    index = SearchIndex(NAMES)
+    assert index.search("  ") == sorted(NAMES, key=str.lower)
+
+
+@pytest.mark.parametrize(
+    "query, expected_first",
+    [
+        ("sw", ["Swing squat combo"]),
+        ("gob", ["Goblet squat"]),
+        ("deadlift", ["Romanian deadlift", "Sumo deadlift"]),
+    ],
+)
+def test_search_ranks_prefix_and_substring_matches_first(query, expected_first):
+    """Prefix matches come first, then names containing the query."""
+    results = SearchIndex(NAMES).search(query)
+    assert results[: len(expected_first)] == expected_first
+
+
+def test_fuzzy_search_tolerates_typos():
+    """Names sharing most n-grams with the query should still match."""
+    results = SearchIndex(NAMES).search("romanain deadlift")
+    assert results[0] == "Romanian deadlift"
+    assert "Goblet squat" not in results
+
+
+def test_incremental_updates():
+    """Added and removed names should be reflected in searches."""
+    index = SearchIndex(NAMES)
+    index.add("Goblet squat")
+    index.add("Kettlebell halo")
+    index.remove("Goblet squat")
+    assert len(index) == len(NAMES)
+    assert index.search("halo") == ["Kettlebell halo"]
+    assert index.search("goblet") == []
+    assert all("goblet" not in gram for gram in index.gram_index)
+
+    index.sync(["Plank", "Kettlebell halo"])
+    assert list(index) == ["Kettlebell halo", "Plank"]
@@ -0,0 +1,140 @@
+"""Tests for session module."""
+import itertools
+
+import pytest
+
+from exercise import Exercise, Rest
+from session import SessionSummary, WorkoutSession
+from workout import (
+    Block,
+    generate_endless_phases,
+    generate_workout,
+    Phase,
+    workout_from_config,
+    WorkoutConfig,
+    WorkoutPhases,
+)
+
+
+def test_session_steps_through_finite_workout(exercise_manager_with_more_exercises):
+    """Every phase should be reached in order, then the session should end."""
+    workout = generate_workout(exercise_manager_with_more_exercises, num_exercises=4)
+    session = WorkoutSession(workout, num_exercises=4, look_ahead=4)
+    phases = []
+    while session.advance() is not None:
+        phases.append(session.phase)
+    assert phases == workout
+    assert session.exercise_index == 4
+    assert sum(session.summary.exercise_counts.values()) == 4
+
+
+def test_session_buffer_is_bounded(exercise_manager_with_more_exercises):
+    """An endless session should only ever hold the look-ahead buffer."""
+    phases = generate_endless_phases(exercise_manager_with_more_exercises)
+    session = WorkoutSession(phases, look_ahead=3)
+    for _ in range(1000):
+        session.advance()
+        assert session.exercises_in_buffer == 3
+        assert len(session.upcoming_exercise_names()) == 3
+        assert len(session.buffer) <= 2 * 3
+
+
+def test_session_summary_on_stop(exercise_manager):
+    """Stopping should count completed phases and the part of the current one."""
+    workout = [
+        Phase(10, Rest()),
+        Phase(40, Exercise("2-handed-exercise", False)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("1-handed-exercise (left)", True)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("1-handed-exercise (right)", True)),
+    ]
+    session = WorkoutSession(workout, num_exercises=3)
+    for _ in range(6):
+        session.advance()
+    session.phase_remaining_seconds = 15
+    summary = session.stop()
+    assert summary.exercise_counts == {"2-handed-exercise": 1, "1-handed-exercise": 2}
+    assert summary.exercise_seconds == 40 + 40 + 25
+    assert summary.rest_seconds == 50
+    assert summary.describe()[0] == "3 exercises, 1:45 work, 0:50 rest"
+
+
+def test_empty_summary():
+    """An empty session should still be describable."""
+    assert SessionSummary().describe() == ["0 exercises, 0:00 work, 0:00 rest"]
+
+
+def test_endless_phases_avoid_recent_exercises(exercise_manager_with_more_exercises):
+    """Exercises should not repeat within the recent window."""
+    phases = generate_endless_phases(
+        exercise_manager_with_more_exercises, num_recent_to_avoid=5
+    )
+    exercise_names = []
+    for phase in itertools.islice(phases, 2000):
+        if isinstance(phase.type, Exercise):
+            name = phase.type.name.removesuffix(" (left)").removesuffix(" (right)")
+            if not exercise_names or exercise_names[-1] != name:
+                exercise_names.append(name)
+    for i in range(len(exercise_names)):
+        assert exercise_names[i] not in exercise_names[max(0, i - 5) : i]
+
+
+def test_endless_phases_alternate_rest(exercise_manager):
+    """Every exercise should be preceded by a rest, even with few exercises."""
+    phases = list(itertools.islice(generate_endless_phases(exercise_manager), 100))
+    assert all(isinstance(phase.type, Rest) for phase in phases[::2])
+    assert all(isinstance(phase.type, Exercise) for phase in phases[1::2])
+
+
+def test_session_jump_to_phase():
+    """Jumping should carry on from the chosen phase, keeping counts in step."""
+    workout = [
+        Phase(10, Rest()),
+        Phase(40, Exercise("a", False)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("b", False)),
+        Phase(20, Rest()),
+        Phase(40, Exercise("c", False)),
+    ]
+    session = WorkoutSession(workout, num_exercises=3, look_ahead=3)
+    session.advance()
+    session.advance()
+    session.phase_remaining_seconds = 30
+
+    assert session.jump_to(4) is workout[4]
+    assert session.phase_index == 4
+    assert session.exercise_index == 2
+    assert session.upcoming_exercise_names() == ["c"]
+    assert session.summary.exercise_seconds == 10
+
+    assert session.jump_to(1) is workout[1]
+    assert session.exercise_index == 1
+    assert session.upcoming_exercise_names() == ["b", "c"]
+    phases = [session.phase]
+    while session.advance() is not None:
+        phases.append(session.phase)
+    assert phases == workout[1:]
+
+
+def test_endless_session_cannot_jump(exercise_manager_with_more_exercises):
+    session = WorkoutSession(
+        generate_endless_phases(exercise_manager_with_more_exercises)
+    )
+    with pytest.raises(ValueError):
+        session.jump_to(0)
+
+
+def test_session_of_lazy_workout_phases(exercise_manager):
+    """A saved workout's phases should be pulled lazily, yet allow jumping."""
+    config = WorkoutConfig(40, 20, [Block(["2-handed-exercise"], rounds=1000)])
+    phases = WorkoutPhases(exercise_manager, config)
+    session = WorkoutSession(phases, num_exercises=1000, look_ahead=3)
+    session.advance()
+    assert len(session.buffer) <= 2 * 3
+
+    assert session.jump_to(1501) == workout_from_config(exercise_manager, config)[1501]
+    assert session.exercise_index == 751
+    assert len(session.buffer) <= 2 * 3
+    with pytest.raises(IndexError):
+        session.jump_to(len(phases))
@@ -0,0 +1,126 @@
+"""Tests for share_codes module."""
+import base64
+import json
+
+from hypothesis import given
+from hypothesis.strategies import booleans, integers, lists, sampled_from, text
+import pytest
+
+from share_codes import MAX_BLOCK_DEPTH, read_varint, WorkoutCodec, write_varint
+from workout import Block, WorkoutConfig
+
+LIBRARY = ["Burpee", "Goblet squat", "Press ups", "Thruster", "2-handed swing"]
+
+
+@given(integers(min_value=0, max_value=2**40))
+def test_varint_round_trip(value):
+    buffer = bytearray()
+    write_varint(buffer, value)
+    assert read_varint(bytes(buffer), 0) == (value, len(buffer))
+
+
+@given(
+    name=text(),
+    exercise_duration_seconds=integers(min_value=0, max_value=10_000),
+    rest_duration_seconds=integers(min_value=0, max_value=10_000),
+    exercises=lists(sampled_from(LIBRARY) | text(min_size=1), min_size=1),
+    portable=booleans(),
+)
+def test_flat_workout_round_trip(
+    name, exercise_duration_seconds, rest_duration_seconds, exercises, portable
+):
+    """Library and inline exercises should survive encoding."""
+    codec = WorkoutCodec(LIBRARY)
+    config = WorkoutConfig(exercise_duration_seconds, rest_duration_seconds, exercises)
+    assert codec.decode(codec.encode(name, config, portable)) == (name, config)
+
+
+def test_nested_workout_round_trip():
+    codec = WorkoutCodec(LIBRARY)
+    config = WorkoutConfig(
+        exercise_duration_seconds=40,
+        rest_duration_seconds=20,
+        exercises=[
+            Block(["2-handed swing", "Goblet squat"], rounds=3, round_rest_seconds=90),
+            Block.tabata(["Thruster", Block(["Burpee"], rounds=2)]),
+            "Press ups",
+        ],
+    )
+    code = codec.encode("Circuit", config)
+    assert codec.decode(code) == ("Circuit", config)
+
+
+def test_codes_are_short_and_url_safe():
+    """Codes should be much shorter than the JSON they replace."""
+    codec = WorkoutCodec(LIBRARY)
+    config = WorkoutConfig(40, 20, LIBRARY * 4)
+    code = codec.encode("Standard 20-minute", config)
+    assert set(code) <= set(
+        "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_"
+    )
+    assert len(code) < len(json.dumps(config.to_dict())) / 4
+
+
+def test_corrupt_codes_are_rejected():
+    codec = WorkoutCodec(LIBRARY)
+    code = codec.encode("Workout", WorkoutConfig(40, 20, LIBRARY))
+    data = bytearray(base64.urlsafe_b64decode(code + "=" * (-len(code) % 4)))
+    data[10] ^= 0xFF
+    corrupted = base64.urlsafe_b64encode(data).decode().rstrip("=")
+    with pytest.raises(ValueError, match="checksum"):
+        codec.decode(corrupted)
+    with pytest.raises(ValueError):
+        codec.decode(code[:5])
+    with pytest.raises(ValueError):
+        codec.decode("not a code!")
+
+
+def test_deeply_nested_codes_are_rejected():
+    """Crafted codes should not exhaust the stack while decoding."""
+    codec = WorkoutCodec(LIBRARY)
+    nested = Block(["Burpee"])
+    for _ in range(MAX_BLOCK_DEPTH - 1):
+        nested = Block([nested])
+    config = WorkoutConfig(40, 20, [nested])
+    assert codec.decode(codec.encode("Deep", config)) == ("Deep", config)
+
+    for _ in range(500):
+        nested = Block([nested])
+    with pytest.raises(ValueError, match="nested too deeply"):
+        codec.decode(codec.encode("Too deep", WorkoutConfig(40, 20, [nested])))
+
+
+def test_different_library_is_rejected():
+    """Library indices should not be trusted against another library."""
+    code = WorkoutCodec(LIBRARY).encode("Workout", WorkoutConfig(40, 20, LIBRARY))
+    with pytest.raises(ValueError, match="different exercise library"):
+        WorkoutCodec(LIBRARY + ["Lunge"]).decode(code)
+
+    # inline names do not depend on the library
+    inline = WorkoutCodec([]).encode("Workout", WorkoutConfig(40, 20, LIBRARY))
+    assert WorkoutCodec(LIBRARY + ["Lunge"]).decode(inline)[1].exercises == LIBRARY
+
+
+def test_portable_codes_decode_with_a_different_library():
+    """Portable codes should name their exercises, not index the library."""
+    config = WorkoutConfig(
+        exercise_duration_seconds=40,
+        rest_duration_seconds=20,
+        exercises=[Block(["Burpee", "Thruster"], rounds=3), "Burpee", "Lunge"],
+    )
+    code = WorkoutCodec(LIBRARY).encode("Workout", config, portable=True)
+    assert WorkoutCodec(["Lunge", "Press ups"]).decode(code) == ("Workout", config)
+    assert WorkoutCodec([]).decode(code) == ("Workout", config)
+    # each name is written once however often it is used
+    assert len(code) < len(WorkoutCodec([]).encode("Workout", config))
+
+
+def test_batch_round_trip():
+    """One codec should handle many codes."""
+    codec = WorkoutCodec(LIBRARY)
+    configs = [
+        WorkoutConfig(30 + i % 60, 10 + i % 30, [LIBRARY[j % 5] for j in range(i % 25)])
+        for i in range(2000)
+    ]
+    codes = [codec.encode(f"Workout {i}", config) for i, config in enumerate(configs)]
+    assert [codec.decode(code)[1] for code in codes] == configs
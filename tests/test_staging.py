@@ -0,0 +1,123 @@
+"""Tests for the staging module."""
+import json
+
+import pytest
+
+from exercise import Exercise, ExerciseManager
+from staging import StagedChanges
+from workout import WorkoutConfig, WorkoutManager
+
+
+@pytest.fixture(scope="function")
+def staged_changes(exercise_manager, workout_manager) -> StagedChanges:
+    """Create staged changes on top of simple exercises and workouts."""
+    return StagedChanges(exercise_manager, workout_manager)
+
+
+def read_library(path) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def test_staged_changes_are_not_written_until_committed(staged_changes):
+    """Staged edits should only reach the libraries when committed."""
+    exercise_path = staged_changes.exercise_manager.path
+    workout_path = staged_changes.workout_manager.path
+    exercises_before = read_library(exercise_path)
+    workouts_before = read_library(workout_path)
+
+    staged_changes.add_exercise(Exercise("new-exercise", False))
+    staged_changes.add_workout(
+        "new-workout", WorkoutConfig(30, 30, ["new-exercise", "2-handed-exercise"])
+    )
+    staged_changes.remove_workout("workout-1")
+    assert read_library(exercise_path) == exercises_before
+    assert read_library(workout_path) == workouts_before
+    assert staged_changes.diff() == [
+        "+ exercise new-exercise",
+        "+ workout new-workout",
+        "- workout workout-1",
+    ]
+
+    staged_changes.commit()
+    assert len(staged_changes) == 0
+    for exercise_manager, workout_manager in (
+        (staged_changes.exercise_manager, staged_changes.workout_manager),
+        (ExerciseManager(path=exercise_path), WorkoutManager(path=workout_path)),
+    ):
+        assert "new-exercise" in exercise_manager.exercises
+        assert set(workout_manager.workouts) == {"workout-2", "new-workout"}
+
+
+def test_commit_writes_each_library_once(staged_changes, monkeypatch):
+    """Many staged edits should result in a single write per library."""
+    calls = []
+    for manager in (staged_changes.exercise_manager, staged_changes.workout_manager):
+        original = manager.apply_changes
+        monkeypatch.setattr(
+            manager,
+            "apply_changes",
+            lambda *args, original=original: calls.append(args) or original(*args),
+        )
+
+    for i in range(10):
+        staged_changes.add_exercise(Exercise(f"exercise-{i}", False))
+        staged_changes.add_workout(f"workout-{i}", WorkoutConfig(30, 30, ["Plank"]))
+        staged_changes.add_workout(
+            f"workout-{i}", WorkoutConfig(30, 30, [f"exercise-{i}"])
+        )
+    staged_changes.commit()
+    assert len(calls) == 2
+
+
+def test_undo_and_discard(staged_changes):
+    """Undone and discarded edits should not be committed."""
+    staged_changes.add_exercise(Exercise("kept-exercise", False))
+    staged_changes.add_exercise(Exercise("undone-exercise", False))
+    assert staged_changes.undo().name == "undone-exercise"
+    assert staged_changes.diff() == ["+ exercise kept-exercise"]
+
+    staged_changes.discard()
+    assert staged_changes.undo() is None
+    assert staged_changes.diff() == []
+
+
+def test_edits_that_cancel_out(staged_changes):
+    """Adding then removing something should not show up as a change."""
+    staged_changes.add_exercise(Exercise("temporary-exercise", False))
+    staged_changes.remove_exercise("temporary-exercise")
+    staged_changes.add_exercise(Exercise("2-handed-exercise", False))
+    assert staged_changes.diff() == []
+
+
+def test_invalid_changes_are_not_committed(staged_changes):
+    """Exercises used by staged workouts should not be removable."""
+    workouts_before = read_library(staged_changes.workout_manager.path)
+    staged_changes.remove_exercise("2-handed-exercise")
+    staged_changes.add_workout("empty-workout", WorkoutConfig(30, 30, []))
+    assert staged_changes.validate() == [
+        "Workout 'workout-2' uses missing exercise '2-handed-exercise'",
+        "Workout 'empty-workout' has no exercises",
+    ]
+    with pytest.raises(ValueError):
+        staged_changes.commit()
+    assert "2-handed-exercise" in staged_changes.exercise_manager.exercises
+    assert read_library(staged_changes.workout_manager.path) == workouts_before
+
+    # removing the workout that uses the exercise makes the removal valid
+    staged_changes.undo()
+    staged_changes.remove_workout("workout-2")
+    staged_changes.commit()
+    assert "2-handed-exercise" not in staged_changes.exercise_manager.exercises
+
+
+def test_staged_exercise(staged_changes):
+    """Exercises should be looked up as they would be after committing."""
+    exercise = staged_changes.staged_exercise("2-handed-exercise")
+    assert exercise == staged_changes.exercise_manager["2-handed-exercise"]
+    updated = Exercise("2-handed-exercise", False, weight=2.0)
+    staged_changes.add_exercise(updated)
+    assert staged_changes.staged_exercise("2-handed-exercise") == updated
+    staged_changes.remove_exercise("2-handed-exercise")
+    assert staged_changes.staged_exercise("2-handed-exercise") is None
+    assert staged_changes.staged_exercise("missing") is None
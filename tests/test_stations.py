@@ -0,0 +1,70 @@
+"""Tests for stations module."""
+import pytest
+
+from exercise import Exercise, Rest
+from stations import RotationPlan, StationView
+from workout import Phase, WorkoutConfig
+
+
+def make_workout(num_exercises: int) -> list[Phase]:
+    workout = []
+    for i in range(num_exercises):
+        workout.append(Phase(15, Rest()))
+        workout.append(Phase(40, Exercise(f"exercise-{i}", False)))
+    return workout
+
+
+def test_every_group_does_every_exercise():
+    plan = RotationPlan.from_workout(make_workout(7), num_stations=3)
+    assert [circuit.exercise_names for circuit in plan.circuits] == [
+        ["exercise-0", "exercise-1", "exercise-2"],
+        ["exercise-3", "exercise-4", "exercise-5"],
+        ["exercise-6", None, None],
+    ]
+    # a rest to move between stations before each rotation
+    assert len(plan.timeline) == 3 * 3 * 2
+    assert [phase.duration_seconds for phase in plan.timeline[:2]] == [15, 40]
+
+    done = {group: [] for group in (1, 2, 3)}
+    for phase_index, phase in enumerate(plan.timeline):
+        if isinstance(phase.type, Rest):
+            continue
+        views = plan.stations_at(phase_index)
+        # each group is at exactly one station at a time
+        assert sorted(view.group for view in views) == [1, 2, 3]
+        for view in views:
+            if view.exercise_name is not None:
+                done[view.group].append(view.exercise_name)
+    for exercise_names in done.values():
+        assert sorted(exercise_names) == [f"exercise-{i}" for i in range(7)]
+
+
+def test_groups_rotate_between_stations():
+    plan = RotationPlan.from_workout(make_workout(3), num_stations=3)
+    # the rest before a rotation shows who is moving where
+    assert plan.stations_at(0) == plan.stations_at(1)
+    assert plan.stations_at(1) == [
+        StationView(1, "exercise-0", 1),
+        StationView(2, "exercise-1", 2),
+        StationView(3, "exercise-2", 3),
+    ]
+    assert [view.group for view in plan.stations_at(3)] == [3, 1, 2]
+    assert plan.describe(3) == ["Circuit 1/1, rotation 2/3"]
+    with pytest.raises(IndexError):
+        plan.stations_at(len(plan.timeline))
+
+
+def test_plan_from_config(exercise_manager, workout_manager):
+    plan = RotationPlan.from_config(exercise_manager, workout_manager["workout-1"], 2)
+    # both sides of a 1-handed exercise are stations next to each other
+    assert [circuit.exercise_names for circuit in plan.circuits] == [
+        ["1-handed-exercise (left)", "1-handed-exercise (right)"]
+    ] * 2
+    assert [phase.duration_seconds for phase in plan.timeline] == [20, 40] * 4
+
+    no_rest = WorkoutConfig(30, 0, ["2-handed-exercise", "2-handed-exercise"])
+    plan = RotationPlan.from_config(exercise_manager, no_rest, 2)
+    assert [phase.duration_seconds for phase in plan.timeline] == [30, 30]
+    assert plan.rotation_at(1) == (0, 1)
+    with pytest.raises(ValueError):
+        RotationPlan.from_workout([], 2)
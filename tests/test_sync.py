@@ -0,0 +1,120 @@
+"""Tests for sync module."""
+from pathlib import Path
+import json
+
+import pytest
+
+from persistence import update_json_file
+from profiles import ProfileManager
+from sync import HUB, LOCAL, LibrarySync, merge_fields, sync_profile
+
+
+def write_library(path: Path, library: dict):
+    with open(path, "w") as f:
+        json.dump(library, f)
+
+
+def read_library(path: Path) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="function")
+def devices(tmpdir) -> tuple[LibrarySync, LibrarySync]:
+    """Two devices which have synced the same library with a hub."""
+    library = {
+        f"exercise-{i}": {"single_handed_variations": False, "tags": ["legs"]}
+        for i in range(200)
+    }
+    syncs = []
+    for device in ("a", "b"):
+        folder = Path(tmpdir) / device
+        folder.mkdir()
+        write_library(folder / "exercises.json", library if device == "a" else {})
+        syncs.append(LibrarySync(folder / "exercises.json", Path(tmpdir) / "hub"))
+    a, b = syncs
+    assert len(a.sync().uploaded) == 200
+    assert len(b.sync().downloaded) == 200
+    return a, b
+
+
+def test_merge_fields():
+    base = {"weight": 1.0, "tags": ["legs"]}
+    assert merge_fields(base, {"weight": 2.0, "tags": ["legs"]}, {"weight": 1.0}) == {
+        "weight": 2.0
+    }
+    assert merge_fields(base, {"weight": 2.0}, {"weight": 3.0}) is None
+
+
+def test_changes_are_transferred_incrementally(devices):
+    a, b = devices
+    assert a.sync().buckets_read == 0
+
+    update_json_file(
+        a.library_path,
+        [
+            lambda library: library["exercise-1"].update(weight=2.0),
+            lambda library: library.pop("exercise-2"),
+        ],
+    )
+    report = a.sync()
+    assert sorted(report.uploaded) == ["exercise-1", "exercise-2"]
+    assert report.buckets_read == 0
+
+    report = b.sync()
+    assert sorted(report.downloaded) == ["exercise-1", "exercise-2"]
+    assert report.buckets_read == 2
+    assert read_library(b.library_path) == read_library(a.library_path)
+
+
+def test_concurrent_edits_are_merged(devices):
+    a, b = devices
+    update_json_file(a.library_path, [lambda lib: lib["exercise-1"].update(weight=2)])
+    update_json_file(b.library_path, [lambda lib: lib["exercise-1"].update(tags=[])])
+    a.sync()
+    assert b.sync().merged == ["exercise-1"]
+    a.sync()
+
+    merged = {"single_handed_variations": False, "tags": [], "weight": 2}
+    assert read_library(a.library_path)["exercise-1"] == merged
+    assert read_library(b.library_path)["exercise-1"] == merged
+
+
+def test_conflicts_are_reported_not_overwritten(devices):
+    a, b = devices
+    update_json_file(a.library_path, [lambda lib: lib["exercise-1"].update(tags=[])])
+    update_json_file(b.library_path, [lambda lib: lib.pop("exercise-1")])
+    a.sync()
+
+    for _ in range(2):
+        report = b.sync()
+        assert [conflict.name for conflict in report.conflicts] == ["exercise-1"]
+        assert "exercise-1" not in read_library(b.library_path)
+    assert a.sync().conflicts == []
+    assert read_library(a.library_path)["exercise-1"]["tags"] == []
+
+    report = b.sync(prefer=HUB)
+    assert report.downloaded == ["exercise-1"]
+    assert read_library(b.library_path)["exercise-1"]["tags"] == []
+    assert b.sync().conflicts == []
+
+
+def test_prefer_local_resolves_conflicts(devices):
+    a, b = devices
+    update_json_file(a.library_path, [lambda lib: lib["exercise-1"].update(tags=[])])
+    update_json_file(b.library_path, [lambda lib: lib["exercise-1"].update(tags=["a"])])
+    a.sync()
+    assert b.sync(prefer=LOCAL).uploaded == ["exercise-1"]
+    a.sync()
+    assert read_library(a.library_path)["exercise-1"]["tags"] == ["a"]
+
+
+def test_sync_profile(workout_manager, exercise_manager, tmpdir):
+    profile_manager = ProfileManager(data_folder=Path(workout_manager.path).parent)
+    reports = sync_profile(
+        Path(tmpdir) / "hub", "alex", profile_manager=profile_manager
+    )
+    assert [report.library for report in reports] == ["exercises", "workouts"]
+    assert sorted(reports[0].uploaded) == sorted(exercise_manager.exercises)
+    assert sorted(reports[1].uploaded) == sorted(workout_manager.workouts)
+    assert (Path(tmpdir) / "hub" / "workouts-alex" / "root.json").exists()
@@ -0,0 +1,31 @@
+"""Tests for the terminal frontend."""
+from exercise import Exercise, Rest
+from tui import EXERCISE, FIRST_REST, phase_info, REST
+from workout import Phase
+
+
+def test_phase_info():
+    """Phases should be described as in the GUI countdown."""
+    rest_phase = Phase(10, Rest())
+    workout = [
+        rest_phase,
+        Phase(20, Exercise("first", False)),
+        rest_phase,
+        Phase(20, Exercise("second", False)),
+    ]
+    assert [phase_info(workout, i).colour for i in range(4)] == [
+        FIRST_REST,
+        EXERCISE,
+        REST,
+        EXERCISE,
+    ]
+
+    info = phase_info(workout, 2)
+    assert info.title == "Rest"
+    assert info.progress == "1/2 exercises completed"
+    assert info.next_exercises == ["second"]
+
+    info = phase_info(workout, 3)
+    assert info.title == "second"
+    assert info.progress == "Exercise 2/2"
+    assert info.next_exercises == []
@@ -0,0 +1,99 @@
+"""Tests for versions module."""
+from pathlib import Path
+import json
+
+import pytest
+
+from versions import apply_exercises_delta, exercises_delta, WorkoutVersions
+from workout import Block, WorkoutConfig, WorkoutManager
+
+
+@pytest.fixture(scope="function")
+def versions(tmpdir) -> WorkoutVersions:
+    return WorkoutVersions(path=Path(tmpdir) / "workout_versions.json")
+
+
+def config_with(exercises, exercise_duration_seconds=40) -> WorkoutConfig:
+    return WorkoutConfig(exercise_duration_seconds, 20, list(exercises))
+
+
+def test_exercises_delta_round_trip():
+    old = ["a", "b", {"rounds": 2, "exercises": ["c", "d"]}, "e"]
+    new = ["b", {"rounds": 3, "exercises": ["c", "d"]}, "e", "f"]
+    script = exercises_delta(old, new)
+    assert apply_exercises_delta(old, script) == new
+    assert exercises_delta(new, new) == []
+
+
+def test_versions_are_rebuilt_from_checkpoints(versions):
+    versions.checkpoint_interval = 4
+    configs = []
+    exercises = [f"exercise-{i}" for i in range(20)]
+    for i in range(10):
+        exercises[i] = f"changed-{i}"
+        configs.append(config_with(exercises, 30 + i))
+        versions.record({"workout": configs[-1]}, when=1000.0 + i)
+
+    records = versions.histories["workout"]
+    assert [("config" in record) for record in records] == [
+        i % 4 == 0 for i in range(10)
+    ]
+    for version, config in zip(versions.versions("workout"), configs):
+        assert versions.get("workout", version) == config
+    assert versions.latest("workout") == configs[-1]
+
+    # history is smaller than keeping every version in full
+    history_size = len(json.dumps(records))
+    assert history_size < 0.6 * len(json.dumps([c.to_dict() for c in configs]))
+
+    reloaded = WorkoutVersions(path=versions.path)
+    assert reloaded.get("workout", 7) == configs[6]
+
+
+def test_unchanged_versions_are_not_recorded(versions):
+    versions.record({"workout": config_with(["a"])})
+    versions.record({"workout": config_with(["a"])})
+    assert versions.versions("workout") == [1]
+
+
+def test_retention_keeps_recent_versions(versions):
+    versions.checkpoint_interval = 10
+    versions.max_versions = 3
+    versions.max_age_seconds = 100
+    for i in range(6):
+        versions.record({"workout": config_with(["a"] * (i + 1))}, when=float(i))
+    assert versions.versions("workout") == [4, 5, 6]
+    assert "config" in versions.histories["workout"][0]
+    assert versions.get("workout", 4) == config_with(["a"] * 4)
+
+    versions.record({"workout": config_with(["b"])}, when=1000.0)
+    assert versions.versions("workout") == [7]
+
+
+def test_diff(versions):
+    versions.record({"workout": config_with(["a", "b"])})
+    versions.record(
+        {"workout": config_with(["a", Block(["c"], rounds=2)], 45)},
+    )
+    assert versions.diff("workout", 1, 2) == [
+        "~ exercise duration 40s -> 45s",
+        "- b",
+        "+ 2 x [c]",
+    ]
+
+
+def test_workout_manager_records_and_restores(workout_manager, tmpdir):
+    versions = WorkoutVersions(path=Path(tmpdir) / "workout_versions.json")
+    manager = WorkoutManager(path=workout_manager.path, versions=versions)
+    original = manager["workout-1"]
+
+    manager.add_workout("workout-1", config_with(["2-handed-exercise"]))
+    manager.remove_workout("workout-1")
+    assert versions.versions("workout-1") == [1, 2, 3]
+    assert versions.get("workout-1", 3) is None
+    with pytest.raises(ValueError):
+        manager.restore_version("workout-1", 3)
+
+    manager.restore_version("workout-1", 1)
+    assert manager["workout-1"] == original
+    assert versions.versions("workout-1") == [1, 2, 3, 4]
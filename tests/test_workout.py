@@ -1,4 +1,7 @@
 """Tests for workout module."""
+import itertools
+import json
+
 from hypothesis import given, HealthCheck, settings
 from hypothesis.strategies import data, integers, lists, sampled_from
 import pytest
@@ -6,12 +9,16 @@ import pytest
 from exercise import Exercise, Rest
 from workout import (
     apply_workout_correction,
+    Block,
     generate_workout,
+    iter_workout_phases,
     Phase,
+    TagConstraints,
     workout_from_config,
     Workout,
     WorkoutConfig,
     WorkoutManager,
+    WorkoutPhases,
 )
 
 
@@ -242,3 +249,180 @@ def test_workout_from_config_has_rests_in_between_exercises(
     )
     workout = workout_from_config(exercise_manager_with_more_exercises, workout_config)
     validate_rest_exercise_interleaving(workout)
+
+
+def test_parse_tag_constraints():
+    """Tag constraints should be parsed from text."""
+    constraints = TagConstraints.parse("legs, -jumping, core>=2, grip <= 3,")
+    assert constraints == TagConstraints(
+        with_tags=["legs"],
+        without_tags=["jumping"],
+        min_counts={"core": 2},
+        max_counts={"grip": 3},
+    )
+
+
+@settings(suppress_health_check=(HealthCheck.function_scoped_fixture,))
+@given(
+    num_exercises=integers(min_value=6, max_value=15),
+    min_core=integers(min_value=0, max_value=4),
+    max_jumping=integers(min_value=0, max_value=4),
+)
+def test_generate_workout_with_tag_constraints(
+    tagged_exercise_manager, num_exercises, min_core, max_jumping
+):
+    """A workout generated with tag constraints should satisfy them."""
+    constraints = TagConstraints(
+        without_tags=["bodyweight"] if max_jumping == 0 else [],
+        min_counts={"core": min_core},
+        max_counts={"jumping": max_jumping},
+    )
+    workout = generate_workout(
+        tagged_exercise_manager, num_exercises=num_exercises, constraints=constraints
+    )
+    validate_rest_exercise_interleaving(workout)
+    exercise_names = [
+        phase.type.name for phase in workout if isinstance(phase.type, Exercise)
+    ]
+    assert len(exercise_names) == num_exercises
+    assert sum(name.startswith("core") for name in exercise_names) >= min_core
+    assert sum(name.startswith("legs-jumping") for name in exercise_names) <= (
+        max_jumping
+    )
+
+
+@pytest.mark.parametrize(
+    "constraints",
+    [
+        TagConstraints(with_tags=["legs", "core"]),
+        TagConstraints(with_tags=["legs"], min_counts={"core": 1}),
+        TagConstraints(with_tags=["jumping"], min_counts={"jumping": 11}),
+        TagConstraints(min_counts={"core": 2}, max_counts={"core": 1}),
+        TagConstraints(min_counts={"legs": 8, "core": 8}),
+        TagConstraints(max_counts={"legs": 0, "core": 0}),
+    ],
+)
+def test_generate_workout_with_unsatisfiable_tag_constraints(
+    tagged_exercise_manager, constraints
+):
+    """Unsatisfiable tag constraints should raise an error."""
+    with pytest.raises(ValueError):
+        generate_workout(
+            tagged_exercise_manager, num_exercises=10, constraints=constraints
+        )
+
+
+def test_nested_workout_phases(exercise_manager):
+    """Blocks should be repeated with their own durations and round rests."""
+    config = WorkoutConfig(
+        exercise_duration_seconds=40,
+        rest_duration_seconds=20,
+        exercises=[
+            "2-handed-exercise",
+            Block(
+                ["1-handed-exercise", Block(["2-handed-exercise"], rounds=2)],
+                rounds=2,
+                exercise_duration_seconds=30,
+                round_rest_seconds=90,
+            ),
+            Block.tabata(["2-handed-exercise"], rounds=3),
+        ],
+    )
+    workout = workout_from_config(exercise_manager, config)
+    validate_rest_exercise_interleaving(workout)
+    assert [phase.duration_seconds for phase in workout] == [
+        # 2-handed-exercise
+        20,
+        40,
+        # first round: 1-handed-exercise left/right then 2 rounds of 2-handed
+        20,
+        30,
+        20,
+        30,
+        20,
+        30,
+        20,
+        30,
+        # second round starts with the longer rest between rounds
+        90,
+        30,
+        20,
+        30,
+        20,
+        30,
+        20,
+        30,
+        # tabata
+        10,
+        20,
+        10,
+        20,
+        10,
+        20,
+    ]
+    assert config.calculate_num_exercises(exercise_manager) == 1 + 2 * (2 + 2) + 3
+    assert config.exercise_names == {"1-handed-exercise", "2-handed-exercise"}
+
+
+def test_nested_workout_zero_durations(exercise_manager):
+    """Durations of 0 in a block should override the enclosing ones."""
+    config = WorkoutConfig(
+        exercise_duration_seconds=40,
+        rest_duration_seconds=20,
+        exercises=[
+            Block(["2-handed-exercise"], rounds=2, rest_duration_seconds=0),
+            Block.emom(["2-handed-exercise"], minutes=2, work_seconds=60),
+        ],
+    )
+    workout = workout_from_config(exercise_manager, config)
+    durations = [phase.duration_seconds for phase in workout]
+    assert durations == [0, 40, 0, 40, 0, 60, 0, 60]
+    # every minute of the EMOM lasts a minute
+    assert sum(phase.duration_seconds for phase in workout[4:]) == 2 * 60
+
+
+def test_nested_workout_phases_are_lazy(exercise_manager):
+    """Expanding many rounds should not materialise them up front."""
+    config = WorkoutConfig(
+        exercise_duration_seconds=40,
+        rest_duration_seconds=20,
+        exercises=[Block(["2-handed-exercise"], rounds=10**9)],
+    )
+    phases = iter_workout_phases(exercise_manager, config)
+    assert len(list(itertools.islice(phases, 10))) == 10
+
+
+def test_workout_phases_can_be_iterated_again(exercise_manager):
+    """Lazily expanded phases should match the list, each time through."""
+    config = WorkoutConfig(
+        exercise_duration_seconds=40,
+        rest_duration_seconds=20,
+        exercises=[Block(["1-handed-exercise", "2-handed-exercise"], rounds=3)],
+    )
+    phases = WorkoutPhases(exercise_manager, config)
+    workout = workout_from_config(exercise_manager, config)
+    assert list(phases) == workout
+    assert list(phases) == workout
+    assert len(phases) == len(workout) == 3 * 3 * 2
+
+
+def test_nested_workout_round_trip(workout_manager):
+    """Nested workouts should be saved and loaded, leaving flat ones as they were."""
+    with open(workout_manager.path, "r") as f:
+        flat_workouts = json.load(f)
+    config = WorkoutConfig(
+        exercise_duration_seconds=40,
+        rest_duration_seconds=20,
+        exercises=[Block(["1-handed-exercise"], rounds=3, round_rest_seconds=60)],
+    )
+    workout_manager.add_workout("nested-workout", config)
+
+    new_workout_manager = WorkoutManager(path=workout_manager.path)
+    assert new_workout_manager["nested-workout"] == config
+    with open(workout_manager.path, "r") as f:
+        workouts = json.load(f)
+    assert workouts["nested-workout"]["exercises"] == [
+        {"exercises": ["1-handed-exercise"], "rounds": 3, "round_rest_seconds": 60}
+    ]
+    for workout_name, workout in flat_workouts.items():
+        assert workouts[workout_name] == workout
@@ -0,0 +1,79 @@
+"""Tests for workout_index module."""
+import random
+
+import pytest
+
+from exercise import Exercise
+from workout import WorkoutConfig
+from workout_index import Range, WorkoutIndex, WorkoutQuery, WorkoutStats
+
+
+def test_parse_query():
+    query = WorkoutQuery.parse("<25, phases>=10, rest<=0.4, Swing, -Burpees")
+    assert query.with_exercises == ["Swing"]
+    assert query.without_exercises == ["Burpees"]
+    assert query.ranges == {
+        "duration": Range(high=25, high_inclusive=False),
+        "phases": Range(low=10),
+        "rest": Range(high=0.4),
+    }
+    with pytest.raises(ValueError):
+        WorkoutQuery.parse("length<25")
+
+
+def test_workout_stats(exercise_manager, workout_manager):
+    stats = WorkoutStats.of(exercise_manager, workout_manager["workout-2"])
+    # 1-handed exercise counts twice, each exercise preceded by a rest
+    assert stats == WorkoutStats(duration=1.0, phases=6, rest=0.5)
+
+
+def test_manager_queries_follow_changes(exercise_manager, workout_manager):
+    workout_manager.use_index(WorkoutIndex(exercise_manager))
+    assert workout_manager.query(WorkoutQuery.parse("<2")) == ["workout-2"]
+    assert workout_manager.query(WorkoutQuery.parse("1-HANDED-exercise")) == [
+        "workout-2",
+        "workout-1",
+    ]
+    assert workout_manager.query(WorkoutQuery.parse("-2-handed-exercise")) == [
+        "workout-1"
+    ]
+
+    workout_manager.add_workout("short", WorkoutConfig(10, 10, ["2-handed-exercise"]))
+    workout_manager.remove_workout("workout-2")
+    assert workout_manager.query(WorkoutQuery.parse("<2")) == ["short"]
+
+    # durations change once an exercise gains 1-handed variations
+    exercise_manager.add_exercise(Exercise("2-handed-exercise", True))
+    assert workout_manager.query(WorkoutQuery.parse("phases<=2")) == []
+    assert workout_manager.query(WorkoutQuery.parse("phases<=4")) == ["short"]
+
+
+def test_queries_match_a_scan(exercise_manager_with_more_exercises):
+    """Index lookups should give the same results as checking every workout."""
+    exercise_manager = exercise_manager_with_more_exercises
+    rng = random.Random(0)
+    names = sorted(exercise_manager.exercises)
+    workouts = {
+        f"workout-{i}": WorkoutConfig(
+            rng.choice([20, 30, 40]), rng.choice([10, 20]), rng.sample(names, 8)
+        )
+        for i in range(200)
+    }
+    index = WorkoutIndex(exercise_manager)
+    index.sync(workouts)
+
+    for text in ["<6", "duration>=5, rest<0.4", names[0], f"phases<20, -{names[1]}"]:
+        query = WorkoutQuery.parse(text)
+        expected = []
+        for workout_name, config in workouts.items():
+            stats = WorkoutStats.of(exercise_manager, config)
+            if (
+                set(query.with_exercises) <= config.exercise_names
+                and not set(query.without_exercises) & config.exercise_names
+                and all(
+                    getattr(stats, stat) in bounds
+                    for stat, bounds in query.ranges.items()
+                )
+            ):
+                expected.append(workout_name)
+        assert sorted(index.query(query)) == sorted(expected)